@@ -1,11 +1,18 @@
-import base58
 import argparse
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives import serialization
 
+from did_codec import encode_did
+
 def extract_did_from_private_key(private_key_path):
     with open(private_key_path, "rb") as key_file:
-        private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+        return extract_did_from_pem(key_file.read())
+
+def extract_did_from_pem(pem_data):
+    """Derives the DID:key from PEM private key data held in memory (str or bytes)"""
+    if isinstance(pem_data, str):
+        pem_data = pem_data.encode("utf-8")
+    private_key = serialization.load_pem_private_key(pem_data, password=None)
 
     if not isinstance(private_key, Ed25519PrivateKey):
         raise ValueError("Invalid key type. Expected Ed25519.")
@@ -18,14 +25,8 @@ def extract_did_from_private_key(private_key_path):
         format=serialization.PublicFormat.Raw
     )
     
-    # Multicodec prefix for Ed25519 keys
-    multicodec_prefix = b'\xed\x01'  # 0xED01 prefix for Ed25519
-    multicodec_key = multicodec_prefix + public_key_bytes
-    
-    # Base58 encoding for DID:key format
-    did_key = "did:key:" + base58.b58encode(multicodec_key).decode('utf-8')
-    
-    return did_key
+    # did:key = base58(0xED01 multicodec prefix + public key), see did_codec.py
+    return encode_did(public_key_bytes)
 
 def generate_did_key():
     # Generate Ed25519 key pair
@@ -38,31 +39,41 @@ def generate_did_key():
         format=serialization.PublicFormat.Raw
     )
     
-    # Multicodec for Ed25519 key (0xED01 prefix)
-    multicodec_prefix = b'\xed\x01'  
-    multicodec_key = multicodec_prefix + public_key_bytes
-    
-    # Encode to Base58 for DID:key
-    did_key = f"did:key:{base58.b58encode(multicodec_key).decode('utf-8')}"
+    # did:key = base58(0xED01 multicodec prefix + public key), see did_codec.py
+    did_key = encode_did(public_key_bytes)
     
     return did_key, private_key
 
+def private_key_to_pem(private_key):
+    """Serializes an Ed25519 private key to a PKCS8 PEM string, in memory"""
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode("utf-8")
+
+def generate_did_key_pem():
+    """Generates a DID:key and returns it with its PKCS8 PEM private key (no files written)"""
+    did_key, private_key = generate_did_key()
+    return did_key, private_key_to_pem(private_key)
+
+def generate_did_keys_pem(count):
+    """Generates `count` DID:key / PEM pairs in a single call"""
+    return [generate_did_key_pem() for _ in range(count)]
+
 def main():
     parser = argparse.ArgumentParser(description="Generate DID:key for your objects")
     parser.add_argument("--export-private", action="store_true", help="Export private key to a file")
+    parser.add_argument("--output", default="private_key.pem", help="Path of the exported private key file")
     args = parser.parse_args()
     
     did_key, private_key = generate_did_key()
     print(f"Generated DID:key: {did_key}")
     
     if args.export_private:
-        with open("private_key.pem", "wb") as f:
-            f.write(private_key.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ))
-        print("Private key saved to private_key.pem")
+        with open(args.output, "wb") as f:
+            f.write(private_key_to_pem(private_key).encode("utf-8"))
+        print(f"Private key saved to {args.output}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,10 @@
 import json
 import os
-import subprocess
+import sqlite3
+
+import instrumentation
+from db_pool import ConnectionPool
+from instrumentation import increment, span
 
 # -----------------------------
 # Dummy / Placeholder Implementations
@@ -8,48 +12,129 @@ import subprocess
 # Dummy MySQL connector placeholder
 class DummyCursor:
     def execute(self, query, params=None):
-        print(f"[Dummy MySQL] Executing query: {query} with params: {params}")
+        if instrumentation.VERBOSE:
+            print(f"[Dummy MySQL] Executing query: {query} with params: {params}")
     def fetchone(self):
         # Always simulate no existing record (i.e. 0 count)
         return [0]
+    def fetchall(self):
+        # Always simulate no matching rows
+        return []
 
 class DummyDB:
     def cursor(self):
         return DummyCursor()
     def commit(self):
-        print("[Dummy MySQL] Commit simulated.")
+        if instrumentation.VERBOSE:
+            print("[Dummy MySQL] Commit simulated.")
     def close(self):
-        print("[Dummy MySQL] Connection closed.")
+        if instrumentation.VERBOSE:
+            print("[Dummy MySQL] Connection closed.")
 
 class DummyMySQLConnector:
     @staticmethod
     def connect(**db_config):
-        print(f"[Dummy MySQL] Connecting with config: {db_config}")
+        if instrumentation.VERBOSE:
+            print(f"[Dummy MySQL] Connecting with config: {db_config}")
         return DummyDB()
 
+# Local SQLite stand-in for MySQL (real storage, same %s-style queries)
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+    def execute(self, query, params=None):
+        query = query.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+        # SQLite's auto-increment key is a plain INTEGER PRIMARY KEY
+        query = query.replace("BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY")
+        self._cursor.execute(query, params or ())
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    def fetchone(self):
+        return self._cursor.fetchone()
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+class SQLiteDB:
+    def __init__(self, connection):
+        self._connection = connection
+    def cursor(self):
+        return SQLiteCursor(self._connection.cursor())
+    def commit(self):
+        self._connection.commit()
+    def rollback(self):
+        self._connection.rollback()
+    def close(self):
+        self._connection.close()
+
+class SQLiteConnector:
+    # Default is a shared in-memory database; set DID_REGISTRY_SQLITE_PATH to use a file
+    path = os.environ.get("DID_REGISTRY_SQLITE_PATH", "file:did_registry?mode=memory&cache=shared")
+
+    @staticmethod
+    def connect(**db_config):
+        connection = sqlite3.connect(SQLiteConnector.path, uri=SQLiteConnector.path.startswith("file:"),
+                                     timeout=30, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS did_keys ("
+            "did TEXT PRIMARY KEY, public_key TEXT, metadata TEXT, "
+            "registered_by TEXT, kafka_topic TEXT, allowed_did TEXT)"
+        )
+        connection.execute(ACCESS_GRANTS_SCHEMA)
+        connection.execute(ENTITY_INDEX_SCHEMA)
+        SQLiteCursor(connection.cursor()).execute(REGISTRY_CHANGES_SCHEMA)
+        connection.commit()
+        return SQLiteDB(connection)
+
 # Dummy Kafka placeholders
 class DummyFuture:
     def __init__(self, topic):
         self.topic = topic
     def result(self):
-        print(f"[Dummy Kafka] Simulated topic creation result for: {self.topic}")
+        if instrumentation.VERBOSE:
+            print(f"[Dummy Kafka] Simulated topic creation result for: {self.topic}")
 
 class DummyAdminClient:
     def __init__(self, config):
         self.config = config
-        print(f"[Dummy Kafka] AdminClient configured with: {config}")
+        if instrumentation.VERBOSE:
+            print(f"[Dummy Kafka] AdminClient configured with: {config}")
     def create_topics(self, topic_list):
-        print(f"[Dummy Kafka] Simulated creation of topics: {[t.topic for t in topic_list]}")
+        if instrumentation.VERBOSE:
+            print(f"[Dummy Kafka] Simulated creation of topics: {[t.topic for t in topic_list]}")
         return {topic.topic: DummyFuture(topic.topic) for topic in topic_list}
 
+class DummyMessage:
+    def __init__(self, topic, value):
+        self._topic = topic
+        self._value = value
+    def topic(self):
+        return self._topic
+    def value(self):
+        return self._value
+
 class DummyProducer:
     def __init__(self, config):
         self.config = config
-        print(f"[Dummy Kafka] Producer configured with: {config}")
-    def produce(self, topic, message):
-        print(f"[Dummy Kafka] Simulated message sent to topic '{topic}': {message}")
-    def flush(self):
-        print("[Dummy Kafka] Flush simulated.")
+        self._pending = []
+        if instrumentation.VERBOSE:
+            print(f"[Dummy Kafka] Producer configured with: {config}")
+    def produce(self, topic, message, callback=None):
+        if instrumentation.VERBOSE:
+            print(f"[Dummy Kafka] Simulated message sent to topic '{topic}': {message}")
+        if callback is not None:
+            self._pending.append((callback, DummyMessage(topic, message)))
+    def poll(self, timeout=0):
+        # Serve delivery callbacks, reporting every message as delivered
+        pending, self._pending = self._pending, []
+        for callback, message in pending:
+            callback(None, message)
+        return len(pending)
+    def flush(self, timeout=None):
+        if instrumentation.VERBOSE:
+            print("[Dummy Kafka] Flush simulated.")
+        self.poll()
+        return 0
 
 # Dummy NewTopic to simulate Kafka topic creation
 class DummyNewTopic:
@@ -64,12 +149,21 @@ class DummyNewTopic:
 # Instead of using mysql.connector and confluent_kafka,
 # we substitute them with our dummy implementations.
 mysql_connector = DummyMySQLConnector
+# Set DID_REGISTRY_DB=sqlite to run against the local SQLite stand-in instead
+if os.environ.get("DID_REGISTRY_DB") == "sqlite":
+    mysql_connector = SQLiteConnector
 AdminClient = DummyAdminClient
 Producer = DummyProducer
 NewTopic = DummyNewTopic
 
-# Import the extract_did_from_private_key from CLItool.py (unchanged)
-from CLItool import extract_did_from_private_key
+# Import the DID:key helpers from CLItool.py
+from CLItool import extract_did_from_private_key, generate_did_key_pem, generate_did_keys_pem
+from hsml_validator import validate_document
+from access_grants import ACCESS_GRANTS_SCHEMA, grant_access
+from did_cache import did_from_pem, invalidate_did, resolve_did
+from entity_index import ENTITY_INDEX_SCHEMA, index_entity
+from entity_graph import REGISTRY_CHANGES_SCHEMA, prepare_registry_changes, record_registry_change
+from artifact_store import open_artifact_store
 
 # -----------------------------
 # Original Registration Code (with placeholders)
@@ -78,8 +172,22 @@ from CLItool import extract_did_from_private_key
 KAFKA_CONFIG = {
     "bootstrap.servers": "localhost:9092"
 }
+# Producer batches messages for up to linger.ms before sending
+PRODUCER_CONFIG = {**KAFKA_CONFIG, "linger.ms": 20}
 admin_client = AdminClient(KAFKA_CONFIG)
-producer = Producer(KAFKA_CONFIG)
+producer = Producer(PRODUCER_CONFIG)
+
+# Optional asynchronous event pipeline (see kafka_events.KafkaEventPipeline); when set,
+# Agent topic creation and announcements are queued instead of sent inline
+event_pipeline = None
+
+# Optional in-memory linked-entity graph (see entity_graph.EntityGraph); when set,
+# every registration adds its linkedTo / registered_by / Credential edges to it
+entity_graph = None
+
+# Optional write-ahead journal (see registration_journal.RegistrationJournal); when set,
+# every registration is recorded before its side effects so a crash can be replayed
+journal = None
 
 # MySQL Database Configuration
 db_config = {
@@ -89,9 +197,20 @@ db_config = {
     "database": "did_registry"
 }
 
-# Connect to MySQL
+# HSML files larger than this (in bytes) are registered without loading them into memory
+STREAMING_THRESHOLD = int(os.environ.get("HSML_STREAMING_THRESHOLD", 64 * 1024 * 1024))
+
+# Connection pool shared by the registration module and the Flask app
+db_pool = ConnectionPool(
+    lambda: mysql_connector.connect(**db_config),
+    size=int(os.environ.get("DB_POOL_SIZE", 5)),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    health_check_interval=float(os.environ.get("DB_POOL_HEALTH_CHECK_INTERVAL", 30))
+)
+
+# Connect to MySQL (returns a pooled connection; close() hands it back to the pool)
 def connect_db():
-    return mysql_connector.connect(**db_config)
+    return db_pool.acquire()
 
 # Function to create a Kafka topic for Agents
 def create_kafka_topic(topic_name, num_partitions=1, replication_factor=1):
@@ -102,7 +221,8 @@ def create_kafka_topic(topic_name, num_partitions=1, replication_factor=1):
     for topic, f in fs.items():
         try:
             f.result()  # Simulate waiting for topic creation
-            print(f"Kafka topic '{topic}' created successfully (simulated).")
+            if instrumentation.VERBOSE:
+                print(f"Kafka topic '{topic}' created successfully (simulated).")
         except Exception as e:
             print(f"Failed to create topic '{topic}': {e}")
 
@@ -112,229 +232,365 @@ def send_kafka_message(topic, message):
     try:
         producer.produce(topic, json.dumps(message))
         producer.flush()
-        print(f"Message sent to Kafka topic '{topic}' (simulated): {message}")
+        if instrumentation.VERBOSE:
+            print(f"Message sent to Kafka topic '{topic}' (simulated): {message}")
     except Exception as e:
         print(f"Failed to send message to Kafka topic '{topic}': {e}")
 
-# Function to generate DID:key using CLI tool (modified)
-def generate_did_key():
-    """Runs the CLI tool to generate a unique DID:key and extract the private key"""
-    while True:
-        result = subprocess.run(["python", "CLItool.py", "--export-private"], capture_output=True, text=True)
-        print(f"Subprocess output:\n{result.stdout}")  # Debug output
-        output = result.stdout.splitlines()
-        
-        # Extract DID:key from the stdout (terminal output)
-        did_key = None
-        for line in output:
-            if line.startswith("Generated DID:key:"):
-                did_key = line.split("Generated DID:key:")[1].strip()
-        
-        if not did_key:
-            raise ValueError("Failed to generate DID:key from output")
-
-        # Now, read the private key from the saved file "private_key.pem"
-        private_key_path = "private_key.pem"
+# Function to create many Kafka topics with a single admin request
+def create_kafka_topics(topic_names, num_partitions=1, replication_factor=1):
+    """Creates several Kafka topics in one create_topics call"""
+    if not topic_names:
+        return
+    topic_list = [NewTopic(name, num_partitions=num_partitions, replication_factor=replication_factor) for name in topic_names]
+    fs = admin_client.create_topics(topic_list)
+    for topic, f in fs.items():
         try:
-            with open(private_key_path, "rb") as key_file:
-                private_key = key_file.read()  # Read the private key as bytes
-        except FileNotFoundError:
-            raise ValueError(f"Private key file '{private_key_path}' not found")
-        
-        # Check if the generated swid already exists in the database
-        db = connect_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (did_key,))
-        if cursor.fetchone()[0] == 0:  # SWID is unique
-            # Return DID:key and private key as a PEM string
-            return did_key, private_key.decode("utf-8")
+            f.result()
+        except Exception as e:
+            print(f"Failed to create topic '{topic}': {e}")
 
-# Function for login before registering
+# Function to send several Kafka messages with a single flush
+def send_kafka_messages(messages):
+    """Sends (topic, message) pairs and flushes the producer once"""
+    for topic, message in messages:
+        try:
+            producer.produce(topic, json.dumps(message))
+        except Exception as e:
+            print(f"Failed to send message to Kafka topic '{topic}': {e}")
+    if messages:
+        producer.flush()
+
+# Function to announce many new Agents (topic creation + "New Agent registered" message)
+def publish_agent_events(agents):
+    """Publishes (topic_name, agent_name) pairs through the event pipeline, or in one batch inline"""
+    if event_pipeline is not None:
+        for topic_name, agent_name in agents:
+            event_pipeline.publish_agent(topic_name, agent_name)
+        return
+    create_kafka_topics([topic_name for topic_name, _ in agents])
+    send_kafka_messages([(topic_name, {"message": f"New Agent registered: {agent_name}"}) for topic_name, agent_name in agents])
+
+# Function to write many did_keys rows with one statement
+def insert_did_keys(cursor, rows):
+    """Writes (did, public_key, metadata, registered_by, kafka_topic) rows with a multi-row REPLACE INTO"""
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+    params = tuple(value for row in rows for value in row)
+    cursor.execute(
+        f"REPLACE INTO did_keys (did, public_key, metadata, registered_by, kafka_topic) VALUES {placeholders}",
+        params
+    )
+
+# Function to find which of the given DIDs are already registered
+def find_existing_dids(cursor, dids):
+    """Returns the subset of `dids` already present in did_keys, using a single query"""
+    dids = list(dids)
+    if not dids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(dids))
+    with span("did.uniqueness_check"):
+        cursor.execute(f"SELECT did FROM did_keys WHERE did IN ({placeholders})", tuple(dids))
+        return {row[0] for row in cursor.fetchall()}
+
+# Optional pre-generated key pool (see did_pool.DIDKeyPool); when set, keys are popped from it
+did_key_pool = None
+
+# Function to generate DID:key in-process (no subprocess, no private_key.pem on disk)
+def generate_did_key(cursor=None):
+    """Generates a unique DID:key and returns it with its private key as a PEM string.
+
+    cursor: check uniqueness on the caller's connection instead of taking a second one from the pool.
+    """
+    with span("did.generate"):
+        if did_key_pool is not None:
+            return did_key_pool.get(cursor)
+        db = connect_db() if cursor is None else None
+        try:
+            if db is not None:
+                cursor = db.cursor()
+            while True:
+                with span("did.keygen"):
+                    did_key, private_key = generate_did_key_pem()
+                # Check if the generated swid already exists in the database
+                with span("did.uniqueness_check"):
+                    cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (did_key,))
+                    unique = cursor.fetchone()[0] == 0
+                if unique:
+                    return did_key, private_key
+        finally:
+            if db is not None:
+                db.close()
+
+# Function to generate many DID:keys at once
+def generate_did_keys(count, cursor=None):
+    """Generates `count` unique DID:key / PEM pairs, checking uniqueness in bulk (on `cursor` if given)"""
+    with span("did.generate_batch"):
+        if did_key_pool is not None:
+            return did_key_pool.get_many(count, cursor)
+        db = connect_db() if cursor is None else None
+        try:
+            if db is not None:
+                cursor = db.cursor()
+            keys = []
+            while len(keys) < count:
+                with span("did.keygen_batch"):
+                    batch = generate_did_keys_pem(count - len(keys))
+                existing = find_existing_dids(cursor, [did for did, _ in batch])
+                keys.extend((did, pem) for did, pem in batch if did not in existing)
+            return keys
+        finally:
+            if db is not None:
+                db.close()
+
+# Function to check that a DID may register new entities
+def check_registrant(user_did):
+    """Returns None if user_did is a registered Person or Organization, else an error dict"""
+    user_data = resolve_did(user_did)
+    if not user_data:
+        return {"status": "error", "message": "DID not found in database. Please register first."}
+    if user_data.get("@type") not in ["Person", "Organization"]:
+        return {"status": "error", "message": "Only registered Persons or Organizations can register new entities."}
+    return None
+
+# Function for login before registering (interactive)
 def login_or_register():
     choice = input("Must be registered in the Spatial Web to register a new Entity. Type 'new' to register or 'login' if already registered: ")
-    db = connect_db()
-    cursor = db.cursor()
     if choice.lower() == "new":
         print("Registering a new user. You can only register a Person or Organization.")
         return None
     elif choice.lower() == "login":
         private_key_path = input("Provide your private_key.pem path: ")
         user_did = extract_did_from_private_key(private_key_path)
-        cursor.execute("SELECT metadata FROM did_keys WHERE did = %s", (user_did,))
-        result = cursor.fetchone()
-        if not result:
-            print("DID not found in database. Please register first.")
-            return None
-        user_data = json.loads(result[0])
-        if user_data.get("@type") not in ["Person", "Organization"]:
-            print("Only registered Persons or Organizations can register new entities.")
+        error = check_registrant(user_did)
+        if error:
+            print(error["message"])
             return None
-        print(f"Welcome {user_data.get('name')}, you can now register your new Entity.")
+        print(f"Welcome {resolve_did(user_did).get('name')}, you can now register your new Entity.")
         return user_did
     else:
         print("Invalid choice.")
         return None
 
+# Function to validate an HSML JSON object
+def validate_hsml(data, present_fields=()):
+    """Checks an HSML object's context, type, required fields and references; returns an error dict or None"""
+    with span("hsml.validate"):
+        errors, warnings = validate_document(data, present_fields)
+    if errors:
+        increment("validation_failures")
+        return {"status": "error", "message": "; ".join(errors), "errors": errors}
+    if instrumentation.VERBOSE:
+        print("HSML JSON accepted.")
+        for warning in warnings:
+            print(f"Warning: {warning}")
+    return None
+
 # Function to validate JSON and register entity
-def register_entity(json_file_path, output_directory, registered_by=None):
-    """Validates, registers, and stores an HSML entity"""
+def register_entity(json_file_path, output_directory, registered_by=None, overwrite=False, domain_private_key=None):
+    """Validates, registers, and stores an HSML entity (see register_document for the policy arguments)"""
+    # Very large documents go through the bounded-memory streaming path (hsml_stream.py)
+    if os.path.getsize(json_file_path) > STREAMING_THRESHOLD:
+        from hsml_stream import register_entity_streaming
+        return register_entity_streaming(json_file_path, output_directory, registered_by,
+                                         overwrite=overwrite, domain_private_key=domain_private_key)
     try:
         with open(json_file_path, "r") as file:
             data = json.load(file)
     except json.JSONDecodeError:
         return {"status": "error", "message": "Invalid JSON format"}
     
-    if not isinstance(data, dict):
-        return {"status": "error", "message": "Uploaded file is not a valid JSON object"}
-
-    if "@context" not in data or "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld" not in data["@context"]:
-        return {"status": "error", "message": "Not a valid HSML JSON"}
-
-    print("HSML JSON accepted.")
-
+    error = validate_hsml(data)
+    if error:
+        return error
+    return register_document(data, output_directory, registered_by,
+                             overwrite=overwrite, domain_private_key=domain_private_key)
+
+# Function to register an already-validated HSML object
+def register_document(data, output_directory, registered_by=None, write_json=None, overwrite=False,
+                      domain_private_key=None, include_private_key=False):
+    """Registers a validated HSML object without prompting; returns a result or error dict.
+
+    overwrite: register even if the document's 'swid' is already in the registry.
+    domain_private_key: PEM (str or bytes) of the domain a Credential grants access to.
+    include_private_key: also return the new private key PEM ("private_key"), for callers
+    such as the HTTP API that cannot read private_key_path.
+    write_json(file, data) overrides how the updated JSON is written. Errors that a
+    caller can resolve by retrying carry "requires": "overwrite" or "domain_private_key".
+    """
+    with span("register.total"):
+        result = _register_document(data, output_directory, registered_by, write_json, overwrite, domain_private_key)
+    if not include_private_key:
+        result.pop("private_key", None)
+    return result
+
+# Function to check a Credential's references and the domain key it is authorized with
+def _check_credential(cursor, data, registered_by, domain_private_key):
+    issued_by_did = data.get("issuedBy", {}).get("swid")
+    authorized_for_domain_did = data.get("authorizedForDomain", {}).get("swid")
+    credential_domain_name = data.get("authorizedForDomain", {}).get("name")
+    access_authorization_did = data.get("accessAuthorization", {}).get("swid")
+    if not (issued_by_did and authorized_for_domain_did and access_authorization_did):
+        return {"status": "error", "message": "Missing required 'swid' in Credential fields"}
+    if issued_by_did != registered_by:
+        return {"status": "error", "message": "issuedBy field must match the User registering the Credential"}
+    if domain_private_key is None:
+        return {"status": "error", "requires": "domain_private_key",
+                "message": f"Registering a Credential requires the private key of '{credential_domain_name}'"}
+    try:
+        credential_domain_did = did_from_pem(domain_private_key)
+    except (ValueError, TypeError):
+        credential_domain_did = None
+    if credential_domain_did != authorized_for_domain_did:
+        return {"status": "error", "message": f"Invalid private_key.pem for '{credential_domain_name}'"}
+
+    cursor.execute("SELECT metadata FROM did_keys WHERE did = %s", (authorized_for_domain_did,))
+    if not cursor.fetchone():
+        return {"status": "error", "message": f"DID not found in database. Please register '{credential_domain_name}' first."}
+    return None
+
+def _register_document(data, output_directory, registered_by, write_json, overwrite, domain_private_key):
     entity_type = data.get("@type")
-    required_fields = {
-        "Entity": ["name", "description"],
-        "Person": ["name", "birthDate", "email"],
-        "Agent": ["name", "creator", "dateCreated", "dateModified", "description"],
-        "Credential": ["name", "description", "issuedBy", "accessAuthorization", "authorizedForDomain"],
-        "Organization": ["name", "description", "url", "address", "logo", "foundingDate", "email"]
-    }
-    
-    if entity_type not in required_fields:
-        return {"status": "error", "message": "Unknown or missing entity type"}
-
-    missing_fields = [field for field in required_fields[entity_type] if field not in data]
-    if missing_fields:
-        return {"status": "error", "message": f"Missing required fields: {missing_fields}"}
-
-    if entity_type == "Person" and "affiliation" not in data:
-        print("Warning: 'affiliation' field is missing.")
-    if entity_type == "Credential" and ("validFrom" not in data or "validUntil" not in data):
-        print("Warning: Credential has no expiration date.")
-    if entity_type == "Entity" and "linkedTo" not in data:
-        print("Warning: Object not linked to any other Entity. It will be registered under this user’s SWID.")
-
-    swid = data.get("swid")
-    if swid:
-        cursor = connect_db().cursor()
-        cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (swid,))
-        existing = cursor.fetchone()[0]
-        if existing:
-            print(f"Warning: The provided 'swid' ({swid}) already exists in the database. You should not register an already existing object.")
-            user_input = input("Do you want to continue and overwrite the existing 'swid' property? (yes/no): ").strip().lower()
-            if user_input != "yes":
-                print("Process aborted. No changes were made.")
-                exit()
-        print(f"Warning: SWID '{swid}' in JSON file will be overwritten.")
-
-    did_key, private_key = generate_did_key()
-    data["swid"] = did_key
-    print(f"Generated unique SWID: {did_key}")
-    public_key_part = did_key.replace("did:key:", "")
-        
-    db = connect_db()
-    cursor = db.cursor()
-
-    if registered_by is None:
-        registered_by = did_key
-
-    topic_name = None
-    if entity_type == "Agent":
-        topic_name = data["name"].replace(" ", "_").lower()
-        create_kafka_topic(topic_name)
-        send_kafka_message(topic_name, {"message": f"New Agent registered: {data['name']}"})
-
-    if entity_type == "Credential":
-        issued_by_did = data.get("issuedBy", {}).get("swid")
-        authorized_for_domain_did = data.get("authorizedForDomain", {}).get("swid")
-        credential_domain_name = data.get("authorizedForDomain", {}).get("name")
-        access_authorization_did = data.get("accessAuthorization", {}).get("swid")
-        if not (issued_by_did and authorized_for_domain_did and access_authorization_did):
-            raise ValueError("Missing required 'swid' in Credential fields")
-        if issued_by_did != registered_by:
-            raise ValueError("issuedBy field must match the User registering the Credential")
-        private_key_path_credential_domain = input(f"Provide your private_key.pem path for '{credential_domain_name}' this Credential is giving access to: ")
-        credential_domain_did = extract_did_from_private_key(private_key_path_credential_domain)
-        if credential_domain_did != authorized_for_domain_did:
-            print(f"Invalid private_key.pem for '{credential_domain_name}'")
-            return None
-        
-        cursor.execute("SELECT metadata FROM did_keys WHERE did = %s", (authorized_for_domain_did,))
-        domain_did_result = cursor.fetchone()
-        if not domain_did_result:
-            print(f"DID not found in database. Please register '{credential_domain_name}' first.")
-            return None
-
-        domain_data = json.loads(domain_did_result[0])
-        new_access_auth = data.get("accessAuthorization", {})
-        if "canAccess" not in domain_data:
-            domain_data["canAccess"] = [new_access_auth]
-        else:
-            existing_can_access = domain_data.get("canAccess", [])
-            if not isinstance(existing_can_access, list):
-                existing_can_access = [existing_can_access]
-            existing_swids = {entry["swid"] for entry in existing_can_access if "swid" in entry}
-            if new_access_auth.get("swid") and new_access_auth["swid"] not in existing_swids:
-                existing_can_access.append(new_access_auth)
-            else:
-                print(f"{new_access_auth.get('swid')} already has access to '{credential_domain_name}'")
-            domain_data["canAccess"] = existing_can_access
-        
-        cursor.execute("UPDATE did_keys SET metadata = %s WHERE did = %s", (json.dumps(domain_data), authorized_for_domain_did))
-        domain_json_output = os.path.join(output_directory, f"{domain_data['name'].replace(' ', '_')}.json")
-        with open(domain_json_output, "w") as json_file:
-            json.dump(data, json_file, indent=4)
-        print(f"Updated {credential_domain_name} JSON saved to: {domain_json_output}")
-        
-        cursor.execute("SELECT allowed_did FROM did_keys WHERE did = %s", (authorized_for_domain_did,))
-        allowed_did_result = cursor.fetchone()
-        if allowed_did_result and allowed_did_result[0]:
-            allowed_did_list = allowed_did_result[0].split(",")
-        else:
-            allowed_did_list = []
-        new_did = new_access_auth.get("swid")
-        if new_did and new_did not in allowed_did_list:
-            allowed_did_list.append(new_did)
-        allowed_did_string = ",".join(allowed_did_list)
-        cursor.execute("UPDATE did_keys SET allowed_did = %s WHERE did = %s", (allowed_did_string, authorized_for_domain_did))
-
-    cursor.execute(
-        "REPLACE INTO did_keys (did, public_key, metadata, registered_by, kafka_topic) VALUES (%s, %s, %s, %s, %s)",
-        (did_key, public_key_part, json.dumps(data), registered_by, topic_name)
-    )
-    db.commit()
-    db.close()
-
-    private_key_output = os.path.join(output_directory, "private_key.pem")
-    json_output = os.path.join(output_directory, f"{data['name'].replace(' ', '_')}.json")
-
-    with open(private_key_output, "w") as private_key_file:
-        private_key_file.write(private_key)
-    with open(json_output, "w") as json_file:
-        json.dump(data, json_file, indent=4)
 
-    print(f"Private key saved to: {private_key_output}")
-    print(f"Updated JSON saved to: {json_output}")
+    entry = None
+    try:
+        # One pooled connection for the whole registration, always returned to the pool
+        db = connect_db()
+        try:
+            cursor = db.cursor()
+
+            swid = data.get("swid")
+            if swid:
+                cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (swid,))
+                existing = cursor.fetchone()[0]
+                if existing and not overwrite:
+                    return {"status": "error", "requires": "overwrite",
+                            "message": f"The provided 'swid' ({swid}) already exists in the database. No changes were made."}
+                if instrumentation.VERBOSE:
+                    print(f"Warning: SWID '{swid}' in JSON file will be overwritten.")
+
+            # Credentials are checked before a DID is spent on them
+            if entity_type == "Credential":
+                error = _check_credential(cursor, data, registered_by, domain_private_key)
+                if error:
+                    return error
+
+            # Minted on this connection: a second pooled connection here can deadlock a small pool
+            did_key, private_key = generate_did_key(cursor)
+            data["swid"] = did_key
+            if instrumentation.VERBOSE:
+                print(f"Generated unique SWID: {did_key}")
+            public_key_part = did_key.replace("did:key:", "")
+
+            if registered_by is None:
+                registered_by = did_key
+
+            topic_name = None
+            if entity_type == "Agent":
+                topic_name = data["name"].replace(" ", "_").lower()
+
+            # Durable intent record before any side effect; a crash from here on is replayed from it
+            if journal is not None:
+                grant = None
+                if entity_type == "Credential":
+                    grant = [data["authorizedForDomain"]["swid"], data["accessAuthorization"]["swid"], did_key]
+                entry = journal.begin([{"item": None, "did": did_key, "private_key": private_key, "data": data,
+                                        "registered_by": registered_by, "topic": topic_name, "grant": grant}],
+                                      output_directory, replayable=write_json is None)
+
+            if topic_name is not None:
+                with span("kafka.publish"):
+                    if event_pipeline is not None:
+                        event_pipeline.publish_agent(topic_name, data["name"])
+                    else:
+                        create_kafka_topic(topic_name)
+                        send_kafka_message(topic_name, {"message": f"New Agent registered: {data['name']}"})
+            if entry is not None:
+                journal.stage(entry, "kafka")
+
+            if entity_type == "Credential":
+                # Grants live in the access_grants table; one atomic insert, no metadata rewrite.
+                # The Credential itself is stored under its own DID like any other entity.
+                authorized_for_domain_did = data["authorizedForDomain"]["swid"]
+                credential_domain_name = data["authorizedForDomain"].get("name")
+                new_did = data["accessAuthorization"]["swid"]
+                granted = grant_access(cursor, authorized_for_domain_did, new_did, did_key)
+                if instrumentation.VERBOSE:
+                    if granted:
+                        print(f"{new_did} can now access '{credential_domain_name}'")
+                    else:
+                        print(f"{new_did} already has access to '{credential_domain_name}'")
+
+            with span("db.write"):
+                cursor.execute(
+                    "REPLACE INTO did_keys (did, public_key, metadata, registered_by, kafka_topic) VALUES (%s, %s, %s, %s, %s)",
+                    (did_key, public_key_part, json.dumps(data), registered_by, topic_name)
+                )
+                index_entity(cursor, did_key, data, registered_by)
+                record_registry_change(cursor, "register")
+                db.commit()
+            if entry is not None:
+                journal.stage(entry, "db")
+        finally:
+            db.close()
+        invalidate_did(did_key)
+
+        # Artifacts are stored under the DID, so entities sharing a name never overwrite each other
+        with span("artifacts.write"):
+            json_output, private_key_output = open_artifact_store(output_directory).put(did_key, data, private_key, write_json)
+        if entry is not None:
+            journal.done(entry)
+    except Exception:
+        # Undone now rather than replayed at the next start (see registration_journal.abort_registration)
+        if entry is not None:
+            from registration_journal import abort_registration
+            abort_registration(journal, entry)
+        raise
+    # Added once nothing can roll the registration back
+    if entity_graph is not None:
+        entity_graph.add_entity(did_key, data, registered_by, changes=1)
+
+    increment("entities_registered")
+    if instrumentation.VERBOSE:
+        print(f"Private key saved to: {private_key_output}")
+        print(f"Updated JSON saved to: {json_output}")
 
     return {
         "status": "success",
         "message": "Entity registered successfully",
         "did_key": did_key,
         "private_key_path": private_key_output,
-        "updated_json_path": json_output
+        "updated_json_path": json_output,
+        "private_key": private_key
     }
 
-# Example usage
-if __name__ == "__main__":
+# Function to register a file interactively, asking for whatever the engine needs
+def register_entity_interactive(json_file_path, output_directory, registered_by=None):
+    policy = {}
+    while True:
+        result = register_entity(json_file_path, output_directory, registered_by=registered_by, **policy)
+        requires = result.get("requires")
+        if requires == "overwrite":
+            print(f"Warning: {result['message']} You should not register an already existing object.")
+            user_input = input("Do you want to continue and overwrite the existing 'swid' property? (yes/no): ").strip().lower()
+            if user_input != "yes":
+                print("Process aborted. No changes were made.")
+                return result
+            policy["overwrite"] = True
+        elif requires == "domain_private_key":
+            private_key_path_credential_domain = input(f"{result['message']}. Provide its private_key.pem path: ")
+            with open(private_key_path_credential_domain, "rb") as key_file:
+                policy["domain_private_key"] = key_file.read()
+        else:
+            return result
+
+def main():
+    prepare_registry_changes()
+    output_directory = "C:/Users/abarrio/OneDrive - JPL/Desktop/Digital Twin Interoperability/Codes/HSML Examples/registeredExamples"
     user_did = login_or_register()
     if user_did is not None:
         json_file_path = input("Enter the directory to your HSML JSON to be registered: ")
-        output_directory = "C:/Users/abarrio/OneDrive - JPL/Desktop/Digital Twin Interoperability/Codes/HSML Examples/registeredExamples"
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-        result = register_entity(json_file_path, output_directory, registered_by=user_did)
-        print(result)
     else:
         while True:
             json_file_path = input("Enter the directory to your Person/Organization HSML JSON to be registered: ")
@@ -348,8 +604,11 @@ if __name__ == "__main__":
                 print("Error: You can only register a Person or Organization as a new user.")
                 continue
             break
-        output_directory = "C:/Users/abarrio/OneDrive - JPL/Desktop/Digital Twin Interoperability/Codes/HSML Examples/registeredExamples"
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-        result = register_entity(json_file_path, output_directory, registered_by=None)
-        print(result)
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+    result = register_entity_interactive(json_file_path, output_directory, registered_by=user_did)
+    print(result)
+
+# Example usage
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+
+from entity_graph import ensure_registry_changes, record_registry_change
+
+# -----------------------------
+# Access-grant store
+# -----------------------------
+# One row per (domain DID, grantee DID), replacing the canAccess list rewritten
+# inside the domain's metadata blob and the comma-separated allowed_did column.
+# The composite primary key gives indexed membership checks, and INSERT IGNORE
+# makes each grant a single atomic statement, so concurrent Credential
+# registrations cannot lose each other's grants.
+#
+# Grants stored the old way are imported once: the import reads did_keys without
+# an index, so its completion is recorded in registry_migrations and later
+# starts skip it. Run "python access_grants.py" to import them again.
+
+ACCESS_GRANTS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS access_grants ("
+    "domain_did VARCHAR(128) NOT NULL, "
+    "grantee_did VARCHAR(128) NOT NULL, "
+    "credential_did VARCHAR(128), "
+    "PRIMARY KEY (domain_did, grantee_did))"
+)
+
+# One row per one-time data migration that has completed
+MIGRATIONS_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS registry_migrations ("
+    "name VARCHAR(64) NOT NULL PRIMARY KEY)"
+)
+LEGACY_GRANTS_MIGRATION = "legacy_grants"
+
+def _connect_db():
+    from Registration_API_v6 import connect_db
+    return connect_db()
+
+# Function to create the access_grants (and migration record) tables if they do not exist
+def ensure_schema(cursor):
+    cursor.execute(ACCESS_GRANTS_SCHEMA)
+    cursor.execute(MIGRATIONS_SCHEMA)
+
+# Function to record that grantee_did can access domain_did
+def grant_access(cursor, domain_did, grantee_did, credential_did=None):
+    """Atomically adds a grant; returns False if the grantee already had access"""
+    cursor.execute(
+        "INSERT IGNORE INTO access_grants (domain_did, grantee_did, credential_did) VALUES (%s, %s, %s)",
+        (domain_did, grantee_did, credential_did)
+    )
+    return getattr(cursor, "rowcount", 1) != 0
+
+# Function to record many grants with one statement
+def grant_access_many(cursor, grants):
+    """Adds (domain_did, grantee_did, credential_did) grants with a multi-row INSERT IGNORE; returns how many were new"""
+    grants = list(grants)
+    if not grants:
+        return 0
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(grants))
+    cursor.execute(
+        f"INSERT IGNORE INTO access_grants (domain_did, grantee_did, credential_did) VALUES {placeholders}",
+        tuple(value for grant in grants for value in grant)
+    )
+    return getattr(cursor, "rowcount", len(grants))
+
+# Function to answer "can X access Y?"
+def can_access(grantee_did, domain_did, cursor=None):
+    """Returns True if grantee_did has been granted access to domain_did (one primary-key lookup)"""
+    if cursor is not None:
+        cursor.execute("SELECT 1 FROM access_grants WHERE domain_did = %s AND grantee_did = %s", (domain_did, grantee_did))
+        return bool(cursor.fetchone())
+    db = _connect_db()
+    try:
+        return can_access(grantee_did, domain_did, db.cursor())
+    finally:
+        db.close()
+
+# Function to list who can access a domain
+def list_grantees(domain_did, cursor=None):
+    """Returns the DIDs granted access to domain_did"""
+    if cursor is not None:
+        cursor.execute("SELECT grantee_did FROM access_grants WHERE domain_did = %s", (domain_did,))
+        return [row[0] for row in cursor.fetchall()]
+    db = _connect_db()
+    try:
+        return list_grantees(domain_did, db.cursor())
+    finally:
+        db.close()
+
+# Function to import grants stored the old way (allowed_did string and canAccess lists)
+def migrate_legacy_grants(cursor):
+    """Copies every allowed_did / canAccess entry from did_keys into access_grants; returns the count read"""
+    cursor.execute("SELECT did, metadata, allowed_did FROM did_keys WHERE allowed_did IS NOT NULL OR metadata LIKE %s",
+                   ("%canAccess%",))
+    grants = set()
+    for domain_did, metadata, allowed_did in cursor.fetchall():
+        if allowed_did:
+            grants.update((domain_did, grantee) for grantee in allowed_did.split(",") if grantee)
+        try:
+            can_access_list = json.loads(metadata).get("canAccess", []) if metadata else []
+        except (ValueError, AttributeError):
+            can_access_list = []
+        if not isinstance(can_access_list, list):
+            can_access_list = [can_access_list]
+        grants.update((domain_did, entry["swid"]) for entry in can_access_list if isinstance(entry, dict) and entry.get("swid"))
+    grants = sorted(grants)
+    imported = 0
+    for start in range(0, len(grants), 500):
+        imported += grant_access_many(cursor, [(domain, grantee, None) for domain, grantee in grants[start:start + 500]])
+    # Grants imported on an earlier start are ignored and leave the registry version (and graph snapshot) alone
+    if imported:
+        record_registry_change(cursor, "grants")
+    return len(grants)
+
+# Function to get the grant table ready (the web apps run this at startup)
+def prepare_access_grants(force=False):
+    """Creates access_grants if needed and imports legacy grants unless an earlier start did.
+
+    force=True imports them again. Returns the number of legacy grants read (0 when the
+    import was skipped; already imported ones are ignored by INSERT IGNORE).
+    """
+    db = _connect_db()
+    try:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        ensure_registry_changes(cursor)
+        cursor.execute("SELECT 1 FROM registry_migrations WHERE name = %s", (LEGACY_GRANTS_MIGRATION,))
+        if cursor.fetchone() and not force:
+            db.commit()
+            return 0
+        count = migrate_legacy_grants(cursor)
+        cursor.execute("INSERT IGNORE INTO registry_migrations (name) VALUES (%s)", (LEGACY_GRANTS_MIGRATION,))
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print(f"Imported {prepare_access_grants(force=True)} legacy grants into access_grants.")
@@ -1,17 +1,34 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, make_response
-import json, os
-from CLItool import extract_did_from_private_key
-from Registration_API_v6 import generate_did_key  # Do not change Registration_API_v6.py
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response, session, jsonify, g
+import atexit
+import json, time
+import instrumentation
+import registry_service
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"  # Set your secret key for session management
 
+# DID:key pool, Kafka event pipeline, access grants, journal and entity graph (see registry_service.py);
+# flushed and saved on exit
+registry_service.start_services()
+atexit.register(registry_service.stop_services)
+
+# Per-endpoint latency, reported on /metrics as "http.<endpoint>"
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    if request.endpoint and request.endpoint != 'metrics':
+        instrumentation.observe(f"http.{request.endpoint}", time.perf_counter() - g.request_started)
+    return response
+
 # Landing page offering login or register
 @app.route('/')
 def landing():
     return render_template('landing.html')
 
-# Login: upload a .pem file, decode using CLItool.py
+# Login: upload a .pem file; the DID is derived in memory
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     error = None
@@ -24,50 +41,71 @@ def login():
             error = "No selected file"
             return render_template('login.html', error=error)
         if file:
-            # Save the uploaded file temporarily
-            temp_dir = "temp"
-            os.makedirs(temp_dir, exist_ok=True)
-            filepath = os.path.join(temp_dir, file.filename)
-            file.save(filepath)
             try:
-                user_did = extract_did_from_private_key(filepath)
-                # Here you would normally check the DID against your DB.
-                flash(f"Login successful. Your DID: {user_did}")
+                user_did, message = registry_service.login_with_pem(file.read())
+                session["user_did"] = user_did
+                flash(message)
                 return redirect(url_for('create_hsml'))
             except Exception as e:
                 error = f"Error processing .pem file: {str(e)}"
-            finally:
-                os.remove(filepath)
     return render_template('login.html', error=error)
 
 # Registration: show a modified HSML creation form (only Person or Organization)
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
-        hsml_type = request.form.get('hsml_type')
-        hsml_obj = {
-            "@context": "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld",
-            "@type": hsml_type
-        }
-        if hsml_type == "Person":
-            hsml_obj["name"] = request.form.get('name')
-            hsml_obj["birthDate"] = request.form.get('birth_date')
-            hsml_obj["email"] = request.form.get('email')
-        elif hsml_type == "Organization":
-            hsml_obj["name"] = request.form.get('org_name')
-            hsml_obj["description"] = request.form.get('description')
-        # Generate DID:key and private key using the CLI tool via Registration_API_v6.py
+        # Generate DID:key and private key in-process
         try:
-            did_key, private_key = generate_did_key()
+            hsml_obj, private_key = registry_service.new_user_document(request.form)
         except Exception as e:
             flash(f"Error generating DID key: {str(e)}")
             return redirect(url_for('register'))
-        hsml_obj["swid"] = did_key  # Attach the generated DID to the HSML JSON
         hsml_json_str = json.dumps(hsml_obj, indent=2)
         # Render the result page with the HSML JSON and pass along the private key content
         return render_template("result.html", json_str=hsml_json_str, private_key=private_key)
     return render_template('register.html')
 
+# JSON registration API: POST one HSML document (or {"document", "overwrite", "domain_private_key"})
+@app.route('/api/register', methods=['POST'])
+def register_json():
+    body, status = registry_service.register_json(request.get_json(silent=True), session.get("user_did"))
+    return jsonify(body), status
+
+# Batch registration API: POST a JSON array or JSON Lines of HSML documents
+@app.route('/api/register/batch', methods=['POST'])
+def register_batch():
+    json_body = request.get_json(silent=True) if request.mimetype == "application/json" else None
+    text = request.get_data(as_text=True) if request.mimetype != "application/json" else None
+    body, status = registry_service.register_batch(request.mimetype, json_body, text, session.get("user_did"))
+    return jsonify(body), status
+
+# Access check API: can the `grantee` DID access the `domain` DID?
+@app.route('/api/can_access')
+def check_access():
+    body, status = registry_service.check_access(request.args)
+    return jsonify(body), status
+
+# Entity query API: filter on indexed fields, paginate with the returned cursor
+@app.route('/api/entities')
+def list_entities():
+    body, status = registry_service.list_entities(request.args)
+    return jsonify(body), status
+
+# Graph API: multi-hop queries over linkedTo / registered_by / Credential edges
+@app.route('/api/graph')
+def graph_query():
+    body, status = registry_service.graph_query(request.args)
+    return jsonify(body), status
+
+# Metrics: stage latency histograms, counters, and pool / cache / pipeline / graph state.
+# JSON by default; ?format=prometheus for the Prometheus text format
+@app.route('/metrics')
+def metrics():
+    report = registry_service.metrics_report()
+    if request.args.get('format') == 'prometheus':
+        return instrumentation.render_prometheus(report), 200, {"Content-Type": registry_service.PROMETHEUS_CONTENT_TYPE}
+    return jsonify(report)
+
 # HSML creation form (full functionality) available after login
 @app.route('/create')
 def create_hsml():
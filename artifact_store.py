@@ -0,0 +1,332 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in different processes are not serialized
+    fcntl = None
+
+# -----------------------------
+# Registration artifact store
+# -----------------------------
+# Every registration produces two artifacts: the updated HSML JSON and the
+# private key PEM. They are stored under the entity's DID, so nothing is ever
+# overwritten by another entity with the same name:
+#
+#   ArtifactStore: <root>/<2 hex chars of sha256(did)>/<did id>.json and .pem
+#   ArtifactPack:  one append-only <root>/artifacts.pack plus an artifacts.pack.idx
+#                  index (did -> offset) for random access
+#
+# Writes are atomic (temp file + rename, or index-committed pack records) and
+# batched: put_many() syncs each touched directory, or the pack and its index,
+# once per batch instead of once per file. JSON is compact unless pretty=True.
+#
+# Several processes (web workers, bulk imports) may append to the same pack. Each
+# append and each recovery holds an exclusive lock on <pack>.lock, and first reads
+# the index lines other processes committed since its last look. So under the lock,
+# anything past the last committed record was left by a writer that died, and it
+# is safe to cut off. get() rereads the index tail on a miss.
+
+PACK_MAGIC = b"HSMLPAK1"
+_RECORD_MARKER = b"HREC"
+_RECORD_HEADER = struct.Struct("<4sHQI")
+
+def _encode_json(data, pretty):
+    if pretty:
+        return json.dumps(data, indent=4).encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def _fsync_directory(directory):
+    # Directories cannot be opened for fsync on Windows; NTFS journals the rename itself
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ArtifactStore:
+    """One JSON file and one PEM file per DID in a sharded directory tree"""
+    def __init__(self, root, pretty=False, sync=True):
+        self.root = root
+        self.pretty = pretty
+        self.sync = sync
+        self._directories = set()
+        os.makedirs(root, exist_ok=True)
+
+    # Function to find where a DID's artifacts live
+    def paths(self, did):
+        """Returns (json_path, private_key_path) for a DID"""
+        name = did.replace("did:key:", "").replace(":", "_")
+        shard = hashlib.sha256(did.encode("utf-8")).hexdigest()[:2]
+        directory = os.path.join(self.root, shard)
+        return os.path.join(directory, f"{name}.json"), os.path.join(directory, f"{name}.pem")
+
+    def _write(self, path, write, mode=0o644):
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), mode)
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+            if self.sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    # Function to store the artifacts of many registrations
+    def put_many(self, items):
+        """Stores (did, data, private_key, write_json) tuples; returns [(json_path, private_key_path), ...]
+
+        write_json(file, data), when given, writes the JSON into the open binary file
+        itself (the streaming path copies a large document straight through).
+        """
+        locations = []
+        touched = set()
+        for did, data, private_key, write_json in items:
+            json_path, key_path = self.paths(did)
+            directory = os.path.dirname(json_path)
+            if directory not in self._directories:
+                if not os.path.isdir(directory):
+                    os.makedirs(directory, exist_ok=True)
+                    touched.add(self.root)
+                self._directories.add(directory)
+            self._write(key_path, lambda file: file.write(private_key.encode("utf-8")), mode=0o600)
+            if write_json is None:
+                payload = _encode_json(data, self.pretty)
+                self._write(json_path, lambda file: file.write(payload))
+            else:
+                self._write(json_path, lambda file: write_json(file, data))
+            touched.add(directory)
+            locations.append((json_path, key_path))
+        if self.sync:
+            for directory in sorted(touched):
+                _fsync_directory(directory)
+        return locations
+
+    def put(self, did, data, private_key, write_json=None):
+        return self.put_many([(did, data, private_key, write_json)])[0]
+
+    # Function to read a DID's artifacts back
+    def get(self, did):
+        """Returns (data, private_key) for a stored DID; raises KeyError if it is not stored"""
+        json_path, key_path = self.paths(did)
+        try:
+            with open(json_path, "rb") as json_file:
+                data = json.load(json_file)
+            with open(key_path, "r") as key_file:
+                return data, key_file.read()
+        except FileNotFoundError:
+            raise KeyError(did)
+
+    def __contains__(self, did):
+        return os.path.exists(self.paths(did)[0])
+
+class ArtifactPack:
+    """Append-only archive of (did, json, pem) records with a did -> offset index.
+
+    read_only=True opens an existing pack for reading: nothing is created, locked or
+    truncated, and only records the index has committed are visible (safe while
+    writers are running).
+    """
+    def __init__(self, path, pretty=False, sync=True, read_only=False):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.pretty = pretty
+        self.sync = sync
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._index = {}
+        # Bytes of the index file read so far, and the end of the last committed record
+        self._index_end = 0
+        self._end = len(PACK_MAGIC)
+        self._lock_file = None
+        if read_only:
+            self._file = open(path, "rb")
+            if self._file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                self._file.close()
+                raise ValueError(f"{path} is not an artifact pack")
+            self._read_index()
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(f"{path}.lock", "ab")
+        with self._exclusive():
+            if not os.path.exists(path):
+                with open(path, "wb") as file:
+                    file.write(PACK_MAGIC)
+                    file.flush()
+                    os.fsync(file.fileno())
+                _fsync_directory(directory)
+            self._file = open(path, "r+b")
+            if self._file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                self._file.close()
+                self._lock_file.close()
+                raise ValueError(f"{path} is not an artifact pack")
+            self._recover()
+
+    @contextmanager
+    def _exclusive(self):
+        # Serializes appends and recovery with other processes using this pack
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _record_end(self, offset):
+        self._file.seek(offset)
+        marker, did_length, json_length, key_length = _RECORD_HEADER.unpack(self._file.read(_RECORD_HEADER.size))
+        if marker != _RECORD_MARKER:
+            raise ValueError(f"Corrupt artifact pack record at offset {offset}")
+        return offset + _RECORD_HEADER.size + did_length + json_length + key_length
+
+    def _read_index(self):
+        # Index lines committed since the last call, by this process or another; returns [(did, offset)]
+        try:
+            with open(self.index_path, "rb") as index_file:
+                index_file.seek(self._index_end)
+                committed = index_file.read()
+        except FileNotFoundError:
+            return []
+        committed = committed[:committed.rfind(b"\n") + 1]
+        self._index_end += len(committed)
+        entries = []
+        for line in committed.decode("utf-8").splitlines():
+            did, offset = line.rsplit("\t", 1)
+            entries.append((did, int(offset)))
+        self._index.update(entries)
+        # Another process may have rewritten bytes this file object still has buffered
+        # (a dead writer's tail); seeking to the end drops the read buffer
+        self._file.seek(0, os.SEEK_END)
+        return entries
+
+    def _recover(self):
+        # Called under the exclusive lock. The index is the commit record: records written
+        # after the last indexed one belong to a batch that never finished and are cut off,
+        # as is a torn index line
+        for _, offset in self._read_index():
+            self._end = max(self._end, self._record_end(offset))
+        if os.path.getsize(self.path) > self._end:
+            self._file.truncate(self._end)
+        with open(self.index_path, "ab") as index_file:
+            if index_file.tell() > self._index_end:
+                index_file.truncate(self._index_end)
+
+    # Function to append the artifacts of many registrations
+    def put_many(self, items):
+        """Appends (did, data, private_key, write_json) records with one sync of the pack and one of the index"""
+        if self.read_only:
+            raise ValueError(f"{self.path} is open read-only")
+        entries = []
+        with self._lock, self._exclusive():
+            self._recover()
+            self._file.seek(self._end)
+            for did, data, private_key, write_json in items:
+                offset = self._file.tell()
+                did_bytes = did.encode("utf-8")
+                key_bytes = private_key.encode("utf-8")
+                if write_json is None:
+                    payload = _encode_json(data, self.pretty)
+                    self._file.write(_RECORD_HEADER.pack(_RECORD_MARKER, len(did_bytes), len(payload), len(key_bytes)))
+                    self._file.write(did_bytes)
+                    self._file.write(payload)
+                else:
+                    # Length is not known until the document has been streamed in; patch the header after
+                    self._file.write(_RECORD_HEADER.pack(_RECORD_MARKER, len(did_bytes), 0, len(key_bytes)))
+                    self._file.write(did_bytes)
+                    start = self._file.tell()
+                    write_json(self._file, data)
+                    json_length = self._file.tell() - start
+                    self._file.seek(offset)
+                    self._file.write(_RECORD_HEADER.pack(_RECORD_MARKER, len(did_bytes), json_length, len(key_bytes)))
+                    self._file.seek(0, os.SEEK_END)
+                self._file.write(key_bytes)
+                entries.append((did, offset))
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            index_lines = "".join(f"{did}\t{offset}\n" for did, offset in entries).encode("utf-8")
+            with open(self.index_path, "ab") as index_file:
+                index_file.write(index_lines)
+                if self.sync:
+                    index_file.flush()
+                    os.fsync(index_file.fileno())
+            self._index.update(entries)
+            self._index_end += len(index_lines)
+            self._end = self._file.tell()
+        return [(self.path, self.path) for _ in entries]
+
+    def put(self, did, data, private_key, write_json=None):
+        return self.put_many([(did, data, private_key, write_json)])[0]
+
+    # Function to read one DID's record
+    def get(self, did):
+        """Returns (data, private_key) for a stored DID; raises KeyError if it is not stored"""
+        with self._lock:
+            offset = self._index.get(did)
+            if offset is None:
+                # Possibly appended by another process since the last look
+                self._read_index()
+                offset = self._index[did]
+            self._file.seek(offset)
+            _, did_length, json_length, key_length = _RECORD_HEADER.unpack(self._file.read(_RECORD_HEADER.size))
+            self._file.seek(did_length, os.SEEK_CUR)
+            payload = self._file.read(json_length)
+            private_key = self._file.read(key_length).decode("utf-8")
+        return json.loads(payload), private_key
+
+    def __contains__(self, did):
+        with self._lock:
+            if did not in self._index:
+                self._read_index()
+            return did in self._index
+
+    def __len__(self):
+        with self._lock:
+            self._read_index()
+            return len(self._index)
+
+    def dids(self):
+        with self._lock:
+            self._read_index()
+            return list(self._index)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+
+# Stores are shared per output directory so a pack keeps one open file and index
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _env_flag(name, default):
+    return os.environ.get(name, "1" if default else "0").lower() in ("1", "true", "yes")
+
+# Function to get the artifact store for an output directory
+def open_artifact_store(output_directory, pack=None, pretty=None, sync=None):
+    """Returns the shared store for output_directory.
+
+    Defaults come from HSML_ARTIFACT_PACK (artifacts.pack instead of files),
+    HSML_ARTIFACT_PRETTY (indented JSON) and HSML_ARTIFACT_SYNC (fsync, on by default).
+    """
+    pack = _env_flag("HSML_ARTIFACT_PACK", False) if pack is None else pack
+    pretty = _env_flag("HSML_ARTIFACT_PRETTY", False) if pretty is None else pretty
+    sync = _env_flag("HSML_ARTIFACT_SYNC", True) if sync is None else sync
+    key = (os.path.abspath(output_directory), pack, pretty, sync)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if pack:
+                store = ArtifactPack(os.path.join(output_directory, "artifacts.pack"), pretty=pretty, sync=sync)
+            else:
+                store = ArtifactStore(output_directory, pretty=pretty, sync=sync)
+            _stores[key] = store
+        return store
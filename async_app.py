@@ -0,0 +1,155 @@
+from quart import Quart, render_template, request, redirect, url_for, flash, make_response, session, jsonify, g
+import asyncio
+import json, os, time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import Registration_API_v6
+import instrumentation
+import registry_service
+
+# -----------------------------
+# Asynchronous (ASGI) version of app.py
+# -----------------------------
+# Same pages and APIs as the Flask app (both built on registry_service.py),
+# served on an event loop so one worker handles many requests at once. Key work
+# (PEM parsing, DID minting, graph walks) runs on `cpu_executor`; registry
+# queries run on `db_executor`, sized to the database connection pool so
+# requests queue for a connection without blocking the loop. Kafka traffic goes
+# through the asynchronous event pipeline.
+# Run with: uvicorn async_app:app --workers 4
+
+app = Quart(__name__)
+app.secret_key = "your_secret_key"  # Set your secret key for session management
+
+cpu_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="hsml-cpu")
+db_executor = ThreadPoolExecutor(max_workers=Registration_API_v6.db_pool.size, thread_name_prefix="hsml-db")
+
+async def run_cpu(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, partial(fn, *args, **kwargs))
+
+async def run_db(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+# DID:key pool, Kafka event pipeline, access grants, journal and entity graph (see registry_service.py)
+@app.before_serving
+async def start_services():
+    await run_db(registry_service.start_services)
+
+@app.after_serving
+async def stop_services():
+    await run_db(registry_service.stop_services)
+
+# Per-endpoint latency, reported on /metrics as "http.<endpoint>"
+@app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def record_latency(response):
+    if request.endpoint and request.endpoint != 'metrics':
+        instrumentation.observe(f"http.{request.endpoint}", time.perf_counter() - g.request_started)
+    return response
+
+# Landing page offering login or register
+@app.route('/')
+async def landing():
+    return await render_template('landing.html')
+
+# Login: upload a .pem file; the DID is derived in memory
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    error = None
+    if request.method == 'POST':
+        files = await request.files
+        if 'pem_file' not in files:
+            error = "No file part"
+            return await render_template('login.html', error=error)
+        file = files['pem_file']
+        if file.filename == '':
+            error = "No selected file"
+            return await render_template('login.html', error=error)
+        if file:
+            try:
+                user_did, message = await run_db(registry_service.login_with_pem, file.read())
+                session["user_did"] = user_did
+                await flash(message)
+                return redirect(url_for('create_hsml'))
+            except Exception as e:
+                error = f"Error processing .pem file: {str(e)}"
+    return await render_template('login.html', error=error)
+
+# Registration: show a modified HSML creation form (only Person or Organization)
+@app.route('/register', methods=['GET', 'POST'])
+async def register():
+    if request.method == 'POST':
+        form = await request.form
+        try:
+            hsml_obj, private_key = await run_cpu(registry_service.new_user_document, form)
+        except Exception as e:
+            await flash(f"Error generating DID key: {str(e)}")
+            return redirect(url_for('register'))
+        hsml_json_str = json.dumps(hsml_obj, indent=2)
+        return await render_template("result.html", json_str=hsml_json_str, private_key=private_key)
+    return await render_template('register.html')
+
+# JSON registration API: POST one HSML document (or {"document", "overwrite", "domain_private_key"})
+@app.route('/api/register', methods=['POST'])
+async def register_json():
+    document = await request.get_json(silent=True)
+    body, status = await run_db(registry_service.register_json, document, session.get("user_did"))
+    return jsonify(body), status
+
+# Batch registration API: POST a JSON array or JSON Lines of HSML documents
+@app.route('/api/register/batch', methods=['POST'])
+async def register_batch():
+    json_body = await request.get_json(silent=True) if request.mimetype == "application/json" else None
+    text = await request.get_data(as_text=True) if request.mimetype != "application/json" else None
+    body, status = await run_db(registry_service.register_batch, request.mimetype, json_body, text,
+                                session.get("user_did"))
+    return jsonify(body), status
+
+# Access check API: can the `grantee` DID access the `domain` DID?
+@app.route('/api/can_access')
+async def check_access():
+    body, status = await run_db(registry_service.check_access, request.args)
+    return jsonify(body), status
+
+# Entity query API: filter on indexed fields, paginate with the returned cursor
+@app.route('/api/entities')
+async def list_entities():
+    body, status = await run_db(registry_service.list_entities, request.args)
+    return jsonify(body), status
+
+# Graph API: multi-hop queries over linkedTo / registered_by / Credential edges
+@app.route('/api/graph')
+async def graph_query():
+    body, status = await run_cpu(registry_service.graph_query, request.args)
+    return jsonify(body), status
+
+# Metrics: stage latency histograms, counters, and pool / cache / pipeline / graph state.
+# JSON by default; ?format=prometheus for the Prometheus text format
+@app.route('/metrics')
+async def metrics():
+    report = registry_service.metrics_report()
+    if request.args.get('format') == 'prometheus':
+        return instrumentation.render_prometheus(report), 200, {"Content-Type": registry_service.PROMETHEUS_CONTENT_TYPE}
+    return jsonify(report)
+
+# HSML creation form (full functionality) available after login
+@app.route('/create')
+async def create_hsml():
+    return await render_template('index.html')
+
+# Endpoint to serve the private key file for download (if desired)
+@app.route('/download_key')
+async def download_key():
+    private_key = request.args.get('key')
+    if not private_key:
+        return "No key provided", 400
+    response = await make_response(private_key)
+    response.headers["Content-Disposition"] = "attachment; filename=mykey.pem"
+    response.headers["Content-Type"] = "application/octet-stream"
+    return response
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,79 @@
+"""Benchmark for the access_grants store on a domain holding 100k+ grants.
+
+Compares atomic grant inserts and "can X access Y?" lookups against the old
+comma-separated allowed_did read-modify-write, on the local SQLite stand-in.
+
+Usage: python benchmarks/bench_access_grants.py --grants 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Registration_API_v6 as registration
+from access_grants import can_access, grant_access, grant_access_many
+
+DOMAIN_DID = "did:key:z6MkDomain"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="access_grants benchmark")
+    parser.add_argument("--grants", type=int, default=100000, help="Grants on the benchmark domain")
+    parser.add_argument("--lookups", type=int, default=20000, help="Number of membership checks")
+    parser.add_argument("--legacy-updates", type=int, default=200, help="allowed_did appends to time")
+    args = parser.parse_args()
+
+    registration.SQLiteConnector.path = os.path.join(tempfile.mkdtemp(), "grants.sqlite3")
+    registration.mysql_connector = registration.SQLiteConnector
+    registration.db_pool.close()
+
+    grantees = [f"did:key:z6Mk{uuid.uuid4().hex}" for _ in range(args.grants)]
+    db = registration.connect_db()
+    cursor = db.cursor()
+
+    start = time.perf_counter()
+    for i in range(0, len(grantees), 500):
+        grant_access_many(cursor, [(DOMAIN_DID, grantee, None) for grantee in grantees[i:i + 500]])
+    db.commit()
+    print(f"bulk load      {args.grants} grants in {time.perf_counter() - start:.2f}s")
+
+    extra = [f"did:key:z6Mk{uuid.uuid4().hex}" for _ in range(args.legacy_updates)]
+    start = time.perf_counter()
+    for grantee in extra:
+        grant_access(cursor, DOMAIN_DID, grantee)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    print(f"grant_access   {len(extra) / elapsed:>10.0f} grants/s (one commit each)")
+
+    probes = [grantees[i % len(grantees)] if i % 2 else f"did:key:missing{i}" for i in range(args.lookups)]
+    start = time.perf_counter()
+    hits = sum(1 for grantee in probes if can_access(grantee, DOMAIN_DID, cursor))
+    elapsed = time.perf_counter() - start
+    print(f"can_access     {args.lookups / elapsed:>10.0f} checks/s ({hits} granted)")
+    db.close()
+
+    # Legacy path: read the whole allowed_did string, split, scan, append and write it back
+    allowed_did = ",".join(grantees)
+    start = time.perf_counter()
+    for grantee in extra:
+        allowed_did_list = allowed_did.split(",")
+        if grantee not in allowed_did_list:
+            allowed_did_list.append(grantee)
+        allowed_did = ",".join(allowed_did_list)
+    elapsed = time.perf_counter() - start
+    print(f"legacy append  {len(extra) / elapsed:>10.0f} grants/s (in memory, before any DB write)")
+
+    legacy_probes = probes[:max(1, args.lookups // 100)]
+    start = time.perf_counter()
+    for grantee in legacy_probes:
+        grantee in allowed_did.split(",")
+    elapsed = time.perf_counter() - start
+    print(f"legacy check   {len(legacy_probes) / elapsed:>10.0f} checks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Scaling benchmark for bulk DID derivation / verification (did_audit.py).
+
+Generates N Ed25519 keys, corrupts a few (wrong DID, unreadable PEM), then
+verifies them all with 1, 2, 4, ... worker processes up to the CPU count.
+Reports keys/second, speedup and parallel efficiency against the serial path,
+and checks every run finds exactly the planted mismatches.
+
+Usage: python benchmarks/bench_did_audit.py --keys 200000 --chunk-size 1000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CLItool import generate_did_keys_pem
+from did_audit import verify_dids
+
+
+def synthetic_items(count):
+    items = []
+    keys = generate_did_keys_pem(count)
+    for index, (did_key, pem) in enumerate(keys):
+        pem = pem.encode("utf-8")
+        if index % 10007 == 1:
+            did_key = keys[index - 1][0]  # stored under another entity's DID
+        elif index % 10007 == 2:
+            pem = pem[:40]  # truncated upload
+        items.append((index, did_key, pem))
+    return items
+
+
+def worker_counts(maximum):
+    counts = [1]
+    while counts[-1] * 2 <= maximum:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != maximum:
+        counts.append(maximum)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk DID verification scaling benchmark")
+    parser.add_argument("--keys", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    items = synthetic_items(args.keys)
+    print(f"generated {args.keys} keys in {time.perf_counter() - start:.1f}s")
+    planted = Counter(status for status in ("mismatch", "invalid_key")
+                      for index in range(args.keys)
+                      if index % 10007 == (1 if status == "mismatch" else 2))
+
+    serial_rate = None
+    for workers in worker_counts(args.max_workers):
+        start = time.perf_counter()
+        counts = Counter(result["status"] for result in verify_dids(items, workers=workers, chunk_size=args.chunk_size))
+        rate = args.keys / (time.perf_counter() - start)
+        serial_rate = serial_rate or rate
+        found = all(counts[status] == planted[status] for status in planted)
+        print(f"workers {workers:>3}  {rate:>10.0f} keys/s  speedup {rate / serial_rate:>5.2f}x  "
+              f"efficiency {rate / serial_rate / workers:>5.0%}  "
+              f"{'all planted mismatches found' if found else f'UNEXPECTED {dict(counts)}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Microbenchmarks for did_codec against the generic base58 package.
+
+For N random Ed25519 public keys, times DID encoding, decoding back to the raw
+key, validity checks and the batch calls, each with did_codec and with the
+previous approach (base58.b58encode / b58decode of 0xed01 + key, plus the
+checks the codec makes). Results are checked to be identical.
+
+Usage: python benchmarks/bench_did_codec.py --keys 200000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+import base58
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import did_codec
+
+MULTICODEC = b"\xed\x01"
+
+
+def base58_encode(public_key):
+    return "did:key:" + base58.b58encode(MULTICODEC + public_key).decode("utf-8")
+
+
+def base58_decode(did):
+    if not did.startswith("did:key:"):
+        raise ValueError(did)
+    payload = base58.b58decode(did[len("did:key:"):])
+    if len(payload) != 34 or payload[:2] != MULTICODEC:
+        raise ValueError(did)
+    return payload[2:]
+
+
+def base58_is_valid(did):
+    try:
+        base58_decode(did)
+    except ValueError:
+        return False
+    return True
+
+
+def timed(label, count, call):
+    # Collector pauses would otherwise land on whichever run allocates the most
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    print(f"  {label:<28} {count / elapsed:>12,.0f} DIDs/s  {elapsed / count * 1e6:>6.2f} us each")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DID codec microbenchmarks")
+    parser.add_argument("--keys", type=int, default=200000)
+    args = parser.parse_args()
+    keys = [os.urandom(32) for _ in range(args.keys)]
+    dids = [did_codec.encode_did(key) for key in keys]
+    # Same length, one character changed: half of them decode to a different codec or alphabet error
+    tampered = [did[:-1] + ("1" if did[-1] != "1" else "2") if i % 2 else did[:10] + "0" + did[11:]
+                for i, did in enumerate(dids)]
+
+    print("encode")
+    old = timed("base58 package", args.keys, lambda: [base58_encode(key) for key in keys])
+    new = timed("did_codec.encode_did", args.keys, lambda: [did_codec.encode_did(key) for key in keys])
+    timed("did_codec.encode_dids", args.keys, lambda: did_codec.encode_dids(keys))
+    assert old == new
+
+    print("decode")
+    old = timed("base58 package", args.keys, lambda: [base58_decode(did) for did in dids])
+    new = timed("did_codec.decode_did", args.keys, lambda: [did_codec.decode_did(did) for did in dids])
+    timed("did_codec.decode_dids", args.keys, lambda: did_codec.decode_dids(dids))
+    assert old == new == keys
+
+    print("validate (half tampered)")
+    mixed = dids[::2] + tampered[::2]
+    old = timed("base58 package", len(mixed), lambda: [base58_is_valid(did) for did in mixed])
+    new = timed("did_codec.is_valid_did", len(mixed), lambda: [did_codec.is_valid_did(did) for did in mixed])
+    assert old == new
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmark for entity_graph.EntityGraph.
+
+Registers a synthetic forest of digital twins (linkedTo hierarchies owned through
+registered_by chains, plus chains of access grants) in the local SQLite
+stand-in, then compares graph traversals with the same questions answered by
+per-DID SELECT round-trips. Also times the build, snapshot save and snapshot load.
+
+Usage: python benchmarks/bench_entity_graph.py --entities 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Registration_API_v6 as registration
+from access_grants import grant_access_many
+from entity_graph import EntityGraph, build_graph
+from entity_index import index_entities, query_entities
+
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+
+
+def did(i):
+    return f"did:key:z6Mk{i:044d}"
+
+
+def synthetic_registry(count, organizations, rng):
+    """Each Organization owns one top-level twin; every other twin links to a random earlier twin"""
+    for i in range(count):
+        if i < organizations:
+            yield did(i), {"@context": HSML_CONTEXT, "@type": "Organization", "name": f"Org {i}"}, did(i)
+            continue
+        parent = i - organizations if i < 2 * organizations else rng.randrange(organizations, i)
+        data = {"@context": HSML_CONTEXT, "@type": "Entity", "name": f"Twin {i}", "swid": did(i),
+                "linkedTo": [{"swid": did(parent)}]}
+        yield did(i), data, did(parent)
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<48} {elapsed * 1000:>10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="entity_graph benchmark")
+    parser.add_argument("--entities", type=int, default=1000000)
+    parser.add_argument("--organizations", type=int, default=100)
+    parser.add_argument("--grant-chain", type=int, default=50, help="Length of the transitive access chain")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    registration.SQLiteConnector.path = os.path.join(directory, "graph.sqlite3")
+    registration.mysql_connector = registration.SQLiteConnector
+    registration.db_pool.close()
+
+    rng = random.Random(args.seed)
+    db = registration.connect_db()
+    cursor = db.cursor()
+    start = time.perf_counter()
+    batch = []
+    for entity in synthetic_registry(args.entities, args.organizations, rng):
+        batch.append(entity)
+        if len(batch) == 500:
+            registration.insert_did_keys(cursor, [(d, d[8:], json.dumps(m), r, None) for d, m, r in batch])
+            index_entities(cursor, batch)
+            batch = []
+    registration.insert_did_keys(cursor, [(d, d[8:], json.dumps(m), r, None) for d, m, r in batch])
+    index_entities(cursor, batch)
+    # grantee_0 -> domain 1 -> domain 2 -> ... : each domain may access the next one
+    chain = [did(args.organizations + i) for i in range(args.grant_chain + 1)]
+    grant_access_many(cursor, [(chain[i + 1], chain[i], None) for i in range(args.grant_chain)])
+    db.commit()
+    print(f"loaded {args.entities} entities in {time.perf_counter() - start:.1f}s")
+
+    graph = timed("build graph from did_keys + access_grants", lambda: build_graph(cursor))
+    print(f"  {graph.stats()}")
+    snapshot = os.path.join(directory, "graph.bin")
+    timed("save snapshot", lambda: graph.save(snapshot))
+    print(f"  {os.path.getsize(snapshot) / 1e6:.1f} MB")
+    graph = timed("load snapshot", lambda: EntityGraph.load(snapshot))
+
+    root = did(0)
+    leaf = did(args.entities - 1)
+    descendants = timed("graph: all descendants of an Organization's twin", lambda: graph.descendants(root), repeat=5)
+    print(f"  ({len(descendants)} descendants)")
+    chain_result = timed("graph: ownership chain of the newest twin", lambda: graph.ownership_chain(leaf), repeat=20)
+    print(f"  ({len(chain_result)} hops)")
+    timed(f"graph: transitive access ({args.grant_chain} grants deep)",
+          lambda: graph.can_access(chain[0], chain[-1]), repeat=20)
+
+    def sql_descendants():
+        found, frontier = [], [root]
+        while frontier:
+            next_frontier = []
+            for parent in frontier:
+                token = None
+                while True:
+                    page = query_entities({"linkedTo": parent}, limit=1000, cursor=token, db_cursor=cursor)
+                    next_frontier.extend(page["results"])
+                    token = page["next_cursor"]
+                    if not token:
+                        break
+            found.extend(next_frontier)
+            frontier = next_frontier
+        return found
+    timed("sql: descendants (one indexed query per DID)", sql_descendants)
+
+    def sql_ownership_chain():
+        chain_dids = [leaf]
+        while True:
+            cursor.execute("SELECT metadata, registered_by FROM did_keys WHERE did = %s", (chain_dids[-1],))
+            metadata, owner = cursor.fetchone()
+            json.loads(metadata)
+            if owner == chain_dids[-1]:
+                return chain_dids
+            chain_dids.append(owner)
+    timed("sql: ownership chain (SELECT metadata per hop)", sql_ownership_chain, repeat=20)
+
+    def sql_transitive_access():
+        # Walks backwards from the domain so every hop uses the (domain_did, grantee_did) key
+        frontier, seen = [chain[-1]], {chain[-1]}
+        while frontier:
+            domain = frontier.pop()
+            cursor.execute("SELECT grantee_did FROM access_grants WHERE domain_did = %s", (domain,))
+            for (grantee,) in cursor.fetchall():
+                if grantee == chain[0]:
+                    return True
+                if grantee not in seen:
+                    seen.add(grantee)
+                    frontier.append(grantee)
+        return False
+    timed(f"sql: transitive access ({args.grant_chain} grants deep)", sql_transitive_access, repeat=20)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark for the entity_index query subsystem at 1M registered entities.
+
+Loads a synthetic registry into the local SQLite stand-in, then compares
+indexed, cursor-paginated queries against the old approach of scanning and
+json.loads-ing every metadata blob.
+
+Usage: python benchmarks/bench_entity_index.py --entities 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Registration_API_v6 as registration
+from entity_index import index_entities, query_entities
+
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+
+
+def synthetic_entities(count, organizations, rng):
+    for i in range(count):
+        did = f"did:key:z6Mk{i:044d}"
+        registered_by = organizations[rng.randrange(len(organizations))]
+        if i % 5 == 0:
+            data = {"@context": HSML_CONTEXT, "@type": "Agent", "name": f"Agent {i}", "swid": did,
+                    "creator": {"swid": registered_by}, "description": "Synthetic agent"}
+        else:
+            parent = f"did:key:z6Mk{rng.randrange(max(i, 1)):044d}"
+            data = {"@context": HSML_CONTEXT, "@type": "Entity", "name": f"Entity {i}", "swid": did,
+                    "description": "Synthetic entity", "linkedTo": [{"swid": parent}]}
+        yield did, data, registered_by
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<46} {elapsed * 1000:>10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="entity_index benchmark")
+    parser.add_argument("--entities", type=int, default=1000000)
+    parser.add_argument("--organizations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    registration.SQLiteConnector.path = os.path.join(tempfile.mkdtemp(), "index.sqlite3")
+    registration.mysql_connector = registration.SQLiteConnector
+    registration.db_pool.close()
+
+    rng = random.Random(args.seed)
+    organizations = [f"did:key:z6MkOrg{i:040d}" for i in range(args.organizations)]
+    db = registration.connect_db()
+    cursor = db.cursor()
+
+    start = time.perf_counter()
+    batch = []
+    for did, data, registered_by in synthetic_entities(args.entities, organizations, rng):
+        batch.append((did, data, registered_by))
+        if len(batch) == 500:
+            registration.insert_did_keys(cursor, [(d, d[8:], json.dumps(m), r, None) for d, m, r in batch])
+            index_entities(cursor, batch)
+            batch = []
+    registration.insert_did_keys(cursor, [(d, d[8:], json.dumps(m), r, None) for d, m, r in batch])
+    index_entities(cursor, batch)
+    db.commit()
+    print(f"loaded {args.entities} entities (with index) in {time.perf_counter() - start:.1f}s")
+
+    organization = organizations[0]
+    timed("indexed: Agents created by X (first page)",
+          lambda: query_entities({"@type": "Agent", "creator": organization}, limit=100, db_cursor=cursor), repeat=20)
+    timed("indexed: registered_by X, first page + metadata",
+          lambda: query_entities({"registered_by": organization}, limit=100, include_metadata=True,
+                                 db_cursor=cursor), repeat=20)
+
+    def all_pages():
+        token, total = None, 0
+        while True:
+            page = query_entities({"registered_by": organization}, limit=100, cursor=token, db_cursor=cursor)
+            total += len(page["results"])
+            token = page["next_cursor"]
+            if not token:
+                return total
+    total = timed("indexed: every page of registered_by X", all_pages)
+    print(f"  ({total} entities)")
+    timed("indexed: name lookup", lambda: query_entities({"name": "Entity 12345"}, db_cursor=cursor), repeat=20)
+
+    def full_scan():
+        cursor.execute("SELECT metadata FROM did_keys")
+        return [data["swid"] for data in map(json.loads, (row[0] for row in cursor.fetchall()))
+                if data.get("@type") == "Agent" and data.get("creator", {}).get("swid") == organization]
+    timed("scan: Agents created by X (json.loads all)", full_scan)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
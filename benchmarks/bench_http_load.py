@@ -0,0 +1,185 @@
+"""HTTP load-test harness: Flask app.py vs. ASGI async_app.py.
+
+Starts each server on a local port, drives it with N concurrent keep-alive
+clients for a fixed duration and reports requests/second and latency
+percentiles (p50/p99). Uses only the standard library on the client side.
+
+Usage:
+    python benchmarks/bench_http_load.py --clients 1000 --duration 20 --scenario register
+    python benchmarks/bench_http_load.py --target http://127.0.0.1:8000 --scenario api
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode, urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+
+
+def build_request(scenario, index):
+    if scenario == "landing":
+        return "GET", "/", None, {}
+    if scenario == "register":
+        body = urlencode({"hsml_type": "Person", "name": f"Load Person {index}",
+                          "birth_date": "1990-01-01", "email": f"p{index}@example.com"}).encode()
+        return "POST", "/register", body, {"Content-Type": "application/x-www-form-urlencoded"}
+    if scenario == "api":
+        body = json.dumps([{"@context": HSML_CONTEXT, "@type": "Person", "name": f"Load Person {index}",
+                            "birthDate": "1990-01-01", "email": f"p{index}@example.com"}]).encode()
+        return "POST", "/api/register/batch", body, {"Content-Type": "application/json"}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    version, status = status_line.split(b" ", 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return int(status), False
+    keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    return int(status), keep_alive
+
+
+async def client(host, port, scenario, deadline, latencies, errors, client_id):
+    reader = writer = None
+    index = 0
+    while time.perf_counter() < deadline:
+        method, path, body, extra_headers = build_request(scenario, f"{client_id}-{index}")
+        index += 1
+        headers = {"Host": f"{host}:{port}", "Connection": "keep-alive", **extra_headers}
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        request = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request.encode() + (body or b""))
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, clients, duration, scenario):
+    parts = urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(parts.hostname, parts.port, scenario, deadline, latencies, errors, i)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99)
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port, workers, output_directory):
+    env = dict(os.environ, REGISTERED_OUTPUT_DIR=output_directory)
+    if kind == "flask":
+        command = [sys.executable, "-c",
+                   f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "async_app:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test: Flask vs. ASGI registration service")
+    parser.add_argument("--clients", type=int, default=1000, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per run")
+    parser.add_argument("--scenario", choices=["landing", "register", "api"], default="register")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--target", default=None, help="Load an already running server instead")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    results = {}
+    if args.target:
+        results[args.target] = asyncio.run(run_load(args.target, args.clients, args.duration, args.scenario))
+    else:
+        for kind in ["flask", "asgi"]:
+            port = free_port()
+            with tempfile.TemporaryDirectory() as output_directory:
+                process = start_server(kind, port, args.workers, output_directory)
+                try:
+                    results[kind] = asyncio.run(run_load(f"http://127.0.0.1:{port}", args.clients,
+                                                         args.duration, args.scenario))
+                finally:
+                    process.terminate()
+                    process.wait()
+
+    for name, result in results.items():
+        print(f"{name:<8} {result['requests_per_second']:>9.1f} req/s  p50 {result['p50_ms'] or 0:>8.1f} ms  "
+              f"p99 {result['p99_ms'] or 0:>8.1f} ms  errors {result['errors']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scenario": args.scenario, "clients": args.clients, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Cost of the registration debug prints and of the timing spans.
+
+Registers N synthetic Agents through register_document against the dummy MySQL
+and Kafka stand-ins (the noisiest path) with verbose prints on (stdout sent to
+/dev/null) and off, then measures the per-call cost of an instrumentation span.
+
+Usage: python benchmarks/bench_instrumentation.py --entities 2000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+import Registration_API_v6 as registration
+
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+
+
+def register_agents(count, output_directory):
+    start = time.perf_counter()
+    for i in range(count):
+        registration.register_document({"@context": HSML_CONTEXT, "@type": "Agent", "name": f"Agent {i}",
+                                        "description": "Synthetic agent", "creator": {"swid": "did:key:z6MkX"}},
+                                       output_directory, registered_by="did:key:z6MkX")
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--spans", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            instrumentation.set_verbose(True)
+            verbose_rate = register_agents(args.entities, output_directory)
+            instrumentation.set_verbose(False)
+            quiet_rate = register_agents(args.entities, output_directory)
+    print(f"verbose prints on   {verbose_rate:>9.0f} registrations/s")
+    print(f"verbose prints off  {quiet_rate:>9.0f} registrations/s")
+
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        pass
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        with instrumentation.span("bench.empty"):
+            pass
+    per_span = (time.perf_counter() - start - baseline) / args.spans
+    print(f"span overhead       {per_span * 1e9:>9.0f} ns per span")
+
+    stages = instrumentation.snapshot()["stages"]
+    for name in ("register.total", "did.generate", "db.write", "kafka.publish", "artifacts.write"):
+        stage = stages[name]
+        print(f"  {name:<18} p50 {stage['p50_ms']:>7.3f} ms  p99 {stage['p99_ms']:>7.3f} ms  n={stage['count']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Cost of the write-ahead registration journal, and how well group commit batches syncs.
+
+Registers N synthetic Persons through register_document from T threads against
+the SQLite registry, without a journal and with one (fsync on), and reports
+registrations/second plus journal records per fsync. Then does the same for
+register_entities_batch, which journals one record per chunk. Finally it
+appends begin/stage/done records from T threads with nothing else running, which
+shows the group commit on its own (the registrations above are mostly limited by
+the database connection pool).
+
+Usage: python benchmarks/bench_journal.py --entities 2000 --threads 1 8 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hsml_corpus import generate_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration journal benchmark")
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--commit-delay", type=float, default=0.0, help="Group commit delay for the raw append runs (s)")
+    args = parser.parse_args()
+
+    work_directory = tempfile.mkdtemp(prefix="hsml-journal-")
+    os.environ["DID_REGISTRY_DB"] = "sqlite"
+    os.environ["DID_REGISTRY_SQLITE_PATH"] = os.path.join(work_directory, "registry.sqlite3")
+    os.environ["HSML_VERBOSE"] = "0"
+    import Registration_API_v6 as registration
+    from bulk_register import register_entities_batch
+    from registration_journal import RegistrationJournal
+
+    def documents(seed):
+        return generate_corpus(args.entities, seed=seed, types=("Person",))["Person"]
+
+    run = iter(range(10 ** 6))
+    for threads in args.threads:
+        for journaled in (False, True):
+            output_directory = os.path.join(work_directory, f"out{next(run)}")
+            if journaled:
+                registration.journal = RegistrationJournal(os.path.join(output_directory, "journal.log"))
+            corpus = documents(next(run))
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(lambda data: registration.register_document(data, output_directory), corpus))
+            rate = args.entities / (time.perf_counter() - start)
+            detail = ""
+            if journaled:
+                metrics = registration.journal.metrics()
+                detail = f"  {metrics['syncs']} fsyncs, {metrics['records_per_sync']:.1f} registrations per fsync"
+                registration.journal.close()
+                registration.journal = None
+            print(f"register_document  threads {threads:>3}  {'journal' if journaled else 'no journal':<10} "
+                  f"{rate:>8.0f} registrations/s{detail}")
+
+    for journaled in (False, True):
+        output_directory = os.path.join(work_directory, f"out{next(run)}")
+        journal = RegistrationJournal(os.path.join(output_directory, "journal.log")) if journaled else None
+        corpus = list(enumerate(documents(next(run))))
+        start = time.perf_counter()
+        register_entities_batch(corpus, output_directory, chunk_size=args.chunk_size, journal=journal, job="bench")
+        rate = args.entities / (time.perf_counter() - start)
+        if journal is not None:
+            journal.close()
+        print(f"register_entities_batch         {'journal' if journaled else 'no journal':<10} {rate:>8.0f} registrations/s")
+
+    item = {"item": None, "did": registration.generate_did_key_pem()[0], "private_key": "-" * 119,
+            "data": documents(0)[0], "registered_by": None, "topic": None, "grant": None}
+    for threads in args.threads:
+        journal = RegistrationJournal(os.path.join(work_directory, f"raw{next(run)}.log"), commit_delay=args.commit_delay)
+
+        def append(_):
+            entry = journal.begin([item], work_directory)
+            journal.stage(entry, "db")
+            journal.done(entry)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(append, range(args.entities)))
+        rate = args.entities / (time.perf_counter() - start)
+        metrics = journal.metrics()
+        journal.close()
+        print(f"journal appends    threads {threads:>3}             {rate:>8.0f} entries/s  "
+              f"{metrics['syncs']} fsyncs, {metrics['records_per_sync']:.1f} entries per fsync")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Throughput benchmark for Agent event publishing.
+
+Compares the inline path (create_kafka_topic + send_kafka_message, one blocking
+round-trip and flush per Agent) with kafka_events.KafkaEventPipeline, using the
+DummyAdminClient/DummyProducer stand-ins with a simulated broker round-trip.
+
+Usage: python benchmarks/bench_kafka_events.py --agents 2000 --latency-ms 2
+"""
+import argparse
+import contextlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Registration_API_v6 as registration
+from kafka_events import KafkaEventPipeline
+
+
+class SlowAdminClient(registration.DummyAdminClient):
+    """One broker round-trip per create_topics request"""
+    def __init__(self, config, latency):
+        super().__init__(config)
+        self.latency = latency
+
+    def create_topics(self, topic_list):
+        time.sleep(self.latency)
+        return {topic.topic: registration.DummyFuture(topic.topic) for topic in topic_list}
+
+
+class SlowProducer(registration.DummyProducer):
+    """One broker round-trip per flush"""
+    def __init__(self, config, latency):
+        super().__init__(config)
+        self.latency = latency
+
+    def flush(self, timeout=None):
+        time.sleep(self.latency)
+        return super().flush(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kafka event publishing benchmark")
+    parser.add_argument("--agents", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Simulated broker round-trip")
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        registration.admin_client = SlowAdminClient(registration.KAFKA_CONFIG, latency)
+        registration.producer = SlowProducer(registration.PRODUCER_CONFIG, latency)
+        # Inline path: topic creation waits for the broker, every message is flushed
+        start = time.perf_counter()
+        for i in range(args.agents):
+            registration.create_kafka_topic(f"agent_{i}")
+            registration.send_kafka_message(f"agent_{i}", {"message": f"New Agent registered: Agent {i}"})
+        inline_seconds = time.perf_counter() - start
+
+        delivered = threading.Semaphore(0)
+        pipeline = KafkaEventPipeline(SlowAdminClient(registration.KAFKA_CONFIG, latency),
+                                      SlowProducer(registration.PRODUCER_CONFIG, latency),
+                                      on_delivery=lambda topic, value, error: delivered.release()).start()
+        start = time.perf_counter()
+        for i in range(args.agents):
+            pipeline.publish_agent(f"agent_{i}", f"Agent {i}")
+        enqueue_seconds = time.perf_counter() - start
+        for _ in range(args.agents):
+            delivered.acquire()
+        pipeline_seconds = time.perf_counter() - start
+        pipeline.shutdown()
+
+    print(f"inline    {args.agents / inline_seconds:>10.0f} agents/s")
+    print(f"pipeline  {args.agents / pipeline_seconds:>10.0f} agents/s delivered, "
+          f"{args.agents / enqueue_seconds:,.0f} agents/s on the request path")
+    print(f"pipeline metrics: {pipeline.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Reproducible end-to-end benchmark suite for the registration pipeline.
+
+Generates a synthetic HSML corpus of every type (benchmarks/hsml_corpus.py),
+then runs each stage of the pipeline against the local stand-ins (SQLite
+registry in a temp directory, dummy Kafka clients):
+
+  corpus.generate, hsml.validate, did.generate_did_key,
+  did.extract_did_from_private_key, did.did_from_pem,
+  register_entity.<Type> for every HSML type, bulk.register_entities_batch,
+  and the Flask routes (/register, /login, /api/register/batch, /api/entities,
+  /api/can_access) through the test client.
+
+Each stage reports throughput, latency percentiles (p50/p90/p99/max) and peak
+Python heap allocated during the stage (tracemalloc, measured in a second pass
+so it does not skew the timings). Results, the internal instrumentation spans
+and the environment (git commit, Python, platform) are written as JSON;
+--compare flags regressions against an earlier results file.
+
+Usage:
+    python benchmarks/bench_suite.py --count 200 --output results.json
+    python benchmarks/bench_suite.py --count 200 --compare results.json --threshold 0.2
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hsml_corpus import HSML_TYPES, generate_corpus, make_document
+
+SUITE_VERSION = 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Suite:
+    def __init__(self, measure_memory):
+        self.measure_memory = measure_memory
+        self.stages = {}
+
+    def run(self, name, make_inputs, call, items=None):
+        """Times call(item) for every item from make_inputs(); a second pass measures peak memory.
+
+        items is the number of documents processed, when calls handle more than one each.
+        """
+        inputs = make_inputs()
+        latencies = []
+        started = time.perf_counter()
+        for item in inputs:
+            call_started = time.perf_counter()
+            call(item)
+            latencies.append(time.perf_counter() - call_started)
+        elapsed = time.perf_counter() - started
+
+        peak = None
+        if self.measure_memory:
+            inputs = make_inputs()
+            tracemalloc.start()
+            for item in inputs:
+                call(item)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        latencies.sort()
+        items = len(latencies) if items is None else items
+        self.stages[name] = {
+            "calls": len(latencies),
+            "items": items,
+            "seconds": elapsed,
+            "throughput_per_s": items / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(latencies, 0.50) * 1000,
+                "p90": percentile(latencies, 0.90) * 1000,
+                "p99": percentile(latencies, 0.99) * 1000,
+                "max": latencies[-1] * 1000 if latencies else 0.0
+            },
+            "peak_memory_bytes": peak
+        }
+        stage = self.stages[name]
+        memory = f"{peak / 1e6:>8.2f} MB" if peak is not None else "       -"
+        print(f"{name:<40} {stage['throughput_per_s']:>10.1f} items/s  p50 {stage['latency_ms']['p50']:>8.3f} ms  "
+              f"p99 {stage['latency_ms']['p99']:>8.3f} ms  peak {memory}", flush=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Returns the stages whose throughput fell or p99 rose by more than `threshold` (a fraction)"""
+    regressions = []
+    for name, stage in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old:
+            continue
+        if old["throughput_per_s"] and stage["throughput_per_s"] < old["throughput_per_s"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {old['throughput_per_s']:.1f} -> {stage['throughput_per_s']:.1f} items/s")
+        if old["latency_ms"]["p99"] and stage["latency_ms"]["p99"] > old["latency_ms"]["p99"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {old['latency_ms']['p99']:.3f} -> {stage['latency_ms']['p99']:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registration pipeline benchmark suite")
+    parser.add_argument("--count", type=int, default=200, help="Documents per HSML type and calls per stage")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--description-bytes", type=int, default=64, help="Size of each document's description")
+    parser.add_argument("--chunk-size", type=int, default=100, help="Documents per bulk / batch API call")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak-memory pass")
+    parser.add_argument("--no-sync", action="store_true", help="Do not fsync artifacts")
+    parser.add_argument("--skip-flask", action="store_true", help="Skip the Flask route stages")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown for --compare")
+    args = parser.parse_args()
+
+    work_directory = tempfile.mkdtemp(prefix="hsml-bench-")
+    os.environ["DID_REGISTRY_DB"] = "sqlite"
+    os.environ["DID_REGISTRY_SQLITE_PATH"] = os.path.join(work_directory, "registry.sqlite3")
+    os.environ["HSML_VERBOSE"] = "0"
+    os.environ["REGISTERED_OUTPUT_DIR"] = os.path.join(work_directory, "flask")
+    if args.no_sync:
+        os.environ["HSML_ARTIFACT_SYNC"] = "0"
+
+    import CLItool
+    import did_cache
+    import instrumentation
+    import Registration_API_v6 as registration
+    from bulk_register import register_entities_batch
+
+    suite = Suite(measure_memory=not args.no_memory)
+    output_directory = os.path.join(work_directory, "registered")
+    counter = iter(range(10 ** 9))
+
+    # Fixtures: one Organization (also the Credential domain) and one Person to grant access to
+    fixture_corpus = generate_corpus(1, seed=args.seed, types=("Organization", "Person"))
+    organization = registration.register_document(fixture_corpus["Organization"][0], output_directory)
+    person = registration.register_document(fixture_corpus["Person"][0], output_directory)
+    references = {"organization": organization["did_key"], "domain": organization["did_key"],
+                  "domain_name": fixture_corpus["Organization"][0]["name"], "person": person["did_key"]}
+    with open(organization["private_key_path"], "rb") as key_file:
+        organization_pem = key_file.read()
+
+    suite.run("corpus.generate",
+              lambda: [None],
+              lambda _: generate_corpus(args.count, seed=args.seed, references=references,
+                                        description_bytes=args.description_bytes),
+              items=args.count * len(HSML_TYPES))
+    corpus = generate_corpus(args.count, seed=args.seed, references=references, description_bytes=args.description_bytes)
+    every_document = [document for documents in corpus.values() for document in documents]
+
+    suite.run("hsml.validate", lambda: every_document, registration.validate_hsml)
+    suite.run("did.generate_did_key", lambda: range(args.count), lambda _: registration.generate_did_key())
+
+    key_directory = os.path.join(work_directory, "keys")
+    os.makedirs(key_directory)
+
+    def key_files():
+        paths = []
+        for did_key, pem in CLItool.generate_did_keys_pem(args.count):
+            path = os.path.join(key_directory, f"{next(counter)}.pem")
+            with open(path, "w") as key_file:
+                key_file.write(pem)
+            paths.append(path)
+        return paths
+    suite.run("did.extract_did_from_private_key", key_files, CLItool.extract_did_from_private_key)
+    suite.run("did.did_from_pem", lambda: [pem for _, pem in CLItool.generate_did_keys_pem(args.count)],
+              did_cache.did_from_pem)
+
+    document_directory = os.path.join(work_directory, "documents")
+    os.makedirs(document_directory)
+
+    def document_files(entity_type):
+        def make():
+            paths = []
+            for document in generate_corpus(args.count, seed=next(counter), types=(entity_type,), references=references,
+                                            description_bytes=args.description_bytes)[entity_type]:
+                path = os.path.join(document_directory, f"{next(counter)}.json")
+                with open(path, "w") as document_file:
+                    json.dump(document, document_file)
+                paths.append(path)
+            return paths
+        return make
+
+    for entity_type in HSML_TYPES:
+        registered_by = None if entity_type in ("Person", "Organization") else organization["did_key"]
+        domain_private_key = organization_pem if entity_type == "Credential" else None
+
+        def register(path, registered_by=registered_by, domain_private_key=domain_private_key):
+            result = registration.register_entity(path, output_directory, registered_by=registered_by,
+                                                  domain_private_key=domain_private_key)
+            if not result or result.get("status") != "success":
+                raise RuntimeError(f"Registration failed for {path}: {result}")
+        suite.run(f"register_entity.{entity_type}", document_files(entity_type), register)
+
+    def bulk_chunks():
+        documents = [copy.deepcopy(document) for entity_type in ("Person", "Organization", "Agent", "Entity")
+                     for document in corpus[entity_type]]
+        return [list(enumerate(documents[start:start + args.chunk_size]))
+                for start in range(0, len(documents), args.chunk_size)]
+    suite.run("bulk.register_entities_batch", bulk_chunks,
+              lambda chunk: register_entities_batch(chunk, output_directory, registered_by=organization["did_key"],
+                                                    chunk_size=args.chunk_size),
+              items=4 * args.count)
+
+    if not args.skip_flask:
+        import app as flask_app
+        client = flask_app.app.test_client()
+
+        def check(response):
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+
+        suite.run("flask.POST /register", lambda: range(args.count),
+                  lambda i: check(client.post("/register", data={"hsml_type": "Person", "name": f"Form Person {i}",
+                                                                  "birth_date": "1990-01-01", "email": "p@example.com"})))
+
+        def login(_):
+            from io import BytesIO
+            check(client.post("/login", data={"pem_file": (BytesIO(organization_pem), "key.pem")},
+                              content_type="multipart/form-data"))
+        suite.run("flask.POST /login", lambda: range(args.count), login)
+
+        def batch_bodies():
+            documents = [make_document("Entity", next(counter), references, args.description_bytes)
+                         for _ in range(args.count)]
+            return [documents[start:start + args.chunk_size] for start in range(0, len(documents), args.chunk_size)]
+        suite.run("flask.POST /api/register/batch", batch_bodies,
+                  lambda body: check(client.post("/api/register/batch", json=body)),
+                  items=args.count)
+        suite.run("flask.GET /api/entities", lambda: range(args.count),
+                  lambda _: check(client.get(f"/api/entities?registered_by={organization['did_key']}&limit=100")))
+        suite.run("flask.GET /api/can_access", lambda: range(args.count),
+                  lambda _: check(client.get(f"/api/can_access?grantee={person['did_key']}&domain={organization['did_key']}")))
+
+    results = {
+        "suite_version": SUITE_VERSION,
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "config": {"count": args.count, "seed": args.seed, "description_bytes": args.description_bytes,
+                   "chunk_size": args.chunk_size, "memory": not args.no_memory, "sync": not args.no_sync},
+        "stages": suite.stages,
+        "instrumentation": instrumentation.snapshot()
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Deterministic synthetic HSML corpora for the benchmark suite.
+
+Every type (Person, Organization, Agent, Credential, Entity) is generated with
+all required and recommended fields, so documents validate cleanly. References
+(creator, linkedTo, issuedBy, authorizedForDomain, accessAuthorization) point at
+the DIDs in `references`, which the suite fills in with registered entities.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from did_codec import encode_did
+
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+HSML_TYPES = ("Person", "Organization", "Agent", "Credential", "Entity")
+
+
+def synthetic_did(rng):
+    return encode_did(rng.getrandbits(256).to_bytes(32, "big"))
+
+
+def make_document(entity_type, index, references, description_bytes=64):
+    """Returns one valid HSML document of entity_type"""
+    description = ("Synthetic " + entity_type.lower() + " ") * (description_bytes // 12 + 1)
+    data = {"@context": HSML_CONTEXT, "@type": entity_type, "name": f"Bench {entity_type} {index}"}
+    if entity_type == "Person":
+        data.update(birthDate="1990-01-01", email=f"person{index}@example.com", affiliation="Bench Org")
+    elif entity_type == "Organization":
+        data.update(description=description[:description_bytes], url="https://example.com", address="1 Main St",
+                    logo="logo.png", foundingDate="2000-01-01", email=f"org{index}@example.com")
+    elif entity_type == "Agent":
+        data.update(description=description[:description_bytes], creator={"swid": references["organization"]},
+                    dateCreated="2025-01-01", dateModified="2025-01-02")
+    elif entity_type == "Credential":
+        data.update(description=description[:description_bytes],
+                    issuedBy={"swid": references["organization"]},
+                    authorizedForDomain={"swid": references["domain"], "name": references.get("domain_name", "Domain")},
+                    accessAuthorization={"swid": references["person"]},
+                    validFrom="2025-01-01", validUntil="2030-01-01")
+    elif entity_type == "Entity":
+        data.update(description=description[:description_bytes],
+                    linkedTo=[{"@type": "Organization", "swid": references["organization"]}])
+    else:
+        raise ValueError(f"Unknown HSML type: {entity_type}")
+    return data
+
+
+def generate_corpus(count, seed=0, types=HSML_TYPES, references=None, description_bytes=64):
+    """Returns {type: [document, ...]} with `count` documents per type"""
+    rng = random.Random(seed)
+    if references is None:
+        references = {"organization": synthetic_did(rng), "domain": synthetic_did(rng), "person": synthetic_did(rng)}
+    return {entity_type: [make_document(entity_type, index, references, description_bytes)
+                          for index in range(count)]
+            for entity_type in types}
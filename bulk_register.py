@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import sys
+
+import Registration_API_v6 as registration
+from did_cache import invalidate_did
+from entity_graph import prepare_registry_changes, record_registry_change
+from entity_index import index_entities
+from artifact_store import open_artifact_store
+from registration_journal import RegistrationJournal, abort_registration, recover_journal
+from instrumentation import increment, span
+
+# -----------------------------
+# Batch registration of many HSML documents
+# -----------------------------
+# Documents are validated up front, DIDs are minted in bulk and did_keys rows are
+# written with multi-row inserts, one transaction per chunk.
+
+# Function to read HSML documents from a directory of .json files or a JSON Lines stream
+def load_hsml_documents(source):
+    """Yields (item_id, data) pairs; data is None when the item could not be read as JSON"""
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            if not file_name.endswith(".json"):
+                continue
+            path = os.path.join(source, file_name)
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            except (ValueError, OSError):
+                # Not JSON, not UTF-8 or not readable: reported for this item, the rest still load
+                data = None
+            yield path, data
+    else:
+        # Read as bytes, so a line that is not UTF-8 is one item's error rather than the end of the stream
+        stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+        try:
+            yield from parse_json_lines(stream)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+# Function to parse JSON Lines (one HSML document per line)
+def parse_json_lines(lines):
+    """Yields (line_number, data) pairs for str or bytes lines; data is None when the line is not valid JSON"""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:  # JSONDecodeError, or UnicodeDecodeError for bytes
+            data = None
+        yield line_number, data
+
+# Function to split off the documents whose 'swid' is already registered
+def _check_swids(items, overwrite):
+    """Returns (items to register, error results) with register_document's overwrite policy"""
+    swids = [data["swid"] for _, data in items if data.get("swid")]
+    if overwrite or not swids:
+        return items, []
+    db = registration.connect_db()
+    try:
+        existing = registration.find_existing_dids(db.cursor(), swids)
+    finally:
+        db.close()
+    if not existing:
+        return items, []
+    errors = [{"item": item_id, "status": "error", "requires": "overwrite",
+               "message": f"The provided 'swid' ({data['swid']}) already exists in the database. No changes were made."}
+              for item_id, data in items if data.get("swid") in existing]
+    return [(item_id, data) for item_id, data in items if data.get("swid") not in existing], errors
+
+# Function to register one chunk of already-validated documents
+def _register_chunk(items, registered_by, store, journal=None, job=None, location=None, include_private_keys=False):
+    """Returns one result dict per item; a failure is reported on the chunk's items, never raised"""
+    artifacts = []
+    entry = None
+    committed = False
+    try:
+        keys = registration.generate_did_keys(len(items))
+
+        rows = []
+        agents = []
+        for (item_id, data), (did_key, private_key) in zip(items, keys):
+            data["swid"] = did_key
+            public_key_part = did_key.replace("did:key:", "")
+            topic_name = None
+            if data["@type"] == "Agent":
+                topic_name = data["name"].replace(" ", "_").lower()
+                agents.append((topic_name, data["name"]))
+            rows.append((did_key, public_key_part, json.dumps(data), registered_by or did_key, topic_name))
+            artifacts.append((item_id, data, did_key, private_key))
+
+        # One durable journal record (one group-committed sync) for the whole chunk
+        if journal is not None:
+            output_directory, pack, pretty = location
+            entry = journal.begin([{"item": item_id, "did": did_key, "private_key": private_key, "data": data,
+                                    "registered_by": row[3], "topic": row[4], "grant": None}
+                                   for (item_id, data, did_key, private_key), row in zip(artifacts, rows)],
+                                  output_directory, job=job, pack=pack, pretty=pretty)
+
+        with span("kafka.publish_batch"):
+            registration.publish_agent_events(agents)
+        if entry is not None:
+            journal.stage(entry, "kafka")
+
+        db = registration.connect_db()
+        try:
+            cursor = db.cursor()
+            entities = [(did_key, data, row[3]) for row, (_, data, did_key, _) in zip(rows, artifacts)]
+            with span("db.write_batch"):
+                registration.insert_did_keys(cursor, rows)
+                index_entities(cursor, entities)
+                record_registry_change(cursor, "register")
+                db.commit()
+            committed = True
+            if entry is not None:
+                journal.stage(entry, "db")
+        finally:
+            db.close()
+        for row in rows:
+            invalidate_did(row[0])
+
+        # One batch per chunk: a single directory sync (or pack + index sync) for all its artifacts
+        with span("artifacts.write_batch"):
+            locations = store.put_many(
+                (did_key, data, private_key, None) for _, data, did_key, private_key in artifacts
+            )
+        if entry is not None:
+            journal.done(entry)
+    except Exception as e:
+        # Undone now rather than replayed (or skipped as completed) by the next run
+        if entry is not None:
+            abort_registration(journal, entry)
+        increment("batch_chunks_failed")
+        # A journaled chunk is rolled back, now or by recover_journal if this rollback failed too
+        return _chunk_errors(items, artifacts, e, committed and entry is None, include_private_keys)
+    if registration.entity_graph is not None:
+        registration.entity_graph.add_entities(entities, changes=1)
+    increment("entities_registered", len(artifacts))
+    results = []
+    for (item_id, _, did_key, private_key), (json_output, private_key_output) in zip(artifacts, locations):
+        result = {
+            "item": item_id,
+            "status": "success",
+            "did_key": did_key,
+            "private_key_path": private_key_output,
+            "updated_json_path": json_output
+        }
+        if include_private_keys:
+            result["private_key"] = private_key
+        results.append(result)
+    return results
+
+# Function to report a chunk that failed part way through
+def _chunk_errors(items, artifacts, error, registered, include_private_keys):
+    """One error result per item; `registered` means its rows were committed and stay registered"""
+    if not registered:
+        return [{"item": item_id, "status": "error", "message": f"Registration failed: {error}"}
+                for item_id, _ in items]
+    # Without a journal to undo them, the committed DIDs (and their keys) are still handed back
+    results = []
+    for item_id, _, did_key, private_key in artifacts:
+        result = {"item": item_id, "status": "error", "did_key": did_key,
+                  "message": f"Registered, but its artifacts could not be written: {error}"}
+        if include_private_keys:
+            result["private_key"] = private_key
+        results.append(result)
+    return results
+
+# Function to register many HSML documents at once
+def register_entities_batch(documents, output_directory, registered_by=None, chunk_size=500, pack=None, pretty=None,
+                            journal=None, job=None, overwrite=False, include_private_keys=False):
+    """Registers (item_id, data) pairs in chunks and returns one result dict per item.
+
+    The policy is register_document's: registered_by must be a registered Person or
+    Organization (checked once per batch), and a document whose 'swid' is already
+    registered is refused with "requires": "overwrite" unless overwrite=True.
+    include_private_keys adds each new private key PEM to its result ("private_key"),
+    for callers such as the HTTP API that cannot read the server's output directory.
+    pack / pretty choose the artifact layout (see artifact_store.open_artifact_store).
+    With a journal (registration_journal.RegistrationJournal), each chunk is journaled
+    before its side effects; with a job name as well, items that an earlier run of the
+    same job already registered are skipped ("status": "skipped"), so an interrupted
+    import can be restarted from the top.
+    A chunk that fails (database, Kafka or artifact store error) is rolled back if
+    journaled and its items are reported with "status": "error"; the other chunks
+    still run, and a job with failed chunks is kept in the journal so that a rerun
+    retries only those items.
+    """
+    store = open_artifact_store(output_directory, pack=pack, pretty=pretty)
+    completed = {}
+    if journal is not None:
+        # Finish whatever the interrupted run left half done before resuming it
+        if journal.recovered:
+            recover_journal(journal)
+        if job is not None:
+            completed = journal.completed_items(job)
+    location = (output_directory, pack, pretty)
+    registrant_error = registration.check_registrant(registered_by) if registered_by is not None else None
+    report = []
+    failed_chunks = 0
+
+    def flush(chunk):
+        nonlocal failed_chunks
+        chunk, errors = _check_swids(chunk, overwrite)
+        report.extend(errors)
+        if chunk:
+            with span("register.batch_chunk"):
+                results = _register_chunk(chunk, registered_by, store, journal, job, location, include_private_keys)
+            if results and results[0]["status"] == "error":
+                failed_chunks += 1
+            report.extend(results)
+
+    chunk = []
+    for item_id, data in documents:
+        if completed:
+            did_key = completed.get(item_id)
+            if did_key is not None:
+                report.append({"item": item_id, "status": "skipped", "did_key": did_key,
+                               "message": "Registered by an earlier run of this job"})
+                continue
+        if registrant_error:
+            report.append({"item": item_id, **registrant_error})
+            continue
+        if data is None:
+            report.append({"item": item_id, "status": "error", "message": "Invalid JSON format"})
+            continue
+        error = registration.validate_hsml(data)
+        if error:
+            report.append({"item": item_id, **error})
+            continue
+        if data["@type"] == "Credential":
+            # Credentials need the domain's private key (register_document's domain_private_key)
+            report.append({"item": item_id, "status": "error",
+                           "message": "Credentials must be registered individually with register_document"})
+            continue
+        if registered_by is None and data["@type"] not in ["Person", "Organization"]:
+            report.append({"item": item_id, "status": "error",
+                           "message": "Only a Person or Organization can be registered without a registering user"})
+            continue
+        chunk.append((item_id, data))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    if journal is not None and job is not None and not failed_chunks:
+        journal.finish_job(job)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Register many HSML documents at once")
+    parser.add_argument("source", help="Directory of .json files, a .jsonl file, or '-' for JSON Lines on stdin")
+    parser.add_argument("--output", required=True, help="Directory for the generated keys and JSON files")
+    parser.add_argument("--registered-by", default=None, help="DID of the registering Person/Organization")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Documents per database transaction")
+    parser.add_argument("--report", default=None, help="Write the per-item report to this JSON file")
+    parser.add_argument("--pack", action="store_true", default=None, help="Append artifacts to <output>/artifacts.pack")
+    parser.add_argument("--pretty", action="store_true", default=None, help="Write indented JSON")
+    parser.add_argument("--overwrite", action="store_true", help="Register documents whose 'swid' is already registered")
+    parser.add_argument("--journal", default=None,
+                        help="Write-ahead journal file; rerunning an interrupted import resumes it")
+    parser.add_argument("--job", default=None, help="Job name in the journal (default: the source path)")
+    args = parser.parse_args()
+
+    prepare_registry_changes()
+    journal = RegistrationJournal(args.journal) if args.journal else None
+    job = (args.job or os.path.abspath(args.source)) if journal is not None else None
+    try:
+        report = register_entities_batch(load_hsml_documents(args.source), args.output,
+                                         registered_by=args.registered_by, chunk_size=args.chunk_size,
+                                         pack=args.pack, pretty=args.pretty, journal=journal, job=job,
+                                         overwrite=args.overwrite)
+    finally:
+        if journal is not None:
+            journal.close()
+    succeeded = sum(1 for item in report if item["status"] == "success")
+    skipped = sum(1 for item in report if item["status"] == "skipped")
+    print(f"Registered {succeeded} of {len(report)} documents." + (f" {skipped} already registered by an earlier run." if skipped else ""))
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=4)
+        print(f"Report saved to: {args.report}")
+
+if __name__ == "__main__":
+    main()
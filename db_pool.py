@@ -0,0 +1,172 @@
+import contextlib
+import queue
+import threading
+import time
+
+# -----------------------------
+# Database connection pool
+# -----------------------------
+# Connections are created lazily up to `size` and handed out as PooledConnection
+# wrappers. Calling close() on a wrapper returns the connection to the pool, so
+# existing `db = connect_db() ... db.close()` code reuses connections unchanged.
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+class PooledConnection:
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._closed = False
+
+    def cursor(self, *args, **kwargs):
+        return self._connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        rollback = getattr(self._connection, "rollback", None)
+        if rollback is not None:
+            rollback()
+
+    def close(self):
+        """Returns the connection to the pool (safe to call more than once)"""
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._connection)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.rollback()
+        self.close()
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, health_check_interval=30.0, health_check_query="SELECT 1"):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._metrics = {
+            "acquired": 0,
+            "released": 0,
+            "connections_opened": 0,
+            "connections_discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "wait_seconds": 0.0
+        }
+
+    def acquire(self, timeout=None):
+        """Returns a healthy PooledConnection, waiting up to `timeout` seconds for a free one"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        while True:
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._open_if_room()
+                if connection is None:
+                    remaining = timeout - (time.perf_counter() - started)
+                    with self._lock:
+                        self._metrics["waits"] += 1
+                    try:
+                        connection, idle_since = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._metrics["timeouts"] += 1
+                        raise PoolTimeoutError(f"No database connection available within {timeout}s")
+                else:
+                    idle_since = time.monotonic()
+            if time.monotonic() - idle_since >= self.health_check_interval and not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+            with self._lock:
+                self._metrics["acquired"] += 1
+                self._metrics["wait_seconds"] += time.perf_counter() - started
+            return PooledConnection(self, connection)
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Context manager yielding a pooled connection; rolls back on error"""
+        with self.acquire(timeout) as db:
+            yield db
+
+    def metrics(self):
+        """Returns a snapshot of pool usage"""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = self.size
+            snapshot["open"] = self._created
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["in_use"] = snapshot["open"] - snapshot["idle"]
+        return snapshot
+
+    def close(self):
+        """Closes all idle connections (e.g. before switching database backends)"""
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _open_if_room(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._metrics["connections_opened"] += 1
+        return connection
+
+    def _is_healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchone()
+            return True
+        except Exception:
+            with self._lock:
+                self._metrics["health_check_failures"] += 1
+            return False
+
+    def _release(self, connection):
+        try:
+            rollback = getattr(connection, "rollback", None)
+            if rollback is not None:
+                rollback()  # Never hand the next user someone else's open transaction
+        except Exception:
+            self._discard(connection)
+            return
+        with self._lock:
+            self._metrics["released"] += 1
+        self._idle.put((connection, time.monotonic()))
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+            self._metrics["connections_discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
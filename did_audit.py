@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from CLItool import extract_did_from_pem
+from artifact_store import ArtifactPack, ArtifactStore
+
+# -----------------------------
+# Bulk DID derivation and verification
+# -----------------------------
+# Re-derives DID:keys from private key PEMs the same way extract_did_from_private_key
+# does, spread over a process pool. Keys are sent to the workers in chunks (only
+# the PEM bytes cross the process boundary) with a bounded number of chunks in
+# flight, and results are yielded in input order as chunks complete, so millions
+# of keys stream through with flat memory.
+#
+# Sources: the registry (every did_keys row checked against the private key stored
+# for it in an artifact directory) or a set of uploaded PEM files.
+
+DID_PREFIX = "did:key:"
+
+# Function run in the worker processes
+def _derive_chunk(pems):
+    """Returns [(did, None) or (None, error), ...] for a list of PEM bytes"""
+    results = []
+    for pem in pems:
+        try:
+            results.append((extract_did_from_pem(pem), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _result(item_id, expected_did, derived_did, error):
+    if error is not None:
+        status = error if error in ("missing_key", "public_key_mismatch") else "invalid_key"
+    elif expected_did is not None and derived_did != expected_did:
+        status = "mismatch"
+    else:
+        status = "ok"
+    result = {"item": item_id, "status": status, "did": derived_did}
+    if expected_did is not None:
+        result["expected"] = expected_did
+    if status == "invalid_key":
+        result["error"] = error
+    return result
+
+# Function to derive or verify the DIDs of many private keys
+def verify_dids(items, workers=None, chunk_size=1000):
+    """Yields one result dict per (item_id, expected_did, pem) item, in input order.
+
+    expected_did may be None to only derive. pem may be an error string instead of
+    PEM bytes ("missing_key", "public_key_mismatch") to pass a failure found by the
+    caller through. status is "ok", "mismatch", "invalid_key", "missing_key" or
+    "public_key_mismatch". workers=1 derives in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(items, chunk_size):
+            yield from _chunk_results(chunk, _derive_chunk([pem for _, _, pem in chunk if not isinstance(pem, str)]))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Two chunks per worker keep every process busy without queueing the whole input
+        pending = deque()
+        for chunk in _chunks(items, chunk_size):
+            pems = [pem for _, _, pem in chunk if not isinstance(pem, str)]
+            pending.append((chunk, executor.submit(_derive_chunk, pems)))
+            if len(pending) >= workers * 2:
+                chunk, future = pending.popleft()
+                yield from _chunk_results(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from _chunk_results(chunk, future.result())
+
+def _chunk_results(chunk, derived):
+    derived = iter(derived)
+    for item_id, expected_did, pem in chunk:
+        if isinstance(pem, str):
+            yield _result(item_id, expected_did, None, pem)
+        else:
+            yield _result(item_id, expected_did, *next(derived))
+
+# Function to read the stored private key of each DID in the registry
+def registry_items(cursor, output_directory, page_size=10000):
+    """Yields (did, did, pem) for every did_keys row, paging through the table by DID.
+
+    Keys come from the artifact pack in output_directory if there is one, otherwise
+    from the per-DID ArtifactStore files.
+    """
+    pack_path = os.path.join(output_directory, "artifacts.pack")
+    if os.path.exists(pack_path):
+        # Read-only: the audit may run next to registrations appending to the same pack
+        store = ArtifactPack(pack_path, read_only=True)
+    else:
+        store = ArtifactStore(output_directory, sync=False)
+    try:
+        last_did = ""
+        while True:
+            cursor.execute(f"SELECT did, public_key FROM did_keys WHERE did > %s ORDER BY did LIMIT {int(page_size)}",
+                           (last_did,))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            for did, public_key in rows:
+                if public_key != did[len(DID_PREFIX):]:
+                    yield did, did, "public_key_mismatch"
+                else:
+                    yield did, did, _read_key(store, did)
+            last_did = rows[-1][0]
+    finally:
+        if isinstance(store, ArtifactPack):
+            store.close()
+
+def _read_key(store, did):
+    try:
+        if isinstance(store, ArtifactPack):
+            return store.get(did)[1].encode("utf-8")
+        # Only the PEM is needed, so skip get() and its JSON parse
+        with open(store.paths(did)[1], "rb") as key_file:
+            return key_file.read()
+    except (KeyError, FileNotFoundError):
+        return "missing_key"
+
+# Function to read uploaded PEM files
+def pem_file_items(paths):
+    """Yields (path, None, pem) for every .pem file in the given files and directories"""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(".pem"):
+                        yield from pem_file_items([os.path.join(directory, name)])
+        else:
+            with open(path, "rb") as pem_file:
+                yield path, None, pem_file.read()
+
+# Function to run a verification and write the mismatch report
+def audit(items, report_path=None, derived_path=None, workers=None, chunk_size=1000):
+    """Runs verify_dids over items; returns status counts.
+
+    Every result that is not "ok" is written to report_path, and every result to
+    derived_path, as JSON Lines.
+    """
+    counts = Counter()
+    report = open(report_path, "w") if report_path else None
+    derived = open(derived_path, "w") if derived_path else None
+    try:
+        for result in verify_dids(items, workers=workers, chunk_size=chunk_size):
+            counts[result["status"]] += 1
+            if derived is not None:
+                derived.write(json.dumps(result) + "\n")
+            if report is not None and result["status"] != "ok":
+                report.write(json.dumps(result) + "\n")
+    finally:
+        if report is not None:
+            report.close()
+        if derived is not None:
+            derived.close()
+    return dict(counts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive or verify DID:keys from private keys in bulk")
+    subparsers = parser.add_subparsers(dest="source", required=True)
+    registry_parser = subparsers.add_parser("registry", help="Check every did_keys row against its stored private key")
+    registry_parser.add_argument("artifacts", help="Registration output directory holding the private keys")
+    pems_parser = subparsers.add_parser("pems", help="Derive the DIDs of PEM files")
+    pems_parser.add_argument("paths", nargs="+", help="PEM files or directories of .pem files")
+    for subparser in (registry_parser, pems_parser):
+        subparser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        subparser.add_argument("--chunk-size", type=int, default=1000, help="Keys per worker task")
+        subparser.add_argument("--report", default="did_mismatches.jsonl", help="JSON Lines report of failed keys")
+        subparser.add_argument("--derived", default=None, help="Also write every derived DID to this JSON Lines file")
+    args = parser.parse_args()
+
+    if args.source == "registry":
+        import Registration_API_v6 as registration
+        db = registration.connect_db()
+        try:
+            counts = audit(registry_items(db.cursor(), args.artifacts), args.report, args.derived,
+                           args.workers, args.chunk_size)
+        finally:
+            db.close()
+    else:
+        counts = audit(pem_file_items(args.paths), args.report, args.derived, args.workers, args.chunk_size)
+    checked = sum(counts.values())
+    print(f"Checked {checked} keys: " + ", ".join(f"{status} {count}" for status, count in sorted(counts.items())))
+    if checked != counts.get("ok", 0):
+        print(f"Mismatch report saved to: {args.report}")
+
+if __name__ == "__main__":
+    main()
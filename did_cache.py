@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from CLItool import extract_did_from_pem
+
+# -----------------------------
+# DID resolution cache
+# -----------------------------
+# Keeps a small summary (@type, name, registered_by) of recently resolved DIDs so
+# repeat logins and the Person/Organization authorization check are answered from
+# memory. Entries expire after `ttl` seconds, the least recently used ones are
+# evicted beyond `max_size`, and register_entity invalidates a DID whenever it
+# rewrites its row.
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, max_size=10000, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._metrics["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._metrics["expirations"] += 1
+            self._metrics["misses"] += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self._metrics["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = len(self._entries)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+# Resolved DID summaries ({"@type", "name", "registered_by"})
+metadata_cache = TTLCache(max_size=int(os.environ.get("DID_CACHE_SIZE", 10000)),
+                          ttl=float(os.environ.get("DID_CACHE_TTL", 300)))
+# PEM fingerprint -> DID, so repeat logins skip key parsing
+pem_cache = TTLCache(max_size=10000, ttl=3600.0)
+
+# Function to derive a DID from PEM data held in memory
+def did_from_pem(pem_data):
+    """Returns the DID:key for PEM private key data (str or bytes), caching by fingerprint"""
+    if isinstance(pem_data, str):
+        pem_data = pem_data.encode("utf-8")
+    fingerprint = hashlib.sha256(pem_data).digest()
+    did_key = pem_cache.get(fingerprint)
+    if did_key is None:
+        did_key = extract_did_from_pem(pem_data)
+        pem_cache.put(fingerprint, did_key)
+    return did_key
+
+# Function to look up a DID's type and name
+def resolve_did(did_key):
+    """Returns {"@type", "name", "registered_by"} for a registered DID, or None if unknown"""
+    summary = metadata_cache.get(did_key, _MISSING)
+    if summary is not _MISSING:
+        return summary
+    from Registration_API_v6 import connect_db
+    db = connect_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT metadata, registered_by FROM did_keys WHERE did = %s", (did_key,))
+        result = cursor.fetchone()
+    finally:
+        db.close()
+    summary = None
+    if result:
+        try:
+            metadata = json.loads(result[0])
+        except (TypeError, ValueError):
+            metadata = None
+        if isinstance(metadata, dict):
+            summary = {
+                "@type": metadata.get("@type"),
+                "name": metadata.get("name"),
+                "registered_by": result[1] if len(result) > 1 else None
+            }
+    # Unknown DIDs are not cached, so a DID registered a moment later resolves at once
+    if summary is not None:
+        metadata_cache.put(did_key, summary)
+    return summary
+
+# Function to drop a DID from the cache after its row changes
+def invalidate_did(did_key):
+    metadata_cache.invalidate(did_key)
+
+# Function to report cache counters
+def cache_metrics():
+    return {"metadata": metadata_cache.metrics(), "pem": pem_cache.metrics()}
@@ -0,0 +1,120 @@
+# -----------------------------
+# DID:key codec
+# -----------------------------
+# did:key identifiers here are "did:key:" + base58btc(0xed01 + 32-byte Ed25519
+# public key). That multicodec payload is always 34 bytes starting with 0xed01,
+# so its base58 form is always 47 characters (starting "6Mk"). The fast path
+# treats the payload as one 272-bit integer: encoding emits two base58 digits
+# per division through a precomputed 58 * 58 pair table, and decoding maps the
+# characters to digit values with one bytes.translate() before folding them.
+#
+# Decoding is strict: the prefix, length, alphabet and the 0xed01 codec are all
+# checked, and anything else raises ValueError. b58encode / b58decode are the
+# generic conversions for payloads of any length.
+
+DID_PREFIX = "did:key:"
+ED25519_CODEC = b"\xed\x01"
+ED25519_KEY_LENGTH = 32
+ED25519_DID_LENGTH = len(DID_PREFIX) + 47
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+_PAIRS = tuple(a + b for a in ALPHABET for b in ALPHABET)
+# Byte -> digit value; 255 marks characters outside the alphabet
+_DIGITS = bytes(ALPHABET.index(chr(byte)) if chr(byte) in ALPHABET else 255 for byte in range(256))
+_CODEC_VALUE = int.from_bytes(ED25519_CODEC, "big")
+_ED25519_OFFSET = _CODEC_VALUE << (8 * ED25519_KEY_LENGTH)
+_KEY_MASK = (1 << (8 * ED25519_KEY_LENGTH)) - 1
+
+def _encode_int(n, digits):
+    # Two digits per step from the pair table; `digits` is the exact output length
+    pairs = []
+    for _ in range(digits // 2):
+        n, pair = divmod(n, 3364)
+        pairs.append(_PAIRS[pair])
+    if digits % 2:
+        pairs.append(ALPHABET[n])
+    return "".join(reversed(pairs))
+
+def _decode_int(text):
+    # Returns None on characters outside the alphabet (non-ASCII becomes "?", also invalid)
+    digits = text.encode("ascii", "replace").translate(_DIGITS)
+    if 255 in digits:
+        return None
+    n = 0
+    for digit in digits:
+        n = n * 58 + digit
+    return n
+
+def _ed25519_payload(did):
+    # The 272-bit payload of a well-formed Ed25519 DID:key, else None
+    if not isinstance(did, str) or len(did) != ED25519_DID_LENGTH or not did.startswith(DID_PREFIX):
+        return None
+    n = _decode_int(did[len(DID_PREFIX):])
+    if n is None or n >> (8 * ED25519_KEY_LENGTH) != _CODEC_VALUE:
+        return None
+    return n
+
+# Function to base58-encode any bytes
+def b58encode(data):
+    """Bitcoin-alphabet base58 of `data`; each leading zero byte becomes a '1'"""
+    stripped = data.lstrip(b"\0")
+    n = int.from_bytes(stripped, "big")
+    digits = 0
+    while 58 ** digits <= n:
+        digits += 1
+    return "1" * (len(data) - len(stripped)) + (_encode_int(n, digits) if n else "")
+
+# Function to decode any base58 string
+def b58decode(text):
+    """Inverse of b58encode; raises ValueError on characters outside the alphabet"""
+    stripped = text.lstrip("1")
+    n = _decode_int(stripped) if stripped else 0
+    if n is None:
+        raise ValueError("Invalid base58 character")
+    return b"\0" * (len(text) - len(stripped)) + (n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b"")
+
+# Function to build a DID:key from a raw Ed25519 public key
+def encode_did(public_key):
+    """Returns "did:key:6Mk..." for a 32-byte Ed25519 public key"""
+    if len(public_key) != ED25519_KEY_LENGTH:
+        raise ValueError(f"Ed25519 public keys are {ED25519_KEY_LENGTH} bytes, got {len(public_key)}")
+    return DID_PREFIX + _encode_int(_ED25519_OFFSET | int.from_bytes(public_key, "big"), 47)
+
+# Function to recover the raw Ed25519 public key from a DID:key
+def decode_did(did):
+    """Returns the 32-byte Ed25519 public key of a DID:key; raises ValueError if it is malformed"""
+    n = _ed25519_payload(did)
+    if n is None:
+        raise ValueError(f"Not a valid Ed25519 did:key: {did!r}")
+    return (n & _KEY_MASK).to_bytes(ED25519_KEY_LENGTH, "big")
+
+def is_valid_did(did):
+    """True if `did` is a well-formed Ed25519 DID:key"""
+    return _ed25519_payload(did) is not None
+
+# Functions for whole batches (e.g. every swid reference in an import)
+def encode_dids(public_keys):
+    """Returns the DID:key of each 32-byte public key, in order"""
+    public_keys = list(public_keys)
+    if any(len(public_key) != ED25519_KEY_LENGTH for public_key in public_keys):
+        raise ValueError(f"Ed25519 public keys are {ED25519_KEY_LENGTH} bytes")
+    encode, from_bytes, offset = _encode_int, int.from_bytes, _ED25519_OFFSET
+    return [DID_PREFIX + encode(offset | from_bytes(public_key, "big"), 47) for public_key in public_keys]
+
+def decode_dids(dids, strict=True):
+    """Returns the public key of each DID:key, in order.
+
+    With strict=False a malformed DID yields None instead of raising ValueError.
+    """
+    payload, mask, length = _ed25519_payload, _KEY_MASK, ED25519_KEY_LENGTH
+    keys = []
+    for did in dids:
+        n = payload(did)
+        if n is None:
+            if strict:
+                raise ValueError(f"Not a valid Ed25519 did:key: {did!r}")
+            keys.append(None)
+        else:
+            keys.append((n & mask).to_bytes(length, "big"))
+    return keys
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from CLItool import generate_did_keys_pem
+
+# -----------------------------
+# Pre-generated DID:key pool
+# -----------------------------
+# Registrations pop ready-made DID/PEM pairs from this pool instead of generating
+# keys on the request path. A background thread tops it back up to max_size
+# whenever it drops below the low-water mark.
+class DIDKeyPool:
+    def __init__(self, max_size=1000, low_water=250, refill_batch=100, connect_db=None):
+        if not 0 <= low_water < max_size:
+            raise ValueError("low_water must be between 0 and max_size")
+        if connect_db is None:
+            from Registration_API_v6 import connect_db
+        self.max_size = max_size
+        self.low_water = low_water
+        self.refill_batch = refill_batch
+        self.connect_db = connect_db
+        self._keys = []
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "refills": 0,
+            "keys_generated": 0,
+            "duplicates_rejected": 0,
+            "refill_seconds": 0.0
+        }
+
+    def start(self):
+        """Starts the background refill thread (fills the pool right away)"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._refill_loop, name="did-key-pool", daemon=True)
+            self._thread.start()
+            self._refill_needed.set()
+        return self
+
+    def stop(self):
+        """Stops the background refill thread"""
+        self._stopped.set()
+        self._refill_needed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self, cursor=None):
+        """Returns one unique (did_key, private_key_pem) pair"""
+        return self.get_many(1, cursor)[0]
+
+    def get_many(self, count, cursor=None):
+        """Returns `count` unique (did_key, private_key_pem) pairs, minting any shortfall inline.
+
+        cursor: a caller that already holds a pooled connection passes its cursor, so a
+        shortfall is checked on that connection instead of waiting for a second one.
+        """
+        with self._lock:
+            taken = self._keys[-count:] if count else []
+            del self._keys[len(self._keys) - len(taken):]
+            self._metrics["hits"] += len(taken)
+            self._metrics["misses"] += count - len(taken)
+            if len(self._keys) < self.low_water:
+                self._refill_needed.set()
+        if len(taken) < count:
+            taken.extend(self._mint(count - len(taken), cursor))
+        return taken
+
+    def size(self):
+        with self._lock:
+            return len(self._keys)
+
+    def metrics(self):
+        """Returns a snapshot of pool hits, misses and refill throughput"""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = len(self._keys)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        snapshot["refill_rate"] = (snapshot["keys_generated"] / snapshot["refill_seconds"]
+                                   if snapshot["refill_seconds"] else 0.0)
+        return snapshot
+
+    def _mint(self, count, cursor=None):
+        """Generates `count` keys, dropping any DID already in did_keys (one bulk query per batch)"""
+        from Registration_API_v6 import find_existing_dids
+        keys = []
+        db = self.connect_db() if cursor is None else None
+        try:
+            if db is not None:
+                cursor = db.cursor()
+            while len(keys) < count:
+                batch = generate_did_keys_pem(count - len(keys))
+                existing = find_existing_dids(cursor, [did for did, _ in batch])
+                keys.extend((did, pem) for did, pem in batch if did not in existing)
+                with self._lock:
+                    self._metrics["duplicates_rejected"] += len(existing)
+        finally:
+            if db is not None:
+                db.close()
+        return keys
+
+    def _refill_loop(self):
+        while not self._stopped.is_set():
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            while not self._stopped.is_set():
+                missing = self.max_size - self.size()
+                if missing <= 0:
+                    break
+                started = time.perf_counter()
+                try:
+                    keys = self._mint(min(missing, self.refill_batch))
+                except Exception as e:
+                    print(f"DID:key pool refill failed: {e}")
+                    self._stopped.wait(1.0)
+                    continue
+                with self._lock:
+                    self._keys.extend(keys[:self.max_size - len(self._keys)])
+                    self._metrics["keys_generated"] += len(keys)
+                    self._metrics["refill_seconds"] += time.perf_counter() - started
+                    self._metrics["refills"] += 1
@@ -0,0 +1,433 @@
+import json
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import deque
+from itertools import repeat
+
+# -----------------------------
+# In-memory linked-entity graph
+# -----------------------------
+# HSML entities reference each other through linkedTo, registered_by, issuedBy,
+# authorizedForDomain and canAccess. EntityGraph interns every DID as an integer
+# and keeps the edges in compressed arrays (one offsets array plus one packed
+# target|edge-type array per direction), so multi-hop questions such as "what can
+# X reach through its grants?" or "every descendant of this twin" are answered
+# with a breadth-first walk over integers instead of one SELECT per DID.
+#
+# Edges added after the last compaction (register_entity, bulk imports) sit in a
+# small per-node overflow table and are folded into the arrays by compact().
+# save() / load() write the arrays as-is, so startup is a few file reads.
+#
+# A snapshot is only reused while the registry has not changed since it was
+# taken. Every transaction that writes did_keys or access_grants also appends a
+# row to a change log (registry_changes), an insert with its own auto-increment
+# key, so concurrent registrations never wait on each other for it. The registry
+# version is the number of logged changes. A graph counts the changes it
+# reflects: build_graph reads the count before the rows, and each registration
+# adds its one change as its edges are added. A change made elsewhere (another
+# worker, a rollback) is not counted, so the graph's version falls behind and
+# load_or_build rebuilds instead. The count is read once per start.
+
+EDGE_TYPES = ("linkedTo", "registered_by", "issuedBy", "authorizedForDomain", "canAccess")
+_EDGE_BITS = 3
+_EDGE_MASK = (1 << _EDGE_BITS) - 1
+_EDGE_IDS = {name: index for index, name in enumerate(EDGE_TYPES)}
+_EDGE_MASK_ALL = (1 << len(EDGE_TYPES)) - 1
+
+SNAPSHOT_MAGIC = b"HSMLGRF2"
+_SNAPSHOT_HEADER = struct.Struct("<8sB6Q")
+
+# Compact automatically once this many edges (or a quarter of the graph) are waiting in the overflow tables
+COMPACT_THRESHOLD = 65536
+
+def _connect_db():
+    from Registration_API_v6 import connect_db
+    return connect_db()
+
+REGISTRY_CHANGES_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS registry_changes ("
+    "id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY, "
+    "change_type VARCHAR(32) NOT NULL)"
+)
+
+# Function to create the change log if it does not exist
+def ensure_registry_changes(cursor):
+    cursor.execute(REGISTRY_CHANGES_SCHEMA)
+
+# Function to get the change log ready (the web apps and the CLIs run this first)
+def prepare_registry_changes():
+    db = _connect_db()
+    try:
+        ensure_registry_changes(db.cursor())
+        db.commit()
+    finally:
+        db.close()
+
+# Function to record a change to did_keys / access_grants
+def record_registry_change(cursor, change_type):
+    """Logs one change inside the caller's transaction ("register", "rollback", "grants", ...)"""
+    cursor.execute("INSERT INTO registry_changes (change_type) VALUES (%s)", (change_type,))
+
+def registry_version(cursor):
+    """Returns the number of committed registry changes"""
+    cursor.execute("SELECT COUNT(*) FROM registry_changes")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def _reference_dids(value):
+    """Returns the DIDs in a reference (object with swid, bare DID string, or a list of them)"""
+    items = value if isinstance(value, list) else [value]
+    dids = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("swid")
+        if isinstance(item, str) and item.startswith("did:"):
+            dids.append(item)
+    return dids
+
+# Function to list the graph edges of one HSML object
+def extract_edges(did, data, registered_by=None):
+    """Returns (source_did, edge_type, target_did) triples for an HSML object"""
+    edges = [(did, "linkedTo", target) for target in _reference_dids(data.get("linkedTo"))]
+    if registered_by and registered_by != did:
+        edges.append((did, "registered_by", registered_by))
+    if data.get("@type") == "Credential":
+        domains = _reference_dids(data.get("authorizedForDomain"))
+        edges.extend((did, "issuedBy", issuer) for issuer in _reference_dids(data.get("issuedBy")))
+        edges.extend((did, "authorizedForDomain", domain) for domain in domains)
+        edges.extend((grantee, "canAccess", domain)
+                     for grantee in _reference_dids(data.get("accessAuthorization")) for domain in domains)
+    # Grants stored the old way, as a canAccess list inside the domain's metadata
+    edges.extend((grantee, "canAccess", did) for grantee in _reference_dids(data.get("canAccess")))
+    return [edge for edge in edges if edge[0] != edge[2]]
+
+class _Adjacency:
+    """One direction of the graph: CSR arrays plus an overflow table for recent edges"""
+    def __init__(self, offsets=None, edges=None):
+        self.offsets = offsets if offsets is not None else array("Q", [0])
+        self.edges = edges if edges is not None else array("Q")
+        self.overflow = {}
+        self.overflow_count = 0
+
+    def add(self, node, packed):
+        self.overflow.setdefault(node, []).append(packed)
+        self.overflow_count += 1
+
+    def neighbors(self, node):
+        if node + 1 < len(self.offsets):
+            yield from self.edges[self.offsets[node]:self.offsets[node + 1]]
+        yield from self.overflow.get(node, ())
+
+    def contains(self, node, packed):
+        extra = self.overflow.get(node)
+        if extra and packed in extra:
+            return True
+        return node + 1 < len(self.offsets) and packed in self.edges[self.offsets[node]:self.offsets[node + 1]]
+
+    def compact(self, node_count):
+        old_nodes = len(self.offsets) - 1
+        if not self.overflow and old_nodes == node_count:
+            return
+        old_offsets, old_edges = self.offsets, self.edges
+        offsets = array("Q", [0])
+        edges = array("Q")
+        start = 0
+
+        def copy_until(stop):
+            # Nodes [start, stop) keep their edges; copy them as whole slices, shifting offsets
+            old_stop = min(stop, old_nodes)
+            if start < old_stop:
+                shift = len(edges) - old_offsets[start]
+                edges.extend(old_edges[old_offsets[start]:old_offsets[old_stop]])
+                offsets.extend(map(shift.__add__, old_offsets[start + 1:old_stop + 1]))
+            empty = stop - max(start, old_stop)
+            if empty > 0:
+                offsets.extend(repeat(len(edges), empty))
+
+        for node in sorted(self.overflow):
+            copy_until(node)
+            if node < old_nodes:
+                edges.extend(old_edges[old_offsets[node]:old_offsets[node + 1]])
+            edges.extend(self.overflow[node])
+            offsets.append(len(edges))
+            start = node + 1
+        copy_until(node_count)
+        self.offsets, self.edges = offsets, edges
+        self.overflow = {}
+        self.overflow_count = 0
+
+    def edge_count(self):
+        return len(self.edges) + self.overflow_count
+
+class EntityGraph:
+    def __init__(self):
+        self._ids = {}
+        self._dids = []
+        # Registered entities added so far (referenced-only DIDs are nodes but not entities)
+        self.entity_count = 0
+        # Registry changes this graph reflects (see registry_version)
+        self.version = 0
+        self._forward = _Adjacency()
+        self._reverse = _Adjacency()
+        self._lock = threading.RLock()
+
+    def _intern(self, did):
+        node = self._ids.get(did)
+        if node is None:
+            node = len(self._dids)
+            self._ids[did] = node
+            self._dids.append(did)
+        return node
+
+    # Function to add edges to the graph (duplicates are ignored)
+    def add_edges(self, edges, changes=0):
+        """Adds (source_did, edge_type, target_did) triples.
+
+        changes: the registry changes the write that produced them committed (record_registry_change).
+        """
+        with self._lock:
+            self.version += changes
+            for source, edge_type, target in edges:
+                label = _EDGE_IDS[edge_type]
+                source_id, target_id = self._intern(source), self._intern(target)
+                packed = target_id << _EDGE_BITS | label
+                # Out-degrees are small (a few links per entity), so a scan is the cheapest dedupe
+                if self._forward.contains(source_id, packed):
+                    continue
+                self._forward.add(source_id, packed)
+                self._reverse.add(target_id, source_id << _EDGE_BITS | label)
+            # Grows geometrically, so compaction stays amortized O(1) per edge on large builds
+            if self._forward.overflow_count >= max(COMPACT_THRESHOLD, len(self._forward.edges) // 4):
+                self.compact()
+
+    # Function to add registered entities to the graph
+    def add_entities(self, entities, changes=0):
+        """Adds the edges of (did, data, registered_by) triples; the did is interned even without edges"""
+        with self._lock:
+            for did, data, registered_by in entities:
+                self._intern(did)
+                self.entity_count += 1
+                self.add_edges(extract_edges(did, data, registered_by))
+            self.version += changes
+
+    def add_entity(self, did, data, registered_by=None, changes=0):
+        self.add_entities([(did, data, registered_by)], changes)
+
+    # Function to fold recent edges into the arrays
+    def compact(self):
+        with self._lock:
+            self._forward.compact(len(self._dids))
+            self._reverse.compact(len(self._dids))
+
+    def __contains__(self, did):
+        return did in self._ids
+
+    def __len__(self):
+        return len(self._dids)
+
+    def _edge_mask(self, edge_types):
+        if edge_types is None:
+            return _EDGE_MASK_ALL
+        if isinstance(edge_types, str):
+            edge_types = (edge_types,)
+        mask = 0
+        for edge_type in edge_types:
+            mask |= 1 << _EDGE_IDS[edge_type]
+        return mask
+
+    # Function to list the direct neighbours of a DID
+    def neighbors(self, did, edge_types=None, reverse=False):
+        """Returns the DIDs one edge away (following edges backwards when reverse=True)"""
+        with self._lock:
+            node = self._ids.get(did)
+            if node is None:
+                return []
+            mask = self._edge_mask(edge_types)
+            adjacency = self._reverse if reverse else self._forward
+            return [self._dids[packed >> _EDGE_BITS] for packed in adjacency.neighbors(node)
+                    if mask >> (packed & _EDGE_MASK) & 1]
+
+    # Function to walk the graph breadth-first
+    def traverse(self, did, edge_types=None, reverse=False, max_depth=None, limit=None):
+        """Returns every DID reachable from did (nearest first, did itself excluded)"""
+        with self._lock:
+            start = self._ids.get(did)
+            if start is None:
+                return []
+            mask = self._edge_mask(edge_types)
+            adjacency = self._reverse if reverse else self._forward
+            visited = bytearray(len(self._dids))
+            visited[start] = 1
+            found = []
+            frontier = deque([(start, 0)])
+            while frontier:
+                node, depth = frontier.popleft()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for packed in adjacency.neighbors(node):
+                    if not mask >> (packed & _EDGE_MASK) & 1:
+                        continue
+                    target = packed >> _EDGE_BITS
+                    if visited[target]:
+                        continue
+                    visited[target] = 1
+                    found.append(self._dids[target])
+                    if limit is not None and len(found) >= limit:
+                        return found
+                    frontier.append((target, depth + 1))
+            return found
+
+    # Digital-twin hierarchy: every entity that (transitively) links to did
+    def descendants(self, did, max_depth=None, limit=None):
+        return self.traverse(did, "linkedTo", reverse=True, max_depth=max_depth, limit=limit)
+
+    # Domains reachable from did through chains of canAccess grants
+    def accessible_domains(self, did, max_depth=None):
+        return self.traverse(did, "canAccess", max_depth=max_depth)
+
+    # Function to answer "can X reach Y through grants?"
+    def can_access(self, grantee_did, domain_did):
+        """True if domain_did is reachable from grantee_did through canAccess edges"""
+        with self._lock:
+            target = self._ids.get(domain_did)
+            if target is None or grantee_did not in self._ids:
+                return False
+            return domain_did in self.accessible_domains(grantee_did)
+
+    # Function to follow registered_by up to a self-registered Person/Organization
+    def ownership_chain(self, did):
+        """Returns [did, registrar, registrar's registrar, ...]"""
+        chain = [did]
+        seen = {did}
+        while True:
+            owners = self.neighbors(chain[-1], "registered_by")
+            if not owners or owners[0] in seen:
+                return chain
+            chain.append(owners[0])
+            seen.add(owners[0])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "nodes": len(self._dids),
+                "edges": self._forward.edge_count(),
+                "uncompacted_edges": self._forward.overflow_count
+            }
+
+    # Function to write the graph to a snapshot file
+    def save(self, path):
+        """Writes a binary snapshot (compacting first); the file is replaced atomically"""
+        with self._lock:
+            self.compact()
+            dids = "\n".join(self._dids).encode("utf-8")
+            # Per process and thread: web workers all save the same snapshot path at shutdown
+            temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(_SNAPSHOT_HEADER.pack(
+                    SNAPSHOT_MAGIC, sys.byteorder == "little", len(self._dids), len(dids),
+                    len(self._forward.edges), len(self._reverse.edges), self.entity_count, self.version
+                ))
+                file.write(dids)
+                for adjacency in (self._forward, self._reverse):
+                    adjacency.offsets.tofile(file)
+                    adjacency.edges.tofile(file)
+            os.replace(temporary_path, path)
+
+    # Function to read a graph written by save()
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            header = file.read(_SNAPSHOT_HEADER.size)
+            if len(header) != _SNAPSHOT_HEADER.size:
+                raise ValueError(f"{path} is not an entity graph snapshot")
+            (magic, little_endian, node_count, dids_length,
+             forward_edges, reverse_edges, entity_count, version) = _SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not an entity graph snapshot")
+            graph = cls()
+            graph.entity_count = entity_count
+            graph.version = version
+            dids = file.read(dids_length).decode("utf-8")
+            graph._dids = dids.split("\n") if node_count else []
+            graph._ids = {did: node for node, did in enumerate(graph._dids)}
+            arrays = []
+            for length in (node_count + 1, forward_edges, node_count + 1, reverse_edges):
+                values = array("Q")
+                values.fromfile(file, length)
+                if bool(little_endian) != (sys.byteorder == "little"):
+                    values.byteswap()
+                arrays.append(values)
+        graph._forward = _Adjacency(arrays[0], arrays[1])
+        graph._reverse = _Adjacency(arrays[2], arrays[3])
+        return graph
+
+# Function to build the graph from the registry
+def build_graph(cursor=None):
+    """Builds an EntityGraph from every did_keys row plus the access_grants table"""
+    if cursor is None:
+        db = _connect_db()
+        try:
+            return build_graph(db.cursor())
+        finally:
+            db.close()
+    graph = EntityGraph()
+    # Counted first: a change committed after this is either in the rows below or leaves the count behind
+    graph.version = registry_version(cursor)
+    cursor.execute("SELECT did, metadata, registered_by FROM did_keys")
+    entities = []
+    for did, metadata, registered_by in cursor.fetchall():
+        try:
+            data = json.loads(metadata)
+        except (TypeError, ValueError):
+            data = None
+        entities.append((did, data if isinstance(data, dict) else {}, registered_by))
+    graph.add_entities(entities)
+    cursor.execute("SELECT grantee_did, domain_did FROM access_grants")
+    graph.add_edges((grantee, "canAccess", domain) for grantee, domain in cursor.fetchall() if grantee != domain)
+    graph.compact()
+    return graph
+
+# Function to start from a snapshot when there is one
+def load_or_build(snapshot_path=None, cursor=None):
+    """Loads snapshot_path if the registry has not changed since it was saved, otherwise rebuilds (and saves the snapshot)"""
+    if cursor is None:
+        prepare_registry_changes()
+        db = _connect_db()
+        try:
+            return load_or_build(snapshot_path, db.cursor())
+        finally:
+            db.close()
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            graph = EntityGraph.load(snapshot_path)
+        except (ValueError, EOFError):  # not a snapshot, an older format, or truncated
+            graph = None
+        if graph is not None and graph.version == registry_version(cursor):
+            return graph
+    graph = build_graph(cursor)
+    if snapshot_path:
+        graph.save(snapshot_path)
+    return graph
+
+# Queries served by /api/graph
+GRAPH_QUERIES = ("neighbors", "descendants", "access", "ownership")
+
+# Function to answer one /api/graph request
+def run_graph_query(graph, query, did, max_depth=None, limit=None):
+    """Returns {"did", "query", "results"}; raises ValueError for unknown queries or bad limits"""
+    if query not in GRAPH_QUERIES:
+        raise ValueError(f"Unknown graph query '{query}'; expected one of {list(GRAPH_QUERIES)}")
+    max_depth = int(max_depth) if max_depth is not None else None
+    limit = max(1, min(int(limit), 100000)) if limit is not None else 10000
+    if query == "neighbors":
+        results = {"outgoing": graph.neighbors(did), "incoming": graph.neighbors(did, reverse=True)}
+    elif query == "descendants":
+        results = graph.descendants(did, max_depth=max_depth, limit=limit)
+    elif query == "access":
+        results = graph.accessible_domains(did, max_depth=max_depth)[:limit]
+    else:
+        results = graph.ownership_chain(did)
+    return {"did": did, "query": query, "results": results}
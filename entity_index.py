@@ -0,0 +1,144 @@
+import base64
+import json
+
+# -----------------------------
+# Secondary indexes over registered entities
+# -----------------------------
+# register_entity writes one (field, value, did) row per indexed term alongside the
+# did_keys row, in the same transaction. Queries such as "all Agents created by X"
+# or "every Entity linkedTo Y" then become index range scans instead of
+# json.loads-ing every metadata blob. Results are ordered by DID and paginated with
+# an opaque cursor (the last DID returned), so deep pages cost the same as the first.
+
+INDEXED_FIELDS = ("@type", "registered_by", "name", "creator", "linkedTo")
+MAX_VALUE_LENGTH = 255
+
+ENTITY_INDEX_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entity_index ("
+    "field VARCHAR(32) NOT NULL, "
+    "value VARCHAR(255) NOT NULL, "
+    "did VARCHAR(128) NOT NULL, "
+    "PRIMARY KEY (field, value, did))"
+)
+
+def _connect_db():
+    from Registration_API_v6 import connect_db
+    return connect_db()
+
+def _reference_values(value):
+    """Turns a DID reference (object with swid, bare string, or a list of them) into strings"""
+    items = value if isinstance(value, list) else [value]
+    values = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("swid")
+        if isinstance(item, str) and item:
+            values.append(item)
+    return values
+
+# Function to list the index terms of one HSML object
+def extract_index_terms(data, registered_by=None):
+    """Returns the (field, value) pairs indexed for an HSML object"""
+    terms = set()
+    if isinstance(data.get("@type"), str):
+        terms.add(("@type", data["@type"]))
+    if isinstance(data.get("name"), str) and data["name"]:
+        terms.add(("name", data["name"]))
+    if registered_by:
+        terms.add(("registered_by", registered_by))
+    for field in ("creator", "linkedTo"):
+        if field in data:
+            terms.update((field, value) for value in _reference_values(data[field]))
+    return sorted((field, value[:MAX_VALUE_LENGTH]) for field, value in terms)
+
+# Function to index one or many registered entities
+def index_entities(cursor, entities):
+    """Writes index rows for (did, data, registered_by) triples with one multi-row insert"""
+    rows = [(field, value, did) for did, data, registered_by in entities
+            for field, value in extract_index_terms(data, registered_by)]
+    for start in range(0, len(rows), 1000):
+        chunk = rows[start:start + 1000]
+        placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+        cursor.execute(f"INSERT IGNORE INTO entity_index (field, value, did) VALUES {placeholders}",
+                       tuple(value for row in chunk for value in row))
+
+def index_entity(cursor, did, data, registered_by=None):
+    index_entities(cursor, [(did, data, registered_by)])
+
+def encode_cursor(did):
+    return base64.urlsafe_b64encode(did.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor_token):
+    try:
+        return base64.urlsafe_b64decode(cursor_token.encode("ascii")).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+# Function to find entities by indexed fields
+def query_entities(filters, limit=100, cursor=None, include_metadata=False, db_cursor=None):
+    """Returns {"results": [...], "next_cursor": token or None} for entities matching every filter.
+
+    filters maps indexed fields (see INDEXED_FIELDS) to the value to match, e.g.
+    {"@type": "Agent", "creator": "did:key:..."}.
+    """
+    if not filters:
+        raise ValueError("At least one filter is required")
+    unknown = [field for field in filters if field not in INDEXED_FIELDS]
+    if unknown:
+        raise ValueError(f"Fields are not indexed: {unknown}")
+    limit = max(1, min(int(limit), 1000))
+
+    if db_cursor is None:
+        db = _connect_db()
+        try:
+            return query_entities(filters, limit, cursor, include_metadata, db.cursor())
+        finally:
+            db.close()
+
+    # The first filter drives the range scan and the others are primary-key probes;
+    # @type has the fewest distinct values, so it never drives when anything else is given
+    (first_field, first_value), *others = sorted(filters.items(), key=lambda item: (item[0] == "@type", item[0]))
+    query = "SELECT i.did FROM entity_index i WHERE i.field = %s AND i.value = %s"
+    params = [first_field, str(first_value)[:MAX_VALUE_LENGTH]]
+    for field, value in others:
+        query += " AND EXISTS (SELECT 1 FROM entity_index o WHERE o.field = %s AND o.value = %s AND o.did = i.did)"
+        params += [field, str(value)[:MAX_VALUE_LENGTH]]
+    if cursor:
+        query += " AND i.did > %s"
+        params.append(decode_cursor(cursor))
+    query += f" ORDER BY i.did LIMIT {limit + 1}"
+    db_cursor.execute(query, tuple(params))
+    dids = [row[0] for row in db_cursor.fetchall()]
+
+    next_cursor = encode_cursor(dids[limit - 1]) if len(dids) > limit else None
+    dids = dids[:limit]
+    if not include_metadata:
+        return {"results": dids, "next_cursor": next_cursor}
+
+    metadata = {}
+    if dids:
+        placeholders = ", ".join(["%s"] * len(dids))
+        db_cursor.execute(f"SELECT did, metadata FROM did_keys WHERE did IN ({placeholders})", tuple(dids))
+        metadata = {did: json.loads(blob) for did, blob in db_cursor.fetchall()}
+    return {"results": [{"did": did, "metadata": metadata.get(did)} for did in dids], "next_cursor": next_cursor}
+
+# Function to rebuild the index from did_keys (for rows registered before indexing existed)
+def rebuild_index(db_cursor, batch_size=5000):
+    """Re-indexes every did_keys row; returns the number of entities indexed"""
+    db_cursor.execute("DELETE FROM entity_index")
+    db_cursor.execute("SELECT did, metadata, registered_by FROM did_keys")
+    count = 0
+    batch = []
+    for did, metadata, registered_by in db_cursor.fetchall():
+        try:
+            data = json.loads(metadata)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(data, dict):
+            batch.append((did, data, registered_by))
+        if len(batch) >= batch_size:
+            index_entities(db_cursor, batch)
+            count += len(batch)
+            batch = []
+    index_entities(db_cursor, batch)
+    return count + len(batch)
@@ -0,0 +1,274 @@
+import json
+import re
+
+import Registration_API_v6 as registration
+from hsml_validator import LINK_FIELDS
+
+# -----------------------------
+# Streaming ingestion for large HSML documents
+# -----------------------------
+# The top-level object is scanned in fixed-size chunks. Small member values (the
+# header fields such as @context, @type, swid and name, plus anything under
+# max_value_size) are decoded for validation and the registry metadata; large
+# values (embedded geometry, ...) are only skipped over. Reference arrays
+# (linkedTo) are decoded one entry at a time instead, so however long they are,
+# every reference is validated and reaches the registry, entity_index and the
+# entity graph. The output JSON is produced by copying the source bytes through
+# with the swid member replaced, so peak memory is bounded by chunk_size +
+# max_value_size plus the decoded references.
+#
+# The registry row (did_keys.metadata) holds the decoded members only. The names
+# of the members left out are stored with it under "_streamed_fields", so
+# /api/entities?metadata=true and other readers of the row never pass a partial
+# document off as the whole one; the full document is in the output JSON.
+
+CHUNK_SIZE = 1 << 20
+MAX_DECODED_VALUE = 1 << 16
+MAX_KEY_SIZE = 1 << 12
+
+_WHITESPACE = b" \t\r\n"
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+
+class StreamingJSONError(ValueError):
+    """Raised when the document is not a well-formed JSON object"""
+
+class _ByteScanner:
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = b""
+        self.pos = 0
+        self.offset = 0  # absolute file offset of buffer[0]
+
+    def tell(self):
+        return self.offset + self.pos
+
+    def _fill(self):
+        chunk = self.stream.read(self.chunk_size)
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self):
+        if self.pos >= len(self.buffer) and not self._fill():
+            return b""
+        return self.buffer[self.pos:self.pos + 1]
+
+    def skip_whitespace(self):
+        while True:
+            char = self.peek()
+            if not char or char not in _WHITESPACE:
+                return char
+            self.pos += 1
+
+    def expect(self, char):
+        if self.skip_whitespace() != char:
+            raise StreamingJSONError(f"Expected {char.decode()} at byte {self.tell()}")
+        self.pos += 1
+
+    def scan_value(self, limit):
+        """Consumes one JSON value; returns its raw bytes, or None if it is larger than `limit`"""
+        captured = []
+        size = 0
+
+        def take(end):
+            nonlocal size, captured
+            if captured is not None:
+                size += end - self.pos
+                if size > limit:
+                    captured = None
+                else:
+                    captured.append(self.buffer[self.pos:end])
+            self.pos = end
+
+        first = self.skip_whitespace()
+        if not first:
+            raise StreamingJSONError("Unexpected end of document")
+        if first not in b'{["':
+            # Scalar: number, true, false or null
+            while True:
+                match = _SCALAR_END.search(self.buffer, self.pos)
+                if match:
+                    take(match.start())
+                    break
+                take(len(self.buffer))
+                if not self._fill():
+                    break
+            return b"".join(captured) if captured is not None else None
+
+        depth = 0
+        in_string = False
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                raise StreamingJSONError("Unexpected end of document")
+            pattern = _STRING_SPECIAL if in_string else _STRUCTURAL
+            match = pattern.search(self.buffer, self.pos)
+            if not match:
+                take(len(self.buffer))
+                continue
+            char = self.buffer[match.start():match.start() + 1]
+            if in_string and char == b"\\":
+                take(match.end())
+                if self.peek() == b"":
+                    raise StreamingJSONError("Unexpected end of document")
+                take(self.pos + 1)  # escaped character
+                continue
+            take(match.end())
+            if char == b'"':
+                in_string = not in_string
+                if not in_string and depth == 0:
+                    break
+            elif char in b"{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    break
+        return b"".join(captured) if captured is not None else None
+
+    def scan_array(self, limit):
+        """Consumes a JSON array entry by entry; returns the decoded entries, or None if one is larger than `limit`"""
+        self.expect(b"[")
+        items = []
+        if self.skip_whitespace() == b"]":
+            self.pos += 1
+            return items
+        while True:
+            raw_item = self.scan_value(limit)
+            if raw_item is None:
+                items = None
+            elif items is not None:
+                try:
+                    items.append(json.loads(raw_item))
+                except json.JSONDecodeError as e:
+                    raise StreamingJSONError(f"Invalid array entry at byte {self.tell()}: {e}")
+            separator = self.skip_whitespace()
+            self.pos += 1
+            if separator == b"]":
+                return items
+            if separator != b",":
+                raise StreamingJSONError(f"Expected ',' or ']' at byte {self.tell() - 1}")
+
+# Function to scan an HSML document without loading it
+def read_hsml_header(stream, max_value_size=MAX_DECODED_VALUE, chunk_size=CHUNK_SIZE):
+    """Scans a binary stream holding one JSON object.
+
+    Returns (fields, large_fields, layout): the decoded small members, the names of the
+    members that were skipped because they exceed max_value_size, and the byte layout
+    needed by copy_with_swid. Arrays under LINK_FIELDS are decoded entry by entry and
+    are only skipped if a single entry exceeds max_value_size.
+    """
+    scanner = _ByteScanner(stream, chunk_size)
+    scanner.expect(b"{")
+    layout = {"body_start": scanner.tell(), "body_end": None, "swid_span": None, "members": 0}
+    fields = {}
+    large_fields = []
+    previous_comma = None
+    separator = scanner.skip_whitespace()
+    while separator != b"}":
+        member_start = scanner.tell()
+        raw_key = scanner.scan_value(MAX_KEY_SIZE)
+        if raw_key is None or not raw_key.startswith(b'"'):
+            raise StreamingJSONError(f"Expected a member name at byte {member_start}")
+        key = json.loads(raw_key)
+        scanner.expect(b":")
+        if key in LINK_FIELDS and scanner.skip_whitespace() == b"[":
+            items = scanner.scan_array(max_value_size)
+            if items is None:
+                large_fields.append(key)
+            else:
+                fields[key] = items
+        else:
+            raw_value = scanner.scan_value(max_value_size)
+            if raw_value is None:
+                large_fields.append(key)
+            else:
+                try:
+                    fields[key] = json.loads(raw_value)
+                except json.JSONDecodeError as e:
+                    raise StreamingJSONError(f"Invalid value for '{key}': {e}")
+        member_end = scanner.tell()
+        layout["members"] += 1
+        separator = scanner.skip_whitespace()
+        if key == "swid":
+            # Remove the member together with one adjacent comma
+            if separator == b",":
+                layout["swid_span"] = (member_start, scanner.tell() + 1)
+            elif previous_comma is not None:
+                layout["swid_span"] = (previous_comma, member_end)
+            else:
+                layout["swid_span"] = (member_start, member_end)
+        if separator == b",":
+            previous_comma = scanner.tell()
+            scanner.pos += 1
+            separator = scanner.skip_whitespace()
+            if separator == b"}":
+                raise StreamingJSONError(f"Trailing comma at byte {previous_comma}")
+        elif separator != b"}":
+            raise StreamingJSONError(f"Expected ',' or '}}' at byte {scanner.tell()}")
+    layout["body_end"] = scanner.tell()
+    scanner.pos += 1
+    if scanner.skip_whitespace():
+        raise StreamingJSONError("Unexpected data after the JSON object")
+    return fields, large_fields, layout
+
+def _copy_range(source, destination, start, end, chunk_size):
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+# Function to write the document with a new swid, copying the body through unchanged
+def copy_with_swid(source, destination, layout, did_key, chunk_size=CHUNK_SIZE):
+    """Writes {"swid": did_key, <original members minus any old swid>} from a seekable binary source"""
+    destination.write(b'{"swid": ' + json.dumps(did_key).encode("utf-8"))
+    body_start, body_end = layout["body_start"], layout["body_end"]
+    swid_span = layout["swid_span"]
+    if layout["members"] > (1 if swid_span is not None else 0):
+        destination.write(b",")
+        if swid_span is None:
+            _copy_range(source, destination, body_start, body_end, chunk_size)
+        else:
+            _copy_range(source, destination, body_start, swid_span[0], chunk_size)
+            _copy_range(source, destination, swid_span[1], body_end, chunk_size)
+    destination.write(b"}")
+
+# Function to register an HSML file through the streaming path
+def register_entity_streaming(json_file_path, output_directory, registered_by=None, overwrite=False,
+                              domain_private_key=None, max_value_size=MAX_DECODED_VALUE, chunk_size=CHUNK_SIZE):
+    """Registers an HSML file of any size with bounded memory.
+
+    Only the decoded members (small values and linkedTo references) are stored as
+    registry metadata, with the names of the omitted members under "_streamed_fields";
+    the full document is streamed into the output JSON file.
+    """
+    with open(json_file_path, "rb") as source:
+        try:
+            fields, large_fields, layout = read_hsml_header(source, max_value_size, chunk_size)
+        except (StreamingJSONError, UnicodeDecodeError):
+            return {"status": "error", "message": "Invalid JSON format"}
+
+        if fields.get("@type") == "Credential" and large_fields:
+            return {"status": "error", "message": "Credential fields are too large for streaming registration"}
+        # References that cannot be decoded could be neither validated nor indexed
+        for field in large_fields:
+            if field in LINK_FIELDS or field == "swid":
+                return {"status": "error", "message": f"'{field}' is too large for streaming registration"}
+        error = registration.validate_hsml(fields, present_fields=large_fields)
+        if error:
+            return error
+        if large_fields:
+            fields["_streamed_fields"] = large_fields
+
+        def write_json(destination, data):
+            copy_with_swid(source, destination, layout, data["swid"], chunk_size)
+
+        return registration.register_document(fields, output_directory, registered_by, write_json=write_json,
+                                              overwrite=overwrite, domain_private_key=domain_private_key)
@@ -0,0 +1,116 @@
+from did_codec import is_valid_did
+
+HSML_CONTEXT = "https://digital-twin-interoperability.github.io/hsml-schema-context/hsml.jsonld"
+
+# -----------------------------
+# HSML type rules
+# -----------------------------
+# required: fields that must be present
+# references: fields that must be objects carrying a well-formed did:key swid (nested HSML references)
+# recommended: (fields, warning) pairs reported when any of the fields is missing
+TYPE_RULES = {
+    "Entity": {
+        "required": ["name", "description"],
+        "references": [],
+        "recommended": [(["linkedTo"], "Object not linked to any other Entity. It will be registered under this user’s SWID.")]
+    },
+    "Person": {
+        "required": ["name", "birthDate", "email"],
+        "references": [],
+        "recommended": [(["affiliation"], "'affiliation' field is missing.")]
+    },
+    "Agent": {
+        "required": ["name", "creator", "dateCreated", "dateModified", "description"],
+        "references": [],
+        "recommended": []
+    },
+    "Credential": {
+        "required": ["name", "description", "issuedBy", "accessAuthorization", "authorizedForDomain"],
+        "references": ["issuedBy", "authorizedForDomain", "accessAuthorization"],
+        "recommended": [(["validFrom", "validUntil"], "Credential has no expiration date.")]
+    },
+    "Organization": {
+        "required": ["name", "description", "url", "address", "logo", "foundingDate", "email"],
+        "references": [],
+        "recommended": []
+    }
+}
+
+# Fields whose value, when present, must be a DID reference (object with a swid, or a
+# bare "did:key:" string) or a list of them
+LINK_FIELDS = ("linkedTo", "creator")
+
+# Rules compiled once at import into tuples so validation does no per-call setup
+def _compile_rules(type_rules):
+    return {
+        entity_type: (
+            tuple(rules["required"]),
+            tuple(rules["references"]),
+            tuple((tuple(fields), warning) for fields, warning in rules["recommended"])
+        )
+        for entity_type, rules in type_rules.items()
+    }
+
+_COMPILED_RULES = _compile_rules(TYPE_RULES)
+
+def _is_did_reference(value):
+    return isinstance(value, dict) and is_valid_did(value.get("swid"))
+
+# Function to validate one HSML object
+def validate_document(data, present_fields=()):
+    """Validates an HSML object in one pass; returns (errors, warnings), both lists of strings
+
+    present_fields names fields known to exist but not decoded into `data` (e.g. large values
+    skipped by streaming ingestion); they only count towards the required-field check.
+    """
+    if not isinstance(data, dict):
+        return ["Uploaded file is not a valid JSON object"], []
+
+    errors = []
+    warnings = []
+    context = data.get("@context")
+    if not isinstance(context, (str, list)) or HSML_CONTEXT not in context:
+        errors.append("Not a valid HSML JSON")
+
+    entity_type = data.get("@type")
+    rules = _COMPILED_RULES.get(entity_type) if isinstance(entity_type, str) else None
+    if rules is None:
+        errors.append("Unknown or missing entity type")
+        return errors, warnings
+    required, references, recommended = rules
+
+    missing_fields = [field for field in required if field not in data and field not in present_fields]
+    if missing_fields:
+        errors.append(f"Missing required fields: {missing_fields}")
+
+    name = data.get("name")
+    if "name" in data and (not isinstance(name, str) or not name.strip()):
+        errors.append("'name' must be a non-empty string")
+
+    # A swid given in the document (e.g. one to overwrite) must itself be a DID
+    if "swid" in data and not is_valid_did(data["swid"]):
+        errors.append("'swid' must be a valid 'did:key:' DID")
+
+    for field in references:
+        if field in data and not _is_did_reference(data[field]):
+            errors.append(f"'{field}' must be an object with a valid 'did:key:' swid")
+
+    for field in LINK_FIELDS:
+        if field in data:
+            links = data[field] if isinstance(data[field], list) else [data[field]]
+            if not all(_is_did_reference(link) or is_valid_did(link) for link in links):
+                errors.append(f"'{field}' entries must be DID:key references")
+
+    for fields, warning in recommended:
+        for field in fields:
+            if field not in data and field not in present_fields:
+                warnings.append(warning)
+                break
+
+    return errors, warnings
+
+# Function to validate many HSML objects
+def validate_documents(documents):
+    """Validates an iterable of HSML objects; yields (errors, warnings) for each, in order"""
+    for data in documents:
+        yield validate_document(data)
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# -----------------------------
+# Hot-path instrumentation
+# -----------------------------
+# span("stage") times a block into a per-stage latency histogram, increment()
+# bumps a counter, and snapshot() / render_prometheus() report both (app.py
+# serves them at /metrics). Histograms use fixed log-spaced buckets, so
+# recording is one bisect and a few additions under a lock.
+#
+# VERBOSE gates the debug prints in the registration path. Call sites test it
+# before building the message (`if instrumentation.VERBOSE: print(...)`), so
+# turning it off (HSML_VERBOSE=0 or set_verbose(False)) also skips the string
+# formatting.
+
+VERBOSE = os.environ.get("HSML_VERBOSE", "1").lower() not in ("0", "false", "no")
+METRICS_ENABLED = os.environ.get("HSML_METRICS", "1").lower() not in ("0", "false", "no")
+
+# Bucket upper bounds in seconds: 50us .. ~100s, four per decade
+BUCKET_BOUNDS = tuple(round(0.00005 * 10 ** (i / 4), 9) for i in range(26))
+
+def set_verbose(enabled):
+    global VERBOSE
+    VERBOSE = bool(enabled)
+
+def _percentile(counts, count, maximum, fraction):
+    if not count:
+        return 0.0
+    target = fraction * count
+    running = 0
+    for index, bucket_count in enumerate(counts):
+        running += bucket_count
+        if running >= target:
+            return min(BUCKET_BOUNDS[index], maximum) if index < len(BUCKET_BOUNDS) else maximum
+    return maximum
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations, capped at the max (seconds)"""
+        with self._lock:
+            return _percentile(list(self.counts), self.count, self.max, fraction)
+
+    def snapshot(self):
+        with self._lock:
+            counts, count, total, maximum = list(self.counts), self.count, self.total, self.max
+        return {
+            "count": count,
+            "total_seconds": total,
+            "mean_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": _percentile(counts, count, maximum, 0.50) * 1000,
+            "p90_ms": _percentile(counts, count, maximum, 0.90) * 1000,
+            "p99_ms": _percentile(counts, count, maximum, 0.99) * 1000,
+            "max_ms": maximum * 1000,
+            "buckets": counts
+        }
+
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+def histogram(name):
+    found = _histograms.get(name)
+    if found is None:
+        with _registry_lock:
+            found = _histograms.setdefault(name, Histogram())
+    return found
+
+# Function to count an event
+def increment(name, amount=1):
+    if not METRICS_ENABLED:
+        return
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, name):
+        self.histogram = histogram(name)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+# Function to time a stage: `with span("db.write"): ...`
+def span(name):
+    """Returns a context manager recording the block's duration under `name`"""
+    return _Span(name) if METRICS_ENABLED else _NO_SPAN
+
+# Function to record an externally measured duration
+def observe(name, seconds):
+    if METRICS_ENABLED:
+        histogram(name).observe(seconds)
+
+# Function to report every stage histogram and counter
+def snapshot():
+    with _registry_lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+    return {
+        "stages": {name: found.snapshot() for name, found in sorted(histograms.items())},
+        "counters": dict(sorted(counters.items()))
+    }
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+
+def _metric_name(*parts):
+    return "_".join(str(part).replace(".", "_").replace("-", "_").replace("@", "") for part in parts if part)
+
+def _flatten(prefix, value, lines):
+    if isinstance(value, bool):
+        lines.append(f"{prefix} {int(value)}")
+    elif isinstance(value, (int, float)):
+        lines.append(f"{prefix} {value}")
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(_metric_name(prefix, key), item, lines)
+
+# Function to render a metrics report in the Prometheus text format
+def render_prometheus(report):
+    """report is snapshot() plus optional component dicts (db_pool, did_key_pool, ...)"""
+    lines = ["# TYPE hsml_stage_seconds histogram"]
+    for name, stage in report.get("stages", {}).items():
+        running = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS + ("+Inf",), stage["buckets"]):
+            running += bucket_count
+            lines.append(f'hsml_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {running}')
+        lines.append(f'hsml_stage_seconds_sum{{stage="{name}"}} {stage["total_seconds"]}')
+        lines.append(f'hsml_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+    for name, value in report.get("counters", {}).items():
+        lines.append(f"{_metric_name('hsml', name)}_total {value}")
+    for component, values in report.items():
+        if component not in ("stages", "counters"):
+            _flatten(_metric_name("hsml", component), values, lines)
+    return "\n".join(lines) + "\n"
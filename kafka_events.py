@@ -0,0 +1,301 @@
+import heapq
+import itertools
+import json
+import queue
+import threading
+import time
+
+# -----------------------------
+# Asynchronous Kafka event pipeline
+# -----------------------------
+# Registrations enqueue topic creations and messages on a bounded queue and return
+# immediately. A background thread drains the queue in batches: all topics of a
+# batch are created with one create_topics request, then the batch's messages are
+# produced without flushing (the producer's linger.ms does the batching and poll()
+# serves delivery callbacks). A failed topic or message is retried with capped
+# exponential backoff. If a whole request fails (create_topics raises, the broker
+# is down), the batch is put back in order and the worker backs off, so the worker
+# thread never dies. The producer is only flushed on shutdown, which first drains
+# the queue and the pending retries; whatever still cannot be sent is recorded
+# (see unsent()) instead of being dropped silently.
+
+class EventQueueFullError(Exception):
+    """Raised when the event queue stays full for longer than the enqueue timeout"""
+
+class KafkaEventPipeline:
+    def __init__(self, admin_client, producer, max_queue_size=10000, batch_size=500, linger_seconds=0.05,
+                 max_retries=5, retry_backoff_seconds=0.1, max_backoff_seconds=5.0, enqueue_timeout=5.0,
+                 on_delivery=None):
+        self.admin_client = admin_client
+        self.producer = producer
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.on_delivery = on_delivery
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        # Events waiting for their retry: a heap of (due time, sequence, event)
+        self._retries = []
+        self._retry_sequence = itertools.count()
+        self._failed_batches = 0
+        self._unsent = []
+        self._known_topics = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._metrics = {
+            "enqueued": 0,
+            "topics_created": 0,
+            "topic_failures": 0,
+            "messages_produced": 0,
+            "messages_delivered": 0,
+            "delivery_failures": 0,
+            "retries": 0,
+            "batches": 0,
+            "batch_failures": 0,
+            "unsent": 0
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="kafka-events", daemon=True)
+            self._thread.start()
+        return self
+
+    def shutdown(self, timeout=30.0):
+        """Stops accepting events, then sends what is queued or waiting for a retry and flushes the producer.
+
+        Events that still cannot be sent within `timeout` seconds are recorded (see unsent())
+        and reported to on_delivery with an error.
+        """
+        deadline = time.monotonic() + timeout
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while True:
+            self._drain_remaining(deadline)
+            try:
+                self.producer.flush(max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                print(f"Kafka producer flush failed: {e}")
+            # Delivery failures reported by the flush come back as retries
+            if not self._has_pending() or time.monotonic() >= deadline:
+                break
+        self._record_unsent()
+
+    def create_topic(self, topic_name, num_partitions=1, replication_factor=1):
+        self._enqueue(("topic", topic_name, (num_partitions, replication_factor), 0))
+
+    def send(self, topic, message):
+        self._enqueue(("message", topic, json.dumps(message), 0))
+
+    def publish_agent(self, topic_name, agent_name):
+        """Queues the topic creation and the "New Agent registered" message for an Agent"""
+        self.create_topic(topic_name)
+        self.send(topic_name, {"message": f"New Agent registered: {agent_name}"})
+
+    def pending(self):
+        """Events queued or waiting for a retry"""
+        with self._lock:
+            retrying = len(self._retries)
+        return self._queue.qsize() + retrying
+
+    def unsent(self):
+        """Returns the (kind, target, payload) events shutdown() could not send"""
+        with self._lock:
+            return [(kind, target, payload) for kind, target, payload, _ in self._unsent]
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["retrying"] = len(self._retries)
+        snapshot["queued"] = self._queue.qsize()
+        return snapshot
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def _enqueue(self, event):
+        if self._stopped.is_set():
+            raise RuntimeError("Kafka event pipeline has been shut down")
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise EventQueueFullError(f"Kafka event queue full ({self._queue.maxsize} events)")
+        self._count("enqueued")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch(self._due_retries())
+            if batch and not self._process_batch(batch):
+                self._stopped.wait(self._batch_backoff())
+            try:
+                self.producer.poll(0)
+            except Exception as e:
+                print(f"Kafka producer poll failed: {e}")
+
+    def _next_batch(self, batch):
+        """Adds queued events to `batch` (due retries); waits for one and lingers briefly only if it is empty"""
+        deadline = time.monotonic() + self.linger_seconds
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=0.1))
+            except queue.Empty:
+                return batch
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _due_retries(self, until=None):
+        """Pops up to batch_size retries that are due by `until` (default: now), oldest first"""
+        until = time.monotonic() if until is None else until
+        due = []
+        with self._lock:
+            while self._retries and self._retries[0][0] <= until and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._retries)[2])
+        return due
+
+    def _has_pending(self):
+        with self._lock:
+            return bool(self._retries) or not self._queue.empty()
+
+    def _drain_remaining(self, deadline):
+        # Shutdown path: keeps sending until the queue and the retries are empty or the deadline passes
+        while time.monotonic() < deadline:
+            batch = self._due_retries()
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                if not self._process_batch(batch):
+                    time.sleep(min(self._batch_backoff(), max(deadline - time.monotonic(), 0)))
+                continue
+            with self._lock:
+                next_due = self._retries[0][0] if self._retries else None
+            if next_due is None:
+                return
+            time.sleep(max(min(next_due, deadline) - time.monotonic(), 0))
+
+    def _process_batch(self, batch):
+        """Processes a batch; if a request fails as a whole, puts the batch back in order and returns False"""
+        try:
+            self._process(batch)
+        except Exception as e:
+            self._count("batch_failures")
+            with self._lock:
+                self._failed_batches += 1
+                # Due immediately, in their original order; the worker backs off before taking them again
+                now = time.monotonic()
+                for event in batch:
+                    heapq.heappush(self._retries, (now, next(self._retry_sequence), event))
+            print(f"Kafka batch of {len(batch)} events failed, retrying: {e}")
+            return False
+        with self._lock:
+            self._failed_batches = 0
+        return True
+
+    def _batch_backoff(self):
+        with self._lock:
+            failures = self._failed_batches
+        return min(self.retry_backoff_seconds * (2 ** max(failures - 1, 0)), self.max_backoff_seconds)
+
+    def _process(self, batch):
+        self._count("batches")
+        topics = [event for event in batch if event[0] == "topic"]
+        messages = [event for event in batch if event[0] == "message"]
+        if topics:
+            self._create_topics(topics)
+        for event in messages:
+            self._produce(event)
+
+    def _create_topics(self, events):
+        from Registration_API_v6 import NewTopic
+        events = [event for event in events if event[1] not in self._known_topics]
+        if not events:
+            return
+        topic_list = [NewTopic(name, num_partitions=partitions, replication_factor=replication)
+                      for _, name, (partitions, replication), _ in events]
+        futures = self.admin_client.create_topics(topic_list)
+        for _, name, settings, attempt in events:
+            try:
+                futures[name].result()
+            except Exception as e:
+                if "already exists" not in str(e).lower():
+                    self._retry(("topic", name, settings, attempt), e)
+                    continue
+            self._known_topics.add(name)
+            self._count("topics_created")
+
+    def _produce(self, event):
+        _, topic, value, attempt = event
+
+        def delivery_report(error, message):
+            if error is None:
+                self._count("messages_delivered")
+                if self.on_delivery is not None:
+                    self.on_delivery(topic, value, None)
+            else:
+                self._retry(("message", topic, value, attempt + 1), error, increment=False)
+
+        while True:
+            try:
+                self.producer.produce(topic, value, callback=delivery_report)
+                self._count("messages_produced")
+                return
+            except BufferError:
+                # Local producer queue is full: let it drain, then try again
+                self.producer.poll(self.retry_backoff_seconds)
+            except Exception as e:
+                self._retry(event, e)
+                return
+
+    def _retry(self, event, error, increment=True):
+        kind, target, payload, attempt = event
+        if increment:
+            attempt += 1
+        if attempt > self.max_retries:
+            self._count("topic_failures" if kind == "topic" else "delivery_failures")
+            print(f"Kafka {kind} for '{target}' failed after {self.max_retries} retries: {error}")
+            if kind == "message" and self.on_delivery is not None:
+                self.on_delivery(target, payload, error)
+            return
+        delay = min(self.retry_backoff_seconds * (2 ** (attempt - 1)), self.max_backoff_seconds)
+        with self._lock:
+            self._metrics["retries"] += 1
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_sequence),
+                                           (kind, target, payload, attempt)))
+
+    def _record_unsent(self):
+        with self._lock:
+            events = [event for _, _, event in sorted(self._retries)]
+            self._retries = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not events:
+            return
+        with self._lock:
+            self._unsent.extend(events)
+            self._metrics["unsent"] += len(events)
+        print(f"Kafka event pipeline shut down with {len(events)} events not sent")
+        if self.on_delivery is not None:
+            error = RuntimeError("Not sent before the Kafka event pipeline shut down")
+            for kind, target, payload, _ in events:
+                if kind == "message":
+                    self.on_delivery(target, payload, error)
@@ -0,0 +1,408 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+import time
+
+import Registration_API_v6 as registration
+from access_grants import grant_access_many
+from artifact_store import ArtifactStore, open_artifact_store
+from did_cache import invalidate_did
+from entity_graph import record_registry_change
+from entity_index import index_entities
+from instrumentation import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: running processes' files cannot be told apart, so use one process per journal
+    fcntl = None
+
+# -----------------------------
+# Write-ahead registration journal
+# -----------------------------
+# A registration touches Kafka, the database and the artifact store in turn. The
+# journal ties them together: before any side effect, a durable "begin" record
+# holds everything needed to finish the registration (DID, private key, document,
+# topic, grant, output location). Each stage then appends a "stage" record and
+# the last one a "done" record. Those later records are not synced: if one is
+# lost, recovery simply redoes that stage, and every stage is idempotent
+# (REPLACE / INSERT IGNORE rows, atomic artifact writes, re-sent Kafka events).
+#
+# On restart, entries without "done" are replayed (rolled forward from the begin
+# record) or rolled back (rows and artifact files deleted). Documents registered
+# through the streaming path cannot be replayed, because their JSON comes from a
+# source file that is not journaled, so they are always rolled back.
+#
+# A registration that raises after its begin record is undone on the spot
+# (abort_registration), not left to be replayed at the next start. A durable
+# "aborted" stage goes first, so an entry whose rollback did not finish is
+# rolled back by recovery too, never replayed. Kafka events already sent are not
+# taken back.
+#
+# Durable appends are group-committed: the first writer to need a sync becomes
+# the leader and fsyncs everything written so far, and the writers that queued
+# behind it share that one fsync. Bulk imports journal a whole chunk per record.
+#
+# Completed entries of a bulk job are compacted into a per-job list of
+# (item, DID) pairs at each checkpoint. An interrupted job can then be resumed
+# and skips the items it already registered.
+#
+# Every process writes its own file, <path>.<pid>, and holds a lock on it for as
+# long as the journal is open, so several web workers can share one
+# HSML_JOURNAL_PATH. On open, under <path>.recovery.lock, a process takes over
+# the files whose lock it can get: their writers are gone. Their pending entries
+# and job progress move into its own file, and they are deleted. A clean close
+# with nothing left pending removes the process's file.
+
+class RegistrationJournal:
+    def __init__(self, path, sync=True, commit_delay=0.0, checkpoint_bytes=64 * 1024 * 1024):
+        self.base_path = path
+        self.path = f"{path}.{os.getpid()}"
+        self.sync = sync
+        self.commit_delay = commit_delay
+        self.checkpoint_bytes = checkpoint_bytes
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._pending = {}
+        self._jobs = {}
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._syncing = False
+        self._next_entry = 0
+        self._metrics = {"records": 0, "durable_records": 0, "syncs": 0, "checkpoints": 0,
+                         "replayed": 0, "rolled_back": 0, "absorbed_files": 0}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with _locked(f"{path}.recovery.lock"):
+            self._lock_file = _try_lock(f"{self.path}.lock")
+            if self._lock_file is None:
+                raise RuntimeError(f"Journal {self.path} is in use by another process")
+            # This pid's own file first (left by an earlier process with the same pid), then the orphans
+            self._load(self.path)
+            orphans = self._absorb_orphans()
+            # Entries left incomplete by an earlier process; see recover_journal
+            self.recovered = list(self._pending)
+            self._prefix = f"{os.getpid():x}.{int(time.time() * 1000):x}."
+            self._checkpoint()
+            # Only removed once their entries are durable in this process's file
+            for orphan_path, orphan_lock in orphans:
+                _remove(orphan_path)
+                _remove(f"{orphan_path}.lock")
+                if orphan_lock is not None:
+                    orphan_lock.close()
+
+    def _journal_files(self):
+        # Every other process's file for this journal
+        directory = os.path.dirname(os.path.abspath(self.base_path))
+        pattern = re.compile(re.escape(os.path.basename(self.base_path)) + r"\.\d+")
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if pattern.fullmatch(name) and os.path.join(directory, name) != os.path.abspath(self.path)]
+
+    def _absorb_orphans(self):
+        # Called under the recovery lock; returns [(path, lock file)] of the files taken over
+        orphans = []
+        for path in self._journal_files():
+            orphan_lock = None
+            if fcntl is not None:
+                orphan_lock = _try_lock(f"{path}.lock")
+                if orphan_lock is None:
+                    continue  # its process is still running
+            self._load(path)
+            orphans.append((path, orphan_lock))
+            self._metrics["absorbed_files"] += 1
+        return orphans
+
+    def _load(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as journal_file:
+            for line in journal_file:
+                # A torn tail (no newline, or not JSON) is the write that was in progress at the crash
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "begin":
+            self._pending[record["entry"]] = {"begin": record, "stages": []}
+        elif op == "stage":
+            entry = self._pending.get(record["entry"])
+            if entry is not None:
+                entry["stages"].append(record["stage"])
+        elif op == "done":
+            entry = self._pending.pop(record["entry"], None)
+            job = entry["begin"].get("job") if entry else None
+            if job is not None and record.get("outcome") != "rolled_back":
+                progress = self._jobs.setdefault(job, {})
+                for item in entry["begin"]["items"]:
+                    progress[item["item"]] = item["did"]
+        elif op == "job":
+            self._jobs.setdefault(record["job"], {}).update((item, did) for item, did in record["items"])
+        elif op == "job_finished":
+            self._jobs.pop(record["job"], None)
+
+    def _checkpoint(self):
+        # Rewrites the journal as: job progress, then the begin + stage records of pending entries
+        temporary_path = f"{self.path}.tmp"
+        # The journal holds private keys until their registration completes: owner-only, like the PEM artifacts
+        fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o600)
+        with os.fdopen(fd, "wb") as journal_file:
+            for job, progress in self._jobs.items():
+                journal_file.write(_encode({"op": "job", "job": job, "items": list(progress.items())}))
+            for entry in self._pending.values():
+                journal_file.write(_encode(entry["begin"]))
+                for stage in entry["stages"]:
+                    journal_file.write(_encode({"op": "stage", "entry": entry["begin"]["entry"], "stage": stage}))
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(temporary_path, self.path)
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._synced_seq = self._written_seq
+        self._metrics["checkpoints"] += 1
+
+    # Function to append one record, optionally waiting until it is on disk
+    def _append(self, record, durable):
+        line = _encode(record)
+        with self._lock:
+            self._file.write(line)
+            self._size += len(line)
+            self._written_seq += 1
+            seq = self._written_seq
+            self._apply(record)
+            self._metrics["records"] += 1
+            if durable:
+                self._metrics["durable_records"] += 1
+                while self._synced_seq < seq:
+                    if self._syncing:
+                        self._synced.wait()
+                    else:
+                        self._lead_sync()
+            if self._size > self.checkpoint_bytes and not self._syncing:
+                self._checkpoint()
+
+    def _lead_sync(self):
+        # Called with the lock held; releases it around the delay and the fsync so other
+        # writers can keep appending, and their records ride along on this sync
+        self._syncing = True
+        try:
+            if self.commit_delay:
+                self._lock.release()
+                try:
+                    time.sleep(self.commit_delay)
+                finally:
+                    self._lock.acquire()
+            target = self._written_seq
+            self._file.flush()
+            if self.sync:
+                fd = self._file.fileno()
+                self._lock.release()
+                try:
+                    with span("journal.sync"):
+                        os.fsync(fd)
+                finally:
+                    self._lock.acquire()
+            self._synced_seq = max(self._synced_seq, target)
+            self._metrics["syncs"] += 1
+        finally:
+            self._syncing = False
+            self._synced.notify_all()
+
+    # Function to record a registration before any of its side effects
+    def begin(self, items, output_directory, job=None, pack=None, pretty=None, replayable=True):
+        """Durably records a registration of one or many entities; returns its entry id.
+
+        items are dicts with item, did, private_key, data, registered_by, topic and grant
+        ([domain_did, grantee_did, credential_did] or None).
+        """
+        with self._lock:
+            self._next_entry += 1
+            entry = f"{self._prefix}{self._next_entry}"
+        self._append({"op": "begin", "entry": entry, "job": job, "output_directory": output_directory,
+                      "pack": pack, "pretty": pretty, "replayable": replayable, "items": items}, durable=True)
+        return entry
+
+    def stage(self, entry, stage):
+        self._append({"op": "stage", "entry": entry, "stage": stage}, durable=False)
+
+    def abort(self, entry):
+        """Durably marks `entry` as failed: recovery rolls it back instead of replaying it"""
+        self._append({"op": "stage", "entry": entry, "stage": "aborted"}, durable=True)
+
+    def done(self, entry, outcome="committed"):
+        self._append({"op": "done", "entry": entry, "outcome": outcome}, durable=False)
+        if outcome != "committed":
+            with self._lock:
+                self._metrics[outcome] += 1
+
+    # Function to look up what an earlier run of a bulk job already registered
+    def completed_items(self, job):
+        """Returns {item_id: did} for the items of `job` that were fully registered"""
+        with self._lock:
+            return dict(self._jobs.get(job, {}))
+
+    def finish_job(self, job):
+        """Forgets a job's progress once the whole job has completed"""
+        self._append({"op": "job_finished", "job": job}, durable=True)
+
+    def pending(self):
+        with self._lock:
+            return {entry: {"begin": value["begin"], "stages": list(value["stages"])}
+                    for entry, value in self._pending.items()}
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["pending"] = len(self._pending)
+            snapshot["jobs"] = len(self._jobs)
+            snapshot["bytes"] = self._size
+        snapshot["records_per_sync"] = snapshot["durable_records"] / snapshot["syncs"] if snapshot["syncs"] else 0.0
+        return snapshot
+
+    def close(self):
+        with self._lock:
+            while self._syncing:
+                self._synced.wait()
+            self._checkpoint()
+            self._file.close()
+            finished = not self._pending and not self._jobs
+        # With nothing left to recover or resume, no one needs the file
+        if finished:
+            with _locked(f"{self.base_path}.recovery.lock"):
+                _remove(self.path)
+                _remove(f"{self.path}.lock")
+                self._lock_file.close()
+        else:
+            self._lock_file.close()
+
+def _encode(record):
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+def _try_lock(path):
+    # Returns the open lock file if its exclusive lock was free, else None
+    lock_file = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+    return lock_file
+
+@contextmanager
+def _locked(path):
+    # Blocking exclusive lock on `path` for the duration of a with block
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Function to finish or undo the registrations an earlier process left incomplete
+def recover_journal(journal, mode="replay"):
+    """Replays (or, with mode="rollback", rolls back) every entry in journal.recovered.
+
+    Entries marked aborted are always rolled back.
+
+    Call this at startup, before any new registration uses the journal. Returns one
+    {"entry", "action", "dids"} dict per entry.
+    """
+    if mode not in ("replay", "rollback"):
+        raise ValueError("mode must be 'replay' or 'rollback'")
+    pending = journal.pending()
+    report = []
+    for entry in journal.recovered:
+        if entry not in pending:
+            continue
+        record, stages = pending[entry]["begin"], set(pending[entry]["stages"])
+        if mode == "replay" and record["replayable"] and "aborted" not in stages:
+            _replay(record, stages)
+            action = "replayed"
+        else:
+            _rollback(record)
+            action = "rolled_back"
+        journal.done(entry, outcome=action)
+        report.append({"entry": entry, "action": action, "dids": [item["did"] for item in record["items"]]})
+    journal.recovered = []
+    return report
+
+# Function to undo a registration that raised after journal.begin
+def abort_registration(journal, entry):
+    """Rolls back what `entry` may have written and closes it as rolled back.
+
+    Returns False if the rollback itself failed; the entry is then left for recover_journal.
+    """
+    pending = journal.pending().get(entry)
+    if pending is None:
+        return True
+    try:
+        journal.abort(entry)
+        _rollback(pending["begin"])
+    except Exception:
+        return False
+    journal.done(entry, outcome="rolled_back")
+    return True
+
+def _replay(record, stages):
+    items = record["items"]
+    if "kafka" not in stages:
+        registration.publish_agent_events([(item["topic"], item["data"]["name"]) for item in items if item["topic"]])
+    entities = [(item["did"], item["data"], item["registered_by"] or item["did"]) for item in items]
+    changes = 0
+    if "db" not in stages:
+        rows = [(did, did.replace("did:key:", ""), json.dumps(data), registered_by, item["topic"])
+                for (did, data, registered_by), item in zip(entities, items)]
+        db = registration.connect_db()
+        try:
+            cursor = db.cursor()
+            registration.insert_did_keys(cursor, rows)
+            index_entities(cursor, entities)
+            grant_access_many(cursor, [tuple(item["grant"]) for item in items if item["grant"]])
+            record_registry_change(cursor, "replay")
+            db.commit()
+            changes = 1
+        finally:
+            db.close()
+    for did, _, _ in entities:
+        invalidate_did(did)
+    if registration.entity_graph is not None:
+        registration.entity_graph.add_entities(entities, changes)
+    if "artifacts" not in stages:
+        store = open_artifact_store(record["output_directory"], pack=record["pack"], pretty=record["pretty"])
+        store.put_many((item["did"], item["data"], item["private_key"], None) for item in items)
+
+def _rollback(record):
+    dids = [item["did"] for item in record["items"]]
+    placeholders = ", ".join(["%s"] * len(dids))
+    db = registration.connect_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute(f"DELETE FROM did_keys WHERE did IN ({placeholders})", tuple(dids))
+        cursor.execute(f"DELETE FROM entity_index WHERE did IN ({placeholders})", tuple(dids))
+        cursor.execute(f"DELETE FROM access_grants WHERE credential_did IN ({placeholders})", tuple(dids))
+        record_registry_change(cursor, "rollback")
+        db.commit()
+    finally:
+        db.close()
+    for did in dids:
+        invalidate_did(did)
+    # Files of the per-DID store are removed; pack records stay (the pack is append-only)
+    store = open_artifact_store(record["output_directory"], pack=record["pack"], pretty=record["pretty"])
+    if isinstance(store, ArtifactStore):
+        for did in dids:
+            for path in store.paths(did):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,183 @@
+import os
+
+import Registration_API_v6 as registration
+import instrumentation
+from access_grants import can_access, prepare_access_grants
+from bulk_register import parse_json_lines, register_entities_batch
+from did_cache import cache_metrics, did_from_pem, resolve_did
+from did_pool import DIDKeyPool
+from entity_graph import load_or_build, run_graph_query
+from entity_index import query_entities
+from hsml_validator import HSML_CONTEXT
+from kafka_events import KafkaEventPipeline
+from registration_journal import RegistrationJournal, recover_journal
+
+# -----------------------------
+# Registry services shared by app.py and async_app.py
+# -----------------------------
+# The Flask and the ASGI app only differ in how requests arrive. Starting and
+# stopping the registry services (DID:key pool, Kafka event pipeline, access
+# grants, write-ahead journal, entity graph) and the work behind each page and
+# API live here as plain blocking functions: app.py calls them directly,
+# async_app.py runs them on its executors. API handlers return (body, status).
+
+# Query-string names accepted by /api/entities, mapped to indexed HSML fields
+QUERY_FIELDS = {"type": "@type", "registered_by": "registered_by", "name": "name", "creator": "creator", "linked_to": "linkedTo"}
+
+# Linked-entity graph snapshot; loaded at startup when current and saved on shutdown
+GRAPH_SNAPSHOT_PATH = os.environ.get("GRAPH_SNAPSHOT_PATH")
+# Write-ahead journal; incomplete registrations are recovered at startup (see registration_journal.py)
+JOURNAL_PATH = os.environ.get("HSML_JOURNAL_PATH")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def output_directory():
+    return os.environ.get("REGISTERED_OUTPUT_DIR", "registered")
+
+# Function to install the registry services on Registration_API_v6 (skips any already installed)
+def start_services():
+    # Keep ready-made DID:keys on hand so registrations never generate keys on the request path
+    if registration.did_key_pool is None:
+        registration.did_key_pool = DIDKeyPool(
+            max_size=int(os.environ.get("DID_POOL_MAX_SIZE", 1000)),
+            low_water=int(os.environ.get("DID_POOL_LOW_WATER", 250))
+        ).start()
+    # Send Agent topic creation / announcements to Kafka off the request path
+    if registration.event_pipeline is None:
+        registration.event_pipeline = KafkaEventPipeline(registration.admin_client, registration.producer).start()
+    # Grants stored the old way (allowed_did / canAccess) must be in access_grants before /api/can_access answers;
+    # imported on the first start only
+    prepare_access_grants()
+    # Finish registrations a crash left half done, then journal new ones.
+    # Recovery runs before the graph is built so replayed entities are part of it.
+    if JOURNAL_PATH and registration.journal is None:
+        registration.journal = RegistrationJournal(JOURNAL_PATH)
+        recover_journal(registration.journal, mode=os.environ.get("HSML_JOURNAL_RECOVERY", "replay"))
+    # Linked-entity graph for multi-hop queries; starts from GRAPH_SNAPSHOT_PATH when it is current
+    if registration.entity_graph is None:
+        registration.entity_graph = load_or_build(GRAPH_SNAPSHOT_PATH)
+
+# Function to flush and stop the registry services
+def stop_services():
+    if registration.event_pipeline is not None:
+        registration.event_pipeline.shutdown()
+        registration.event_pipeline = None
+    if registration.did_key_pool is not None:
+        registration.did_key_pool.stop()
+        registration.did_key_pool = None
+    if registration.entity_graph is not None and GRAPH_SNAPSHOT_PATH:
+        registration.entity_graph.save(GRAPH_SNAPSHOT_PATH)
+    if registration.journal is not None:
+        registration.journal.close()
+        registration.journal = None
+
+# Function behind the login page
+def login_with_pem(pem_data):
+    """Returns (user_did, welcome message) for uploaded PEM bytes; raises on an unreadable key"""
+    user_did = did_from_pem(pem_data)
+    # Greet registered users by name; lookups are served from the DID cache
+    user_data = resolve_did(user_did)
+    if user_data and user_data.get("name"):
+        return user_did, f"Welcome {user_data['name']}. Your DID: {user_did}"
+    return user_did, f"Login successful. Your DID: {user_did}"
+
+# Function behind the sign-up page (only Person or Organization)
+def new_user_document(form):
+    """Returns (HSML object, private key PEM) for a new Person or Organization with a fresh DID:key"""
+    hsml_type = form.get('hsml_type')
+    hsml_obj = {"@context": HSML_CONTEXT, "@type": hsml_type}
+    if hsml_type == "Person":
+        hsml_obj["name"] = form.get('name')
+        hsml_obj["birthDate"] = form.get('birth_date')
+        hsml_obj["email"] = form.get('email')
+    elif hsml_type == "Organization":
+        hsml_obj["name"] = form.get('org_name')
+        hsml_obj["description"] = form.get('description')
+    did_key, private_key = registration.generate_did_key()
+    hsml_obj["swid"] = did_key  # Attach the generated DID to the HSML JSON
+    return hsml_obj, private_key
+
+# Function behind POST /api/register
+def register_json(body, registered_by):
+    """Registers one HSML document with register_document's policy.
+
+    body is the HSML object itself, or {"document": ..., "overwrite": bool,
+    "domain_private_key": PEM} to pass the policy arguments. Without a logged-in user
+    only a Person or Organization can be registered (signing up); otherwise the user
+    must be a registered Person or Organization. The new private key is returned.
+    """
+    if isinstance(body, dict) and isinstance(body.get("document"), dict):
+        document, overwrite, domain_private_key = body["document"], body.get("overwrite") is True, body.get("domain_private_key")
+    else:
+        document, overwrite, domain_private_key = body, False, None
+    if not isinstance(document, dict):
+        return {"status": "error", "message": "Expected an HSML JSON object"}, 400
+    error = registration.validate_hsml(document)
+    if error is None:
+        if registered_by is None:
+            if document["@type"] not in ["Person", "Organization"]:
+                error = {"status": "error", "message": "Log in to register anything other than a Person or Organization"}
+        else:
+            error = registration.check_registrant(registered_by)
+    if error:
+        return error, 400
+    result = registration.register_document(document, output_directory(), registered_by, overwrite=overwrite,
+                                            domain_private_key=domain_private_key, include_private_key=True)
+    return result, 200 if result["status"] == "success" else 400
+
+# Function behind POST /api/register/batch
+def register_batch(mimetype, json_body, text, registered_by):
+    """Registers a JSON array (json_body) or JSON Lines (text) of HSML documents"""
+    if mimetype == "application/json":
+        if not isinstance(json_body, list):
+            return {"status": "error", "message": "Expected a JSON array of HSML documents"}, 400
+        documents = enumerate(json_body, start=1)
+    else:
+        documents = parse_json_lines(text.splitlines())
+    # The caller cannot read the server's output directory, so the new private keys are returned to it
+    report = register_entities_batch(documents, output_directory(), registered_by=registered_by,
+                                     journal=registration.journal, include_private_keys=True)
+    return {"status": "success", "results": report}, 200
+
+# Function behind GET /api/can_access: can the `grantee` DID access the `domain` DID?
+def check_access(args):
+    grantee_did = args.get('grantee')
+    domain_did = args.get('domain')
+    if not grantee_did or not domain_did:
+        return {"status": "error", "message": "Both 'grantee' and 'domain' are required"}, 400
+    return {"grantee": grantee_did, "domain": domain_did, "can_access": can_access(grantee_did, domain_did)}, 200
+
+# Function behind GET /api/entities: filter on indexed fields, paginate with the returned cursor
+def list_entities(args):
+    filters = {QUERY_FIELDS[name]: value for name, value in args.items() if name in QUERY_FIELDS}
+    try:
+        return query_entities(filters, limit=args.get('limit', 100), cursor=args.get('cursor'),
+                              include_metadata=args.get('metadata') == 'true'), 200
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+# Function behind GET /api/graph: multi-hop queries over linkedTo / registered_by / Credential edges
+def graph_query(args):
+    did = args.get('did')
+    if not did:
+        return {"status": "error", "message": "'did' is required"}, 400
+    try:
+        return run_graph_query(registration.entity_graph, args.get('query', 'neighbors'), did,
+                               max_depth=args.get('max_depth'), limit=args.get('limit')), 200
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+# Function behind GET /metrics: stage latency histograms, counters, and pool / cache / pipeline / graph state
+def metrics_report():
+    report = instrumentation.snapshot()
+    report["db_pool"] = registration.db_pool.metrics()
+    report["did_cache"] = cache_metrics()
+    if registration.did_key_pool is not None:
+        report["did_key_pool"] = registration.did_key_pool.metrics()
+    if registration.event_pipeline is not None:
+        report["event_pipeline"] = registration.event_pipeline.metrics()
+    if registration.entity_graph is not None:
+        report["entity_graph"] = registration.entity_graph.stats()
+    if registration.journal is not None:
+        report["journal"] = registration.journal.metrics()
+    return report
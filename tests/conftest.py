@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The registry modules read these at import: run against a throwaway SQLite
+# database (with the dummy Kafka client) and keep the debug prints off
+os.environ["DID_REGISTRY_DB"] = "sqlite"
+os.environ["DID_REGISTRY_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="hsml-tests-"), "registry.sqlite3")
+os.environ["HSML_VERBOSE"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
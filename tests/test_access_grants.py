@@ -0,0 +1,44 @@
+import json
+
+import Registration_API_v6 as registration
+from access_grants import can_access, prepare_access_grants
+
+
+def add_legacy_domain(did, allowed_did=None, can_access_list=None):
+    db = registration.connect_db()
+    try:
+        metadata = {"@type": "Organization", "name": did}
+        if can_access_list is not None:
+            metadata["canAccess"] = can_access_list
+        db.cursor().execute("INSERT INTO did_keys (did, public_key, metadata, registered_by, allowed_did) "
+                            "VALUES (%s, %s, %s, %s, %s)", (did, did, json.dumps(metadata), did, allowed_did))
+        db.commit()
+    finally:
+        db.close()
+
+
+def forget_import():
+    db = registration.connect_db()
+    try:
+        prepare_access_grants()  # creates the tables
+        db.cursor().execute("DELETE FROM registry_migrations")
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_legacy_grants_are_imported_once():
+    forget_import()
+    add_legacy_domain("did:key:legacy-domain", allowed_did="did:key:a,did:key:b",
+                      can_access_list=[{"swid": "did:key:c"}, {"name": "no swid"}])
+    assert prepare_access_grants() >= 3
+    for grantee in ("did:key:a", "did:key:b", "did:key:c"):
+        assert can_access(grantee, "did:key:legacy-domain")
+    assert not can_access("did:key:d", "did:key:legacy-domain")
+
+    # Later starts skip the did_keys scan; a forced run picks up what was added since
+    add_legacy_domain("did:key:late-domain", allowed_did="did:key:d")
+    assert prepare_access_grants() == 0
+    assert not can_access("did:key:d", "did:key:late-domain")
+    assert prepare_access_grants(force=True) >= 4
+    assert can_access("did:key:d", "did:key:late-domain")
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+
+import pytest
+
+from artifact_store import ArtifactPack, ArtifactStore, _RECORD_HEADER, _RECORD_MARKER
+
+
+def items(prefix, count):
+    return [(f"did:key:{prefix}{i}", {"name": f"{prefix}{i}", "pad": "x" * i}, f"KEY-{prefix}{i}", None)
+            for i in range(count)]
+
+
+def test_store_round_trip(tmp_path):
+    store = ArtifactStore(str(tmp_path), sync=False)
+    json_path, key_path = store.put("did:key:abc", {"name": "a"}, "PEM")
+    assert os.path.dirname(json_path) == os.path.dirname(key_path)
+    assert store.get("did:key:abc") == ({"name": "a"}, "PEM")
+    assert "did:key:abc" in store
+    with pytest.raises(KeyError):
+        store.get("did:key:missing")
+
+
+def test_pack_round_trip_and_reopen(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    pack = ArtifactPack(path, sync=False)
+    pack.put_many(items("a", 20))
+    pack.close()
+    pack = ArtifactPack(path, sync=False)
+    assert len(pack) == 20
+    assert pack.get("did:key:a7") == ({"name": "a7", "pad": "x" * 7}, "KEY-a7")
+    pack.close()
+
+
+def test_pack_streams_json_through_write_json(tmp_path):
+    pack = ArtifactPack(str(tmp_path / "artifacts.pack"), sync=False)
+    pack.put("did:key:s", {"ignored": True}, "PEM", write_json=lambda file, data: file.write(b'{"streamed": 1}'))
+    assert pack.get("did:key:s") == ({"streamed": 1}, "PEM")
+    pack.close()
+
+
+def test_recovery_cuts_off_an_uncommitted_tail(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    pack = ArtifactPack(path, sync=False)
+    pack.put_many(items("a", 3))
+    pack.close()
+    committed_size = os.path.getsize(path)
+    # A batch that crashed before its index lines were complete
+    with open(path, "ab") as pack_file:
+        pack_file.write(_RECORD_HEADER.pack(_RECORD_MARKER, 10, 100, 10) + b"partial")
+    with open(path + ".idx", "ab") as index_file:
+        index_file.write(b"did:key:torn\t1234")
+    pack = ArtifactPack(path, sync=False)
+    assert os.path.getsize(path) == committed_size
+    assert open(path + ".idx", "rb").read().endswith(b"\n")
+    assert len(pack) == 3
+    pack.put("did:key:b", {"name": "b"}, "KEY-b")
+    assert pack.get("did:key:b") == ({"name": "b"}, "KEY-b")
+    pack.close()
+
+
+def test_records_without_index_lines_are_not_visible(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    ArtifactPack(path, sync=False).close()
+    os.remove(path + ".idx")
+    with open(path, "ab") as pack_file:
+        pack_file.write(_RECORD_HEADER.pack(_RECORD_MARKER, 1, 2, 3) + b"d{}pem")
+    pack = ArtifactPack(path, sync=False)
+    assert len(pack) == 0
+    assert os.path.getsize(path) == len(b"HSMLPAK1")
+    pack.close()
+
+
+def test_read_only_pack_never_truncates(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    writer = ArtifactPack(path, sync=False)
+    writer.put_many(items("a", 3))
+    # A batch in flight: record bytes written, index lines not yet
+    with open(path, "ab") as pack_file:
+        pack_file.write(b"in-flight record bytes")
+    size = os.path.getsize(path)
+    reader = ArtifactPack(path, read_only=True)
+    assert os.path.getsize(path) == size
+    assert len(reader) == 3
+    with pytest.raises(ValueError):
+        reader.put("did:key:x", {}, "PEM")
+    # Records the writer commits later become visible
+    writer.put("did:key:later", {"name": "later"}, "KEY-later")
+    assert reader.get("did:key:later") == ({"name": "later"}, "KEY-later")
+    reader.close()
+    writer.close()
+
+
+def test_read_only_pack_must_exist(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    with pytest.raises(FileNotFoundError):
+        ArtifactPack(path, read_only=True)
+    assert not os.path.exists(path)
+
+
+def _append(path, prefix):
+    pack = ArtifactPack(path, sync=False)
+    for batch in range(20):
+        pack.put_many(items(f"{prefix}-{batch}-", 5))
+    pack.close()
+
+
+def test_processes_append_to_one_pack(tmp_path):
+    path = str(tmp_path / "artifacts.pack")
+    reader = ArtifactPack(path, sync=False)
+    workers = [multiprocessing.Process(target=_append, args=(path, f"w{w}")) for w in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    assert len(reader) == 300
+    for w in range(3):
+        for batch in range(20):
+            for i in range(5):
+                did = f"did:key:w{w}-{batch}-{i}"
+                assert reader.get(did) == ({"name": did[8:], "pad": "x" * i}, f"KEY-{did[8:]}")
+    reader.close()
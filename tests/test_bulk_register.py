@@ -0,0 +1,78 @@
+import pytest
+
+import Registration_API_v6 as registration
+import bulk_register
+from hsml_validator import HSML_CONTEXT
+from registration_journal import RegistrationJournal
+
+
+def person(name):
+    return {"@context": HSML_CONTEXT, "@type": "Person", "name": name, "birthDate": "2000-01-01",
+            "email": f"{name}@example.org"}
+
+
+def registered(did):
+    db = registration.connect_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (did,))
+        return cursor.fetchone()[0] == 1
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def failing_second_insert(monkeypatch):
+    insert_did_keys = registration.insert_did_keys
+    calls = []
+
+    def insert(cursor, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("db down")
+        insert_did_keys(cursor, rows)
+    monkeypatch.setattr(registration, "insert_did_keys", insert)
+
+
+def test_failed_chunk_is_reported_and_earlier_chunks_keep_their_keys(tmp_path, failing_second_insert):
+    documents = [(i, person(f"chunk{i}")) for i in range(6)]
+    report = bulk_register.register_entities_batch(documents, str(tmp_path / "out"), chunk_size=2,
+                                                   include_private_keys=True)
+    assert [item["item"] for item in report] == list(range(6))
+    assert [item["status"] for item in report] == ["success", "success", "error", "error", "success", "success"]
+    for item in report[:2] + report[4:]:
+        assert registered(item["did_key"])
+        assert "PRIVATE KEY" in item["private_key"]
+    assert "db down" in report[2]["message"]
+    assert "did_key" not in report[2]
+
+
+def test_failed_chunk_keeps_the_job_open_for_a_rerun(tmp_path, failing_second_insert):
+    journal = RegistrationJournal(str(tmp_path / "journal.log"))
+    documents = [(i, person(f"rerun{i}")) for i in range(4)]
+    report = bulk_register.register_entities_batch(documents, str(tmp_path / "out"), chunk_size=2,
+                                                   journal=journal, job="j")
+    assert [item["status"] for item in report] == ["success", "success", "error", "error"]
+    assert journal.pending() == {}
+    assert sorted(journal.completed_items("j")) == [0, 1]
+    report = bulk_register.register_entities_batch(documents, str(tmp_path / "out"), chunk_size=2,
+                                                   journal=journal, job="j")
+    assert [item["status"] for item in report] == ["skipped", "skipped", "success", "success"]
+    assert journal.completed_items("j") == {}
+    journal.close()
+
+
+def test_unreadable_files_are_item_errors(tmp_path):
+    (tmp_path / "a.json").write_text('{"name": "a"}')
+    (tmp_path / "b.json").write_bytes(b'{"name": "\xff"}')
+    (tmp_path / "c.json").write_text("not json")
+    (tmp_path / "d.json").mkdir()
+    (tmp_path / "e.json").write_text('{"name": "e"}')
+    loaded = dict(bulk_register.load_hsml_documents(str(tmp_path)))
+    assert [loaded[str(tmp_path / f"{name}.json")] for name in "abcde"] == [{"name": "a"}, None, None, None, {"name": "e"}]
+
+
+def test_json_lines_survive_a_line_that_is_not_utf8(tmp_path):
+    source = tmp_path / "documents.jsonl"
+    source.write_bytes(b'{"name": "a"}\n{"name": "\xff"}\n\n{"name": "c"}\n')
+    assert list(bulk_register.load_hsml_documents(str(source))) == [(1, {"name": "a"}), (2, None), (4, {"name": "c"})]
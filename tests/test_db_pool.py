@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+import Registration_API_v6 as registration
+from db_pool import ConnectionPool, PoolTimeoutError
+from did_pool import DIDKeyPool
+from hsml_validator import HSML_CONTEXT
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        if not self.connection.healthy:
+            raise OSError("connection lost")
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.healthy = True
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(size=2, **kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+    return ConnectionPool(connect, size=size, **kwargs), opened
+
+
+def test_exhausted_pool_times_out():
+    pool, _ = make_pool(size=2)
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    metrics = pool.metrics()
+    assert metrics["timeouts"] == 1
+    assert metrics["in_use"] == 2
+    for db in held:
+        db.close()
+
+
+def test_released_connection_is_reused_and_rolled_back():
+    pool, opened = make_pool(size=2)
+    db = pool.acquire()
+    db.close()
+    db.close()  # a second close must not return the connection twice
+    again = pool.acquire()
+    assert again._connection is opened[0]
+    assert len(opened) == 1
+    assert opened[0].rollbacks == 1
+    assert pool.metrics()["idle"] == 0
+    again.close()
+
+
+def test_waiter_gets_the_released_connection():
+    pool, opened = make_pool(size=1)
+    db = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+    waiter.start()
+    db.close()
+    waiter.join(5)
+    assert acquired and acquired[0]._connection is opened[0]
+    assert pool.metrics()["waits"] == 1
+    acquired[0].close()
+
+
+def test_context_manager_rolls_back_on_error():
+    pool, opened = make_pool(size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError("boom")
+    # once by the context manager, once on release
+    assert opened[0].rollbacks == 2
+    assert pool.metrics()["idle"] == 1
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    pool, opened = make_pool(size=1, health_check_interval=0)
+    pool.acquire().close()
+    opened[0].healthy = False
+    db = pool.acquire()
+    assert db._connection is opened[1]
+    assert opened[0].closed
+    metrics = pool.metrics()
+    assert metrics["health_check_failures"] == 1
+    assert metrics["connections_discarded"] == 1
+    db.close()
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ConnectionPool(FakeConnection, size=0)
+
+
+def test_register_document_with_one_connection_and_an_empty_key_pool(monkeypatch, tmp_path):
+    # Minting a key while the registration holds the only connection used to wait for a second one
+    pool = ConnectionPool(lambda: registration.mysql_connector.connect(**registration.db_config), size=1, timeout=2)
+    monkeypatch.setattr(registration, "db_pool", pool)
+    monkeypatch.setattr(registration, "did_key_pool", DIDKeyPool(max_size=10, low_water=0))
+    person = {"@context": HSML_CONTEXT, "@type": "Person", "name": "Ada", "birthDate": "1815-12-10",
+              "email": "ada@example.org"}
+    result = registration.register_document(person, str(tmp_path))
+    assert result["status"] == "success"
+    assert pool.metrics()["timeouts"] == 0
+    pool.close()
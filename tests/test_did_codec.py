@@ -0,0 +1,78 @@
+import os
+import random
+
+import base58
+import pytest
+
+import did_codec
+
+KEYS = [bytes(32), b"\xff" * 32, bytes(range(32))] + [random.Random(seed).randbytes(32) for seed in range(50)]
+
+
+def reference_did(public_key):
+    return "did:key:" + base58.b58encode(b"\xed\x01" + public_key).decode("ascii")
+
+
+@pytest.mark.parametrize("public_key", KEYS)
+def test_encode_matches_base58_and_round_trips(public_key):
+    did = did_codec.encode_did(public_key)
+    assert did == reference_did(public_key)
+    assert did.startswith("did:key:6Mk") and len(did) == did_codec.ED25519_DID_LENGTH
+    assert did_codec.decode_did(did) == public_key
+    assert did_codec.is_valid_did(did)
+
+
+def test_batch_calls_match_single_calls():
+    dids = did_codec.encode_dids(KEYS)
+    assert dids == [did_codec.encode_did(key) for key in KEYS]
+    assert did_codec.decode_dids(dids) == KEYS
+
+
+@pytest.mark.parametrize("data", [b"", b"\0", b"\0\0\x01", b"hello world", os.urandom(100), b"\0" + os.urandom(40)])
+def test_generic_base58_matches_the_base58_package(data):
+    encoded = did_codec.b58encode(data)
+    assert encoded == base58.b58encode(data).decode("ascii")
+    assert did_codec.b58decode(encoded) == data
+
+
+VALID = did_codec.encode_did(bytes(range(32)))
+
+
+@pytest.mark.parametrize("did", [
+    None,
+    42,
+    "",
+    VALID[len("did:key:"):],                                   # no prefix
+    "did:web:" + VALID[len("did:key:"):],                      # other method
+    VALID[:-1],                                                # too short
+    VALID + "1",                                               # too long
+    VALID[:20] + "0" + VALID[21:],                             # '0' is not in the alphabet
+    VALID[:20] + "l" + VALID[21:],                             # nor is 'l'
+    VALID[:20] + "é" + VALID[21:],                             # non-ASCII
+    "did:key:" + "z" * 47,                                     # right length, payload past 0xed01 + key
+    "did:key:" + base58.b58encode(b"\x12\x00" + bytes(range(32))).decode("ascii"),  # other multicodec
+])
+def test_malformed_dids_are_rejected(did):
+    assert not did_codec.is_valid_did(did)
+    with pytest.raises(ValueError):
+        did_codec.decode_did(did)
+
+
+def test_decode_dids_strict_and_lenient():
+    dids = [VALID, "did:key:nope"]
+    with pytest.raises(ValueError):
+        did_codec.decode_dids(dids)
+    assert did_codec.decode_dids(dids, strict=False) == [bytes(range(32)), None]
+
+
+@pytest.mark.parametrize("public_key", [b"", bytes(31), bytes(33)])
+def test_encode_rejects_wrong_key_lengths(public_key):
+    with pytest.raises(ValueError):
+        did_codec.encode_did(public_key)
+    with pytest.raises(ValueError):
+        did_codec.encode_dids([bytes(32), public_key])
+
+
+def test_b58decode_rejects_characters_outside_the_alphabet():
+    with pytest.raises(ValueError):
+        did_codec.b58decode("abc0")
@@ -0,0 +1,80 @@
+import os
+
+import Registration_API_v6 as registration
+from entity_graph import EntityGraph, build_graph, load_or_build, record_registry_change, registry_version
+from hsml_validator import HSML_CONTEXT
+
+
+def person(name):
+    return {"@context": HSML_CONTEXT, "@type": "Person", "name": name, "birthDate": "2000-01-01",
+            "email": f"{name}@example.org"}
+
+
+def current_version():
+    db = registration.connect_db()
+    try:
+        return registry_version(db.cursor())
+    finally:
+        db.close()
+
+
+def change_elsewhere():
+    # A change committed by another worker, which this process's graph never sees
+    db = registration.connect_db()
+    try:
+        record_registry_change(db.cursor(), "register")
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_registrations_keep_the_graph_current(tmp_path, monkeypatch):
+    snapshot = str(tmp_path / "graph.snapshot")
+    graph = load_or_build(snapshot)
+    assert graph.version == current_version()
+    monkeypatch.setattr(registration, "entity_graph", graph)
+    did = registration.register_document(person("graphed"), str(tmp_path / "out"))["did_key"]
+    assert did in graph
+    assert graph.version == current_version()
+    graph.save(snapshot)
+    assert load_or_build(snapshot).version == graph.version
+    assert os.listdir(tmp_path / "out") and not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_stale_snapshot_is_rebuilt(tmp_path):
+    snapshot = str(tmp_path / "graph.snapshot")
+    graph = load_or_build(snapshot)
+    graph.add_entity("did:key:stale-only", {})
+    graph.save(snapshot)
+    change_elsewhere()
+    rebuilt = load_or_build(snapshot)
+    assert "did:key:stale-only" not in rebuilt
+    assert rebuilt.version == current_version()
+    # The rebuilt graph was saved, so the next start loads it
+    assert EntityGraph.load(snapshot).version == rebuilt.version
+
+
+def test_snapshot_is_reused_while_nothing_changed(tmp_path):
+    snapshot = str(tmp_path / "graph.snapshot")
+    graph = build_graph()
+    graph.add_entity("did:key:only-in-snapshot", {})
+    graph.save(snapshot)
+    assert "did:key:only-in-snapshot" in load_or_build(snapshot)
+
+
+def test_graph_that_missed_a_change_falls_behind(tmp_path):
+    graph = build_graph()
+    change_elsewhere()  # committed by this process, which then adds its entity
+    graph.add_entity("did:key:own-write", {}, changes=1)
+    assert graph.version == current_version()
+    change_elsewhere()
+    assert graph.version == current_version() - 1
+
+
+def test_unreadable_snapshot_is_rebuilt(tmp_path):
+    snapshot = tmp_path / "graph.snapshot"
+    build_graph().save(str(snapshot))
+    snapshot.write_bytes(snapshot.read_bytes()[:20])
+    assert load_or_build(str(snapshot)).version == current_version()
+    snapshot.write_bytes(b"not a snapshot")
+    assert load_or_build(str(snapshot)).version == current_version()
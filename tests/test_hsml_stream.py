@@ -0,0 +1,118 @@
+import io
+import json
+
+import pytest
+
+from did_codec import encode_did
+from entity_index import query_entities
+from hsml_stream import StreamingJSONError, copy_with_swid, read_hsml_header, register_entity_streaming
+from hsml_validator import HSML_CONTEXT
+
+LINKED = [encode_did(bytes([i]) * 32) for i in range(1, 4)]
+
+
+def scan(document, max_value_size=64, chunk_size=7):
+    # A tiny chunk size makes values and strings straddle buffer refills
+    raw = document if isinstance(document, bytes) else json.dumps(document).encode("utf-8")
+    return (raw,) + read_hsml_header(io.BytesIO(raw), max_value_size=max_value_size, chunk_size=chunk_size)
+
+
+def test_small_members_are_decoded():
+    document = {"@context": HSML_CONTEXT, "@type": "Entity", "name": "tw\"in \\ é", "count": 3, "ok": True,
+                "nothing": None, "nested": {"a": [1, {"b": "}]"}]}}
+    _, fields, large_fields, _ = scan(document, max_value_size=1024)
+    assert fields == document
+    assert large_fields == []
+
+
+def test_large_values_are_skipped_not_decoded():
+    geometry = {"vertices": [[i, i + 0.5, "]}\\\""] for i in range(200)]}
+    document = {"@type": "Entity", "geometry": geometry, "blob": "x" * 500, "name": "after"}
+    _, fields, large_fields, _ = scan(document)
+    assert sorted(large_fields) == ["blob", "geometry"]
+    assert fields == {"@type": "Entity", "name": "after"}
+
+
+def test_linked_to_array_is_decoded_entry_by_entry():
+    # The whole array is far over max_value_size, each entry is not
+    links = [{"swid": LINKED[i % 3]} for i in range(500)] + [LINKED[0]]
+    _, fields, large_fields, _ = scan({"@type": "Entity", "linkedTo": links, "name": "n"}, max_value_size=128)
+    assert fields["linkedTo"] == links
+    assert large_fields == []
+
+
+def test_linked_to_with_an_oversized_entry_is_reported_large():
+    links = [{"swid": LINKED[0]}, {"swid": LINKED[1], "note": "x" * 500}]
+    _, fields, large_fields, _ = scan({"@type": "Entity", "linkedTo": links}, max_value_size=128)
+    assert "linkedTo" not in fields
+    assert large_fields == ["linkedTo"]
+
+
+def test_empty_linked_to_array():
+    _, fields, _, _ = scan(b'{"linkedTo": [ ], "name": "n"}')
+    assert fields == {"linkedTo": [], "name": "n"}
+
+
+@pytest.mark.parametrize("raw", [
+    b'{"name": "n",}',
+    b'{"name" "n"}',
+    b'{"name": "n"} trailing',
+    b'{"name": "unterminated',
+    b'{"linkedTo": ["a" "b"]}',
+    b'["not", "an", "object"]',
+])
+def test_malformed_documents_are_rejected(raw):
+    with pytest.raises(StreamingJSONError):
+        scan(raw)
+
+
+@pytest.mark.parametrize("document", [
+    {"swid": "did:key:old", "name": "first", "blob": "x" * 300},
+    {"name": "middle", "swid": "did:key:old", "blob": "x" * 300},
+    {"name": "last", "blob": "x" * 300, "swid": "did:key:old"},
+    {"swid": "did:key:old"},
+    {"name": "no swid", "blob": "x" * 300},
+])
+def test_copy_with_swid_replaces_the_swid_member(document):
+    raw, _, _, layout = scan(document)
+    output = io.BytesIO()
+    copy_with_swid(io.BytesIO(raw), output, layout, "did:key:new", chunk_size=5)
+    expected = dict(document, swid="did:key:new")
+    assert json.loads(output.getvalue()) == expected
+
+
+def test_streaming_registration_indexes_every_link(tmp_path):
+    links = [{"swid": LINKED[i % 3]} for i in range(300)]
+    document = {"@context": HSML_CONTEXT, "@type": "Entity", "name": "big twin", "description": "d",
+                "geometry": "x" * 2000, "linkedTo": links}
+    source = tmp_path / "twin.json"
+    source.write_text(json.dumps(document))
+    result = register_entity_streaming(str(source), str(tmp_path / "out"), max_value_size=256, chunk_size=64)
+    assert result["status"] == "success"
+    with open(result["updated_json_path"]) as output:
+        assert json.load(output) == dict(document, swid=result["did_key"])
+
+
+def test_streaming_registration_rejects_oversized_link_entries(tmp_path):
+    document = {"@context": HSML_CONTEXT, "@type": "Entity", "name": "n", "description": "d",
+                "linkedTo": [{"swid": LINKED[0], "note": "x" * 1000}]}
+    source = tmp_path / "twin.json"
+    source.write_text(json.dumps(document))
+    result = register_entity_streaming(str(source), str(tmp_path / "out"), max_value_size=256)
+    assert result["status"] == "error"
+    assert "linkedTo" in result["message"]
+
+
+def test_streamed_metadata_names_the_omitted_members(tmp_path):
+    document = {"@context": HSML_CONTEXT, "@type": "Entity", "name": "streamed twin", "description": "d" * 1000,
+                "geometry": "x" * 1000, "linkedTo": [{"swid": LINKED[0]}]}
+    source = tmp_path / "twin.json"
+    source.write_text(json.dumps(document))
+    result = register_entity_streaming(str(source), str(tmp_path / "out"), max_value_size=256)
+    assert result["status"] == "success"
+    (entity,) = query_entities({"name": "streamed twin"}, include_metadata=True)["results"]
+    metadata = entity["metadata"]
+    assert metadata["_streamed_fields"] == ["description", "geometry"]
+    assert "description" not in metadata and metadata["name"] == "streamed twin"
+    with open(result["updated_json_path"]) as output:
+        assert "_streamed_fields" not in json.load(output)
@@ -0,0 +1,35 @@
+from did_codec import encode_did
+from entity_index import extract_index_terms
+from hsml_validator import HSML_CONTEXT, validate_document
+
+DID = encode_did(bytes(range(32)))
+
+
+def agent(**fields):
+    data = {"@context": HSML_CONTEXT, "@type": "Agent", "name": "agent", "creator": {"swid": DID},
+            "dateCreated": "2025-01-01", "dateModified": "2025-01-02", "description": "an agent"}
+    data.update(fields)
+    return data
+
+
+def test_valid_references_pass():
+    assert validate_document(agent()) == ([], [])
+    assert validate_document(agent(creator=DID, swid=DID, linkedTo=[{"swid": DID}, DID])) == ([], [])
+
+
+def test_malformed_swid_and_creator_are_rejected():
+    errors, _ = validate_document(agent(creator={"swid": "did:key:bogus"}, swid="garbage"))
+    assert "'swid' must be a valid 'did:key:' DID" in errors
+    assert "'creator' entries must be DID:key references" in errors
+    errors, _ = validate_document(agent(creator={"name": "Some Organization"}))
+    assert errors == ["'creator' entries must be DID:key references"]
+
+
+def test_linked_to_needs_a_swid():
+    errors, _ = validate_document(agent(linkedTo=[{"swid": DID}, {"name": "no swid"}]))
+    assert errors == ["'linkedTo' entries must be DID:key references"]
+
+
+def test_index_terms_are_dids():
+    terms = extract_index_terms(agent(swid=DID, linkedTo=[{"swid": DID}]))
+    assert ("creator", DID) in terms and ("linkedTo", DID) in terms
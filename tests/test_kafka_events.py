@@ -0,0 +1,118 @@
+import threading
+import time
+
+from Registration_API_v6 import DummyAdminClient, DummyProducer
+from kafka_events import KafkaEventPipeline
+
+
+class FlakyAdminClient(DummyAdminClient):
+    """create_topics raises (the broker is down) for the first `failures` requests"""
+    def __init__(self, failures):
+        super().__init__({})
+        self.failures = failures
+        self.requests = []
+
+    def create_topics(self, topic_list):
+        self.requests.append([topic.topic for topic in topic_list])
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker down")
+        return super().create_topics(topic_list)
+
+
+class RecordingProducer(DummyProducer):
+    """Records every produce(); the first `failures` deliveries of each message report an error"""
+    def __init__(self, failures=0):
+        super().__init__({})
+        self.failures = failures
+        self.produced = []
+        self._attempts = {}
+
+    def produce(self, topic, message, callback=None):
+        self.produced.append((topic, message))
+        super().produce(topic, message, callback)
+
+    def poll(self, timeout=0):
+        pending, self._pending = self._pending, []
+        for callback, message in pending:
+            attempt = self._attempts[message.value()] = self._attempts.get(message.value(), 0) + 1
+            callback(RuntimeError("delivery failed") if attempt <= self.failures else None, message)
+        return len(pending)
+
+
+def pipeline(admin_client, producer, **options):
+    deliveries = []
+    options.setdefault("retry_backoff_seconds", 0.001)
+    events = KafkaEventPipeline(admin_client, producer, linger_seconds=0.01,
+                                on_delivery=lambda topic, value, error: deliveries.append((topic, value, error)),
+                                **options)
+    return events, deliveries
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_failed_batch_is_put_back_in_order(capsys):
+    admin_client, producer = FlakyAdminClient(failures=2), RecordingProducer()
+    events, deliveries = pipeline(admin_client, producer)
+    events.create_topic("agents")
+    for i in range(5):
+        events.send("agents", {"n": i})
+    events.start()
+    assert wait_for(lambda: len(deliveries) == 5)
+    events.shutdown()
+    assert admin_client.requests == [["agents"]] * 3
+    assert [message for _, message in producer.produced] == [f'{{"n": {i}}}' for i in range(5)]
+    assert events.metrics()["batch_failures"] == 2
+    assert all(error is None for _, _, error in deliveries)
+    assert "failed, retrying: broker down" in capsys.readouterr().out
+
+
+def test_exhausted_retries_reach_on_delivery_with_an_error(capsys):
+    producer = RecordingProducer(failures=10)
+    events, deliveries = pipeline(FlakyAdminClient(failures=0), producer, max_retries=2)
+    events.start()
+    events.send("agents", {"n": 1})
+    assert wait_for(lambda: deliveries)
+    events.shutdown()
+    ((topic, value, error),) = deliveries
+    assert (topic, value) == ("agents", '{"n": 1}') and isinstance(error, RuntimeError)
+    assert len(producer.produced) == 3  # the first attempt and two retries
+    metrics = events.metrics()
+    assert metrics["delivery_failures"] == 1 and metrics["retries"] == 2
+    assert events.unsent() == []
+    assert "failed after 2 retries" in capsys.readouterr().out
+
+
+def test_shutdown_drains_queued_and_retrying_events(capsys):
+    # Never started: everything is sent by shutdown, including a batch that fails and deliveries that are retried
+    producer = RecordingProducer(failures=1)
+    events, deliveries = pipeline(FlakyAdminClient(failures=1), producer, retry_backoff_seconds=0.01)
+    for i in range(3):
+        events.publish_agent(f"agent_{i}", f"Agent {i}")
+    events.shutdown(timeout=5.0)
+    assert events.unsent() == [] and events.pending() == 0
+    assert sorted(topic for topic, _, error in deliveries if error is None) == ["agent_0", "agent_1", "agent_2"]
+    assert len(producer.produced) == 6  # each message failed once, then was delivered
+    assert events.metrics()["topics_created"] == 3
+
+
+def test_unsent_after_the_deadline(capsys):
+    events, deliveries = pipeline(FlakyAdminClient(failures=10 ** 6), RecordingProducer())
+    events.start()
+    events.publish_agent("agent_x", "Agent X")
+    events.send("agent_x", {"n": 2})
+    started = time.monotonic()
+    events.shutdown(timeout=0.2)
+    assert time.monotonic() - started < 2.0
+    assert events.unsent() == [("topic", "agent_x", (1, 1)),
+                               ("message", "agent_x", '{"message": "New Agent registered: Agent X"}'),
+                               ("message", "agent_x", '{"n": 2}')]
+    assert events.metrics()["unsent"] == 3
+    assert [(value, type(error)) for _, value, error in deliveries] == [
+        ('{"message": "New Agent registered: Agent X"}', RuntimeError), ('{"n": 2}', RuntimeError)]
+    assert not any(thread.name == "kafka-events" for thread in threading.enumerate())
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+
+import pytest
+
+import Registration_API_v6 as registration
+import artifact_store
+import bulk_register
+import registration_journal
+from hsml_validator import HSML_CONTEXT
+from registration_journal import RegistrationJournal, recover_journal
+
+# These fork a process that dies with its journal open, and rely on flock to tell live journals from orphans
+posix_only = pytest.mark.skipif(os.name != "posix", reason="needs fork and flock")
+
+
+def person(name):
+    return {"@context": HSML_CONTEXT, "@type": "Person", "name": name, "birthDate": "2000-01-01",
+            "email": f"{name}@example.org"}
+
+
+def journal_item(name, item=None):
+    return {"item": item, "did": registration.generate_did_key()[0], "private_key": "PEM", "data": person(name),
+            "registered_by": None, "topic": None, "grant": None}
+
+
+def registered(did):
+    db = registration.connect_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM did_keys WHERE did = %s", (did,))
+        return cursor.fetchone()[0] == 1
+    finally:
+        db.close()
+
+
+def journal_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.startswith("journal.log") and not name.endswith(".lock"))
+
+
+def crashed_entry(tmp_path, stages=()):
+    path = str(tmp_path / "journal.log")
+    reader, writer = multiprocessing.Pipe(duplex=False)
+
+    def run():
+        journal = RegistrationJournal(path)
+        item = journal_item("crashed")
+        entry = journal.begin([item], str(tmp_path / "out"))
+        for stage in stages:
+            journal.stage(entry, stage)
+        writer.send(item["did"])
+        os._exit(1)
+    process = multiprocessing.get_context("fork").Process(target=run)
+    process.start()
+    did = reader.recv()
+    process.join()
+    return path, did
+
+
+@posix_only
+def test_crashed_registration_is_replayed(tmp_path):
+    path, did = crashed_entry(tmp_path)
+    journal = RegistrationJournal(path)
+    assert len(journal.recovered) == 1
+    assert journal.metrics()["absorbed_files"] == 1
+    assert [entry["action"] for entry in recover_journal(journal)] == ["replayed"]
+    assert registered(did)
+    assert artifact_store.open_artifact_store(str(tmp_path / "out")).get(did)[1] == "PEM"
+    journal.close()
+    assert journal_files(tmp_path) == []
+
+
+@posix_only
+def test_crashed_registration_is_rolled_back(tmp_path):
+    path, did = crashed_entry(tmp_path, stages=["kafka", "db"])
+    journal = RegistrationJournal(path)
+    assert [entry["action"] for entry in recover_journal(journal, mode="rollback")] == ["rolled_back"]
+    assert not registered(did)
+    journal.close()
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    journal = RegistrationJournal(str(tmp_path / "journal.log"))
+    entry = journal.begin([journal_item("a")], str(tmp_path / "out"))
+    with open(journal.path, "ab") as journal_file:
+        journal_file.write(b'{"op": "done", "entry": "' + entry.encode() + b'"')  # no newline: torn write
+    journal._file.close()
+    journal._lock_file.close()
+    reopened = RegistrationJournal(str(tmp_path / "journal.log"))
+    assert reopened.recovered == [entry]
+    reopened.close()
+
+
+def test_failure_after_begin_is_rolled_back_not_replayed(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.log")
+    journal = RegistrationJournal(path)
+    monkeypatch.setattr(registration, "journal", journal)
+
+    def disk_full(self, items):
+        list(items)
+        raise OSError("disk full")
+    monkeypatch.setattr(artifact_store.ArtifactStore, "put_many", disk_full)
+    with pytest.raises(OSError):
+        registration.register_document(person("failed"), str(tmp_path / "out"))
+    report = bulk_register.register_entities_batch([(i, person(f"b{i}")) for i in range(3)], str(tmp_path / "out"),
+                                                   journal=journal, job="import")
+    assert [item["status"] for item in report] == ["error"] * 3
+    assert not any("did_key" in item for item in report)
+    assert journal.pending() == {}
+    assert journal.metrics()["rolled_back"] == 2
+    assert journal.completed_items("import") == {}
+    db = registration.connect_db()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT COUNT(*) FROM did_keys WHERE metadata LIKE %s", ('%"name": "failed"%',))
+        assert cursor.fetchone()[0] == 0
+    finally:
+        db.close()
+    journal.close()
+
+
+def test_aborted_entry_is_rolled_back_by_recovery(tmp_path, monkeypatch):
+    # The rollback after the failure fails too: recovery must finish it, never replay it
+    path = str(tmp_path / "journal.log")
+    journal = RegistrationJournal(path)
+    monkeypatch.setattr(registration, "journal", journal)
+    monkeypatch.setattr(artifact_store.ArtifactStore, "put_many", lambda self, items: 1 / 0)
+    monkeypatch.setattr(registration_journal, "_rollback", lambda record: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        registration.register_document(person("aborted"), str(tmp_path / "out"))
+    (pending,) = journal.pending().values()
+    assert "aborted" in pending["stages"]
+    did = pending["begin"]["items"][0]["did"]
+    assert registered(did)
+    monkeypatch.undo()
+    journal.close()
+    journal = RegistrationJournal(path)
+    assert [entry["action"] for entry in recover_journal(journal, mode="replay")] == ["rolled_back"]
+    assert not registered(did)
+    journal.close()
+
+
+def test_interrupted_job_resumes(tmp_path):
+    path = str(tmp_path / "journal.log")
+    documents = [(i, person(f"job{i}")) for i in range(6)]
+
+    def interrupted():
+        yield from documents[:4]
+        raise KeyboardInterrupt
+    journal = RegistrationJournal(path)
+    with pytest.raises(KeyboardInterrupt):
+        bulk_register.register_entities_batch(interrupted(), str(tmp_path / "out"), chunk_size=2, journal=journal, job="j")
+    journal.close()  # job not finished: the file is kept
+    assert len(journal_files(tmp_path)) == 1
+    journal = RegistrationJournal(path)
+    assert sorted(journal.completed_items("j")) == [0, 1, 2, 3]
+    report = bulk_register.register_entities_batch(documents, str(tmp_path / "out"), chunk_size=2,
+                                                   journal=journal, job="j")
+    assert [item["status"] for item in report] == ["skipped"] * 4 + ["success"] * 2
+    journal.close()
+    assert journal_files(tmp_path) == []
+
+
+@posix_only
+def test_live_processes_keep_their_own_journal(tmp_path):
+    path = str(tmp_path / "journal.log")
+    ready, stop = multiprocessing.Event(), multiprocessing.Event()
+
+    def worker():
+        journal = RegistrationJournal(path)
+        journal.begin([journal_item("live")], str(tmp_path / "out"))
+        ready.set()
+        stop.wait(10)
+        os._exit(0)
+    process = multiprocessing.get_context("fork").Process(target=worker)
+    process.start()
+    assert ready.wait(10)
+    journal = RegistrationJournal(path)  # a second worker opens the same journal
+    assert journal.recovered == []
+    assert journal.metrics()["absorbed_files"] == 0
+    journal.close()
+    stop.set()
+    process.join()
+    # Its process is gone now, so the next one takes its entry over
+    journal = RegistrationJournal(path)
+    assert len(journal.recovered) == 1
+    recover_journal(journal, mode="rollback")
+    journal.close()
+    assert journal_files(tmp_path) == []
+